@@ -1,7 +1,9 @@
 from .api import connect
 from .objdb import ObjDBMixin
-from .dbobj import DbObj, stored
+from .dbobj import DbObj, stored, computed
 from .base import BaseDB
+from .profiling import profile
+from .syncing import sync
 
 __all__ = [
     'connect',
@@ -9,5 +11,8 @@ __all__ = [
     'ObjDBMixin',
     'DbObj',
     'stored',
-    'BaseDB'
+    'computed',
+    'BaseDB',
+    'profile',
+    'sync'
 ]
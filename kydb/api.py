@@ -9,18 +9,27 @@ import importlib
 _db_cache = {}
 
 
-def connect(url: str) -> KYDBInterface:
+def connect(url: str, **kwargs) -> KYDBInterface:
+    """Connect to the db defined by url
+
+    :param url: The url of the db
+    :param kwargs: Options passed on to CacheDB or UnionDB.
+                   i.e. ``connect('redis://a|s3://b', write_behind=True)``
+    """
     if "|" in url:
         dbs = [_connect(x) for x in url.split("|")]
         if len(dbs) != 2:
             raise ValueError("CacheDB expects exactly 2 databases")
 
-        return CacheDB(*dbs)
+        return CacheDB(*dbs, **kwargs)
 
     dbs = [_connect(x) for x in url.split(";")]
     if len(dbs) == 1:
+        if kwargs:
+            raise ValueError("Options are only supported by CacheDB "
+                             "and UnionDB, got: " + str(kwargs))
         return dbs[0]
-    return UnionDB(dbs)
+    return UnionDB(dbs, **kwargs)
 
 
 def _connect(url: str) -> BaseDB:
@@ -32,7 +41,8 @@ def _connect(url: str) -> BaseDB:
 
 
 def _resolve_db_class(url: str):
-    db_type = url.split(":", 1)[0]
+    # i.e. diskcache+s3://my-bucket is a DiskCacheDB
+    db_type = url.split(":", 1)[0].split("+", 1)[0]
     assert db_type in DB_MODULES, "{} is not one of the valid db types: {}".format(
         db_type, list(iter(DB_MODULES.keys()))
     )
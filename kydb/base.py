@@ -1,22 +1,129 @@
 import pickle
 from typing import Tuple
+import functools
+import hashlib
 import os
-from .objdb import ObjDBMixin
+import time
+from .objdb import ObjDBMixin, DBOBJ_CONFIG_PATH
 from .cache_context import cache_context
 from .interface import KYDBInterface
+from .single_flight import SingleFlight
+from .local_cache import LocalCache
+from .change_feed import ChangeFeed, ChangeLogFeed
+from .refresher import BackgroundRefresher
+from .walk import walk_tree
+from .executors import shared_executor
+from . import snapshot
+from . import metrics
+from concurrent.futures import wait, FIRST_COMPLETED
+from fnmatch import fnmatchcase
 from typing import Optional
 import yaml
 
+# Characters that make a find pattern a glob
+GLOB_CHARS = '*?['
+
+# The raw ops that write objects. See _raw_write_listeners
+RAW_WRITE_OPS = ('set_raw', 'set_raw_many', 'set_dbobj_raw')
+
+
+def _notify_raw_writes(func, many: bool):
+    """Wrap the raw write func of a BaseDB to call its
+    _raw_write_listeners with each path written"""
+    @functools.wraps(func)
+    def wrapper(self, key, *args, **kwargs):
+        listeners = self._raw_write_listeners
+        if not listeners:
+            return func(self, key, *args, **kwargs)
+
+        if not many:
+            res = func(self, key, *args, **kwargs)
+            for listener in listeners:
+                listener(key)
+
+            return res
+
+        # key is the (path, data) items
+        written = []
+
+        def items():
+            for item in key:
+                written.append(item[0])
+                yield item
+
+        try:
+            return func(self, items(), *args, **kwargs)
+        finally:
+            # Including those written before an error
+            for path in written:
+                for listener in listeners:
+                    listener(path)
+
+    wrapper._kydb_raw_write = True
+    return wrapper
+
 
 class BaseDB(ObjDBMixin, KYDBInterface):
     """ Base class for KYDBInterface """
 
+    # Max concurrent fetches of get_raw_many
+    PREFETCH_WORKERS = 16
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in RAW_WRITE_OPS:
+            func = getattr(cls, name)
+            if not getattr(func, '_kydb_raw_write', False):
+                setattr(cls, name,
+                        _notify_raw_writes(func, name == 'set_raw_many'))
+
+        # Measure the raw ops for kydb.metrics
+        for name, op in metrics.RAW_OPS.items():
+            func = getattr(cls, name)
+            if not getattr(func, '_kydb_instrumented', False):
+                setattr(cls, name, metrics.instrument(func, op))
+
     def __init__(self, url: str):
         self.db_type = url.split(':', 1)[0]
         self.db_name, self.base_path = self._get_name_and_basepath(url)
         self._config = self._get_config()
         self.url = url
         self._cache = {}
+        self._expiries = {}
+        self._single_flight = SingleFlight()
+        # Called with the path of every object written by set
+        self._write_listeners = []
+        # Called with the path of every object written by the raw ops,
+        # including set_raw_many and set_dbobj_raw. See RAW_WRITE_OPS
+        self._raw_write_listeners = []
+        self._dbobj_classes = {}
+        # Shared by the processes on the host. See LocalCache
+        self.local_cache = self._get_local_cache()
+        self._change_feed = None
+        # Publish writes and deletes even when not watching. See watch
+        self.publish_changes = (self._config or {}).get(
+            'publish_changes', False)
+        # Never started, only used to publish
+        self._publish_feed = None
+        config = self._config or {}
+        # Revalidate cached objects after this many seconds. See read
+        self.stale_after = config.get('stale_after')
+        # Stale-while-revalidate. See read
+        self.soft_ttl = config.get('soft_ttl')
+        self.hard_ttl = config.get('hard_ttl')
+        self._refresher = None
+        # path -> (version, time loaded or last validated) of cached objects
+        self._cache_versions = {}
+        # Skip writing values whose bytes are already stored. See set
+        self.elide_unchanged = config.get('elide_unchanged', False)
+        # path -> hash of the bytes last read or written
+        self._content_hashes = {}
+        self.elided_writes = 0
+        self.elided_bytes = 0
+
+    def _get_local_cache(self) -> Optional[LocalCache]:
+        if self._config and 'local_cache' in self._config:
+            return LocalCache.from_config(self._config['local_cache'])
 
     def _get_config(self) -> Optional[dict]:
         config_path = os.environ.get('KYDB_CONFIG_PATH')
@@ -104,9 +211,53 @@ class BaseDB(ObjDBMixin, KYDBInterface):
     def refresh(self, key=None):
         """ Implements refresh in KYDBInterface """
         if key:
-            del self._cache[key]
+            path = self._get_full_path(key)
+            del self._cache[path]
         else:
+            path = None
             self._cache = {}
+            self._cache_versions = {}
+
+        metrics.emit(self.url, 'cache_evict', path)
+
+        if not key or key == DBOBJ_CONFIG_PATH:
+            self._clear_dbobj_classes()
+
+    def watch(self, feed: ChangeFeed = None) -> ChangeFeed:
+        """ Implements watch in KYDBInterface """
+        self.unwatch()
+        feed = feed or self._default_change_feed()
+        self._change_feed = feed
+        feed.start(self._on_change)
+        return feed
+
+    def unwatch(self):
+        """ Implements unwatch in KYDBInterface """
+        feed, self._change_feed = self._change_feed, None
+        if feed:
+            feed.stop()
+
+    def _default_change_feed(self) -> ChangeFeed:
+        """ Derived class can override this with a feed native to the DB """
+        return ChangeLogFeed(self)
+
+    def _on_change(self, path: str):
+        """ path was written or deleted elsewhere """
+        self._cache.pop(path, None)
+        self._cache_versions.pop(path, None)
+        self._content_hashes.pop(path, None)
+        if path == self._get_full_path(DBOBJ_CONFIG_PATH):
+            self._clear_dbobj_classes()
+
+    def _publish_change(self, path: str):
+        feed = self._change_feed
+        if feed is None and self.publish_changes:
+            feed = self._publish_feed
+            if feed is None:
+                feed = self._publish_feed = self._default_change_feed()
+
+        if feed is not None:
+            feed.publish(path)
 
     def clear_cache(self):
         """Clear the cache
@@ -116,19 +267,268 @@ class BaseDB(ObjDBMixin, KYDBInterface):
         Note: This is different to CacheDB where the cache is a database
         """
         self._cache = {}
+        self._cache_versions = {}
+        self._clear_dbobj_classes()
+        metrics.emit(self.url, 'cache_evict', None)
 
     def read(self, key: str, reload=False):
         """ Implements read in KYDBInterface """
         path = self._get_full_path(key)
         res = None if reload else self._cache.get(path)
-        if not res:
-            res = self._deserialise(self.get_raw(path))
+        if res and self.soft_ttl is not None and not self._is_soft_fresh(path):
+            res = None
+
+        if res and self.stale_after is not None and not self._is_fresh(path):
+            res = None
+
+        if res:
+            metrics.emit(self.url, 'cache_hit', path)
+        else:
+            metrics.emit(self.url, 'cache_miss', path)
+            # Concurrent reads of the same path share one fetch
+            res = self._single_flight.do(path, lambda: self._load(path))
+
+        self._cache[path] = res
+        return res
+
+    def _is_fresh(self, path: str) -> bool:
+        """ Is the cached object at path still valid under stale_after?
+
+        Once stale_after seconds have passed since it was last checked,
+        its version is compared with the one in the DB.
+        """
+        version, checked = self._cache_versions.get(path, (None, 0))
+        if time.time() - checked < self.stale_after:
+            return True
+
+        current = None
+        if version is not None:
+            try:
+                current = self.get_version_raw(path)
+            except (KeyError, NotImplementedError):
+                pass
+
+        if current is None or current != version:
+            metrics.emit(self.url, 'cache_stale', path)
+            self._content_hashes.pop(path, None)
+            if self.local_cache is not None:
+                self.local_cache.discard(self._local_key(path))
+
+            return False
+
+        self._cache_versions[path] = (version, time.time())
+        return True
+
+    def _is_soft_fresh(self, path: str) -> bool:
+        """ Can the cached object at path be served under soft_ttl?
+
+        Past soft_ttl it is still served but reloaded in the background.
+        Past hard_ttl it is not served.
+        """
+        loaded = self._cache_versions.get(path, (None, 0))[1]
+        age = time.time() - loaded
+        if self.hard_ttl is not None and age >= self.hard_ttl:
+            return False
+
+        if age >= self.soft_ttl:
+            if self._refresher is None:
+                self._refresher = BackgroundRefresher()
+
+            self._refresher.submit(
+                path, lambda: self._refresh_in_background(path, loaded))
+
+        return True
+
+    def _refresh_in_background(self, path: str, loaded: float):
+        try:
+            res, version = self._fetch(path)
+        except KeyError:
+            res = version = None
+
+        # Unless it was written or loaded again in the meantime
+        if self._cache_versions.get(path, (None, 0))[1] != loaded:
+            return
+
+        if res is None:
+            self._cache.pop(path, None)
+            self._cache_versions.pop(path, None)
+        else:
+            self._cache[path] = res
+            self._cache_versions[path] = (version, time.time())
+
+    def _load(self, path: str):
+        """ Fetch and deserialise path from the DB """
+        res, version = self._fetch(path)
+        self._cache_versions[path] = (version, time.time())
+        return res
+
+    def _fetch(self, path: str):
+        """ Fetch and deserialise path from the DB
+
+        :returns: The object and its version if stale_after is used.
+        """
+        if self.stale_after is None:
+            data, version = self._get_raw_local(path), None
+        else:
+            data, version = self._get_raw_local(path, with_version=True)
+
+        if self.elide_unchanged:
+            self._content_hashes[path] = self._content_hash(data)
+
+        return self._decode(path, data), version
+
+    def _local_key(self, path: str) -> str:
+        """ The key of path in the local cache """
+        return f'{self.db_type}://{self.db_name}{path}'
+
+    def _get_raw_local(self, path: str, with_version=False):
+        """ get_raw via the local cache if there is one
+
+        :param with_version: return (data, version) like
+                             get_raw_with_version
+        """
+        local_cache = self.local_cache
+        if local_cache is None:
+            return self.get_raw_with_version(path) if with_version \
+                else self.get_raw(path)
+
+        local_key = self._local_key(path)
+        entry = local_cache.get_entry(local_key)
+        if entry is not None:
+            metrics.emit(self.url, 'local_hit', path)
+            data, version = entry
+            return (data, version or None) if with_version else data
+
+        metrics.emit(self.url, 'local_miss', path)
+        if with_version:
+            data, version = self.get_raw_with_version(path)
+        else:
+            data, version = self.get_raw(path), None
+
+        # Best-effort, a full cache does not fail the read
+        local_cache.put(local_key, data, version or '')
+        return (data, version) if with_version else data
+
+    def _decode(self, path: str, data):
+        """ Deserialise the raw data read from path """
+        if not metrics.enabled():
+            res = self._deserialise(data)
             if self.is_data_dbobj(res):
                 res = self.read_dbobj(res)
 
-        self._cache[key] = res
+            return res
+
+        start = time.perf_counter()
+        res = self._deserialise(data)
+        if self.is_data_dbobj(res):
+            res = self.read_dbobj(res)
+
+        metrics.emit(self.url, 'deserialise', path,
+                     time.perf_counter() - start, bytes_in=len(data))
         return res
 
+    def prefetch(self, folder: str, recursive=False, pattern=None) -> int:
+        """ Implements prefetch in KYDBInterface """
+        count = 0
+        for _ in self._fetch_dir(folder, recursive, pattern):
+            count += 1
+
+        return count
+
+    def read_dir(self, folder: str, recursive=False, pattern=None) -> dict:
+        """ Implements read_dir in KYDBInterface """
+        return dict(self._fetch_dir(folder, recursive, pattern))
+
+    def _fetch_dir(self, folder: str, recursive: bool, pattern):
+        """ Fetch the objects in folder into the cache
+
+        Listing, fetching and deserialising overlap as get_raw_many
+        consumes the listing lazily.
+
+        :returns: yields (key, obj)
+        """
+        keys = {}
+        # (path, data) found in the local cache
+        local_hits = []
+        local_cache = self.local_cache
+
+        def paths():
+            for key in self._list_keys(folder, recursive, pattern):
+                path = self._get_full_path(key)
+                keys[path] = key
+                if local_cache is not None:
+                    data = local_cache.get(self._local_key(path))
+                    if data is not None:
+                        local_hits.append((path, data))
+                        continue
+
+                yield path
+
+        def decode(path, data):
+            obj = self._decode(path, data)
+            self._cache[path] = obj
+            self._cache_versions[path] = (None, time.time())
+            return keys.pop(path), obj
+
+        for path, data in self.get_raw_many(paths()):
+            if local_cache is not None:
+                local_cache.put(self._local_key(path), data)
+
+            while local_hits:
+                yield decode(*local_hits.pop())
+
+            yield decode(path, data)
+
+        while local_hits:
+            yield decode(*local_hits.pop())
+
+    def _list_keys(self, folder: str, recursive: bool, pattern, rel=''):
+        """ yields the keys of the objects in folder """
+        folder = self._ensure_slashes(folder)
+        for name in self.list_dir(folder):
+            if name.endswith('/'):
+                if recursive:
+                    yield from self._list_keys(
+                        folder + name, recursive, pattern, rel + name)
+            elif not pattern or fnmatchcase(rel + name, pattern):
+                yield folder + name
+
+    def get_raw_many(self, keys):
+        """
+        Get the raw data of many keys.
+
+        Fetches up to ``PREFETCH_WORKERS`` keys concurrently.
+        Derived class can override this if the DB supports batch reads.
+
+        :param keys: iterable of keys including base_path.
+                     Consumed lazily.
+        :returns: yields (key, data) of the keys that exist in any order.
+        """
+        def fetch(key):
+            try:
+                return key, self.get_raw(key)
+            except KeyError:
+                return None
+
+        max_pending = 2 * self.PREFETCH_WORKERS
+        executor = shared_executor('kydb-prefetch', self.PREFETCH_WORKERS)
+        pending = set()
+        try:
+            for key in keys:
+                pending.add(executor.submit(fetch, key))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from (x for x in (f.result() for f in done) if x)
+
+            while pending:
+                res = pending.pop().result()
+                if res:
+                    yield res
+        finally:
+            # Stopped early
+            for future in pending:
+                future.cancel()
+
     def mkdir(self, folder: str):
         """ Implements read in KYDBInterface """
         if not folder or folder == '/':
@@ -158,11 +558,112 @@ class BaseDB(ObjDBMixin, KYDBInterface):
 
         path = self._get_full_path(key)
         self._cache[path] = value
+        self._cache_versions[path] = (None, time.time())
 
         if self.is_dbobj(value):
             self.write_dbobj(value)
         else:
-            self.set_raw(path, self._serialise(value))
+            if metrics.enabled():
+                start = time.perf_counter()
+                data = self._serialise(value)
+                metrics.emit(self.url, 'serialise', path,
+                             time.perf_counter() - start,
+                             bytes_out=len(data))
+            else:
+                data = self._serialise(value)
+
+            if self.elide_unchanged:
+                digest = self._content_hash(data)
+                if self._is_unchanged(path, data, digest):
+                    # Not written, but still seen by the listeners below
+                    self.elided_writes += 1
+                    self.elided_bytes += len(data)
+                    metrics.emit(self.url, 'set_elided', path,
+                                 bytes_out=len(data))
+                else:
+                    self.set_raw(path, data)
+                    self._content_hashes[path] = digest
+            else:
+                self.set_raw(path, data)
+
+        if self.local_cache is not None:
+            self.local_cache.discard(self._local_key(path))
+
+        self._publish_change(path)
+        for listener in self._write_listeners:
+            listener(path)
+
+    def _on_raw_write(self, path: str):
+        """ path was written with set_raw, bypassing set """
+        self._on_change(path)
+        if self.local_cache is not None:
+            self.local_cache.discard(self._local_key(path))
+
+        self._publish_change(path)
+        for listener in self._write_listeners:
+            listener(path)
+
+    @staticmethod
+    def _content_hash(data) -> bytes:
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def _is_unchanged(self, path: str, data, digest: bytes) -> bool:
+        """ Is data what is already stored at path?
+
+        Compared with the version in the DB if the DB derives it from
+        content, which also shows path still exists. Else with the hash
+        of what this db last read or wrote at path, as long as path
+        has not since been deleted or expired elsewhere.
+        """
+        expected = self.content_version(data)
+        if expected is not None:
+            try:
+                if self.get_version_raw(path) != expected:
+                    return False
+            except (KeyError, NotImplementedError):
+                return False
+        elif self._content_hashes.get(path) != digest or \
+                not self.exists_raw(path):
+            return False
+
+        self._content_hashes[path] = digest
+        return True
+
+    def content_version(self, data) -> Optional[str]:
+        """
+        The version get_version_raw would return after set_raw
+        of data, if the DB derives its versions from the content.
+
+        Derived class can override this. Used by ``elide_unchanged``.
+
+        :param data: The raw, pickled data.
+        :returns: str: The version or None.
+        """
+        return None
+
+    def is_content_version(self, version: str) -> bool:
+        """
+        Was version, as returned by get_version_raw, derived from the
+        content? Not for DbObjs stamped on each write, for instance.
+
+        Derived class can override this. Used by ``kydb.sync``.
+
+        :param version: str: The version.
+        :returns: bool
+        """
+        return False
+
+    def get_size_raw(self, key: str) -> Optional[int]:
+        """
+        The length of the raw data at key, fetched without the data.
+
+        Derived class can override this. Used by ``kydb.sync``.
+
+        :param key: str:  The key including base_path.
+        :returns: int: The size or None if it is not known without
+                  reading the data. Raises KeyError if key does not exist.
+        """
+        return None
 
     def get_raw(self, key: str):
         """
@@ -175,6 +676,37 @@ class BaseDB(ObjDBMixin, KYDBInterface):
         """
         raise NotImplementedError()
 
+    def get_version_raw(self, key: str) -> str:
+        """
+        A version of the data at key that changes whenever it is written,
+        fetched without the data itself. i.e. The ETag in S3.
+
+        This is to be implemented by derived class.
+
+        :param key: str:  The key including base_path.
+        :returns: str: The version. Raises KeyError if key does not exist.
+        """
+        raise NotImplementedError()
+
+    def get_raw_with_version(self, key: str):
+        """
+        Get data and its version from the DB based on key.
+
+        Derived class can override this to fetch both in one request.
+        The version is read first so that a concurrent write can only
+        make it older than the data, never newer.
+
+        :param key: str:  The key to get, including base_path.
+        :returns: tuple of raw data and version.
+                  The version is None if the DB has none.
+        """
+        try:
+            version = self.get_version_raw(key)
+        except NotImplementedError:
+            version = None
+
+        return self.get_raw(key), version
+
     def set_raw(self, key: str, value):
         """
         Set data from the DB based on key.
@@ -186,6 +718,18 @@ class BaseDB(ObjDBMixin, KYDBInterface):
         """
         raise NotImplementedError()
 
+    def set_raw_many(self, items):
+        """
+        Set many raw values at once.
+
+        Derived class can override this if the DB supports batch writes.
+
+        :param items: iterable of (key, value) where key includes base_path
+                      and value is the raw, pickled data.
+        """
+        for key, value in items:
+            self.set_raw(key, value)
+
     def delete_raw(self, key: str):
         """
         Delete data from the DB based on key
@@ -197,14 +741,27 @@ class BaseDB(ObjDBMixin, KYDBInterface):
         """
         raise NotImplementedError()
 
+    def expire(self, key: str, ttl: float):
+        """ Implements expire in KYDBInterface """
+        self.expire_raw(self._get_full_path(key), ttl)
+
+    def expire_raw(self, key: str, ttl: float):
+        """ Same as expire but with base_path prepended """
+        raise NotImplementedError()
+
     def delete(self, key: str):
         if not self.exists(key):
             raise KeyError('Cannot delete non-existence: ' + key)
 
-        if key in self._cache:
-            del self._cache[key]
+        path = self._get_full_path(key)
+        self._cache.pop(path, None)
+        self._cache_versions.pop(path, None)
+        self._content_hashes.pop(path, None)
+        self.delete_raw(path)
+        if self.local_cache is not None:
+            self.local_cache.discard(self._local_key(path))
 
-        self.delete_raw(self._get_full_path(key))
+        self._publish_change(path)
 
     def rmdir(self, key: str):
         if key in ['.', '/', '']:
@@ -236,20 +793,140 @@ class BaseDB(ObjDBMixin, KYDBInterface):
     def ls(self, folder: str, include_dir=True):
         return list(self.list_dir(folder, include_dir))
 
+    def find(self, pattern: str, recursive=True):
+        """ Implements find in KYDBInterface """
+        if not pattern.startswith('/'):
+            pattern = '/' + pattern
+
+        # The literal part of the pattern narrows the search in the DB
+        prefix = pattern
+        for i, c in enumerate(pattern):
+            if c in GLOB_CHARS:
+                prefix = pattern[:i]
+                break
+        else:
+            pattern += '*'
+
+        folder = prefix.rsplit('/', 1)[0] + '/'
+        if recursive:
+            paths = self.find_raw(self._get_full_path(prefix))
+        elif '/' in pattern[len(folder):]:
+            # Wildcards in the folders still need the deep search
+            paths = self.find_raw(self._get_full_path(prefix))
+        else:
+            # One listing of the folder is enough
+            paths = self._find_in_folder(folder)
+
+        parts = pattern.split('/')
+        base = len(self.base_path) - 1
+        for path in paths:
+            key = path[base:]
+            # Skip folder markers and system objects
+            if '/.' in key:
+                continue
+
+            if recursive:
+                if fnmatchcase(key, pattern):
+                    yield key
+            else:
+                names = key.split('/')
+                if len(names) == len(parts) and \
+                        all(map(fnmatchcase, names, parts)):
+                    yield key
+
+    def _find_in_folder(self, folder: str):
+        """ yields the paths of the objects directly in folder """
+        path = self._get_full_path(folder)
+        try:
+            for name in self.list_dir_raw(path, False, 1000):
+                yield path + name
+        except KeyError:
+            pass
+
+    def find_raw(self, prefix: str):
+        """
+        yields the paths of everything stored under prefix,
+        including folder markers and system objects.
+
+        Derived class should override this if the DB can search
+        by prefix. The default walks the folders with list_dir.
+
+        :param prefix: str: The path prefix including base_path.
+                            Not necessarily a whole folder name.
+        """
+        return self._find_in_tree(prefix.rsplit('/', 1)[0] + '/', prefix)
+
+    def _find_in_tree(self, folder: str, prefix: str):
+        try:
+            names = list(self.list_dir_raw(folder, True, 1000))
+        except KeyError:
+            return
+
+        for name in names:
+            path = folder + name
+            if name.endswith('/'):
+                if path.startswith(prefix):
+                    yield from self._find_in_tree(path, prefix)
+            elif path.startswith(prefix):
+                yield path
+
+    def walk(self, folder: str, max_depth=None, pattern=None):
+        """ Implements walk in KYDBInterface """
+        return walk_tree(self, folder, max_depth, pattern)
+
+    def export(self, folder: str, path: str) -> int:
+        """ Implements export in KYDBInterface """
+        return snapshot.export(self, folder, path)
+
+    def import_(self, path: str, folder: str = '/') -> int:
+        """ Implements import_ in KYDBInterface """
+        return snapshot.import_(self, path, folder)
+
+    def import_raw(self, snap: 'snapshot.Snapshot', folder: str) -> int:
+        """
+        Write the contents of a snapshot into folder.
+
+        Derived class can override this to load it faster.
+
+        :param snap: The snapshot.Snapshot
+        :param folder: str: The folder including base_path, ending in /
+        :returns: The number of objects written.
+        """
+        paths = []
+        folders = []
+
+        def items():
+            for kind, key, data in snap:
+                if kind == snapshot.FOLDER:
+                    folders.append(folder + key)
+                else:
+                    paths.append(folder + key)
+                    yield folder + key, bytes(data)
+
+        self.set_raw_many(items())
+        for path in folders:
+            self.mkdir_raw(path)
+
+        for path in paths:
+            self._on_raw_write(path)
+
+        return len(paths)
+
     def rm_tree(self, key: str):
         if not self.is_dir(key):
             raise KeyError('{} is not a directory'.format(key))
 
-        folder = self._ensure_slashes(key)
-        objs = list(self.list_dir(key))
-        for obj in objs:
-            path = folder + obj
-            if obj.endswith('/'):
-                self.rm_tree(path)
-            else:
-                self.delete(path)
-
-        self.rmdir(key)
+        # The subfolders are listed concurrently while deleting
+        folders = []
+        for folder, _, objs in self.walk(key):
+            folders.append(folder)
+            for obj in objs:
+                self.delete(folder + obj)
+
+        # Deepest first
+        for folder in sorted(folders, key=lambda x: x.count('/'),
+                             reverse=True):
+            self.rmdir(folder)
 
     def new(self, class_name: str, key: str, **kwargs):
         return self.db_obj_new(class_name, key, kwargs)
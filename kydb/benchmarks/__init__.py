@@ -0,0 +1,125 @@
+"""Benchmarks of the hot paths of kydb
+
+Run against any of the db types, with in-memory stand-ins for s3,
+dynamodb and redis when ``local_services`` is set::
+
+    python -m kydb.benchmarks --db memory --db s3 --output bench.json
+    python -m kydb.benchmarks --db memory --baseline bench.json
+
+Or from python::
+
+    from kydb import benchmarks
+    results = benchmarks.run(['memory', 'files'])
+    regressions = benchmarks.compare(results, baseline)
+"""
+from .suite import BENCHMARKS, DB_URLS, get_url
+from kydb.testing import local_services as run_local_services
+from contextlib import ExitStack
+from typing import List
+import platform
+import sys
+import time
+
+DEFAULT_OPTIONS = {
+    'iterations': 50,
+    'tree_iterations': 5,
+    'value_sizes': (100, 10_000, 100_000),
+    'folder_sizes': (10, 100),
+}
+
+# The percentiles recorded, in percent
+PERCENTILES = (50, 90, 99)
+
+
+def summarise(durations: List[float]) -> dict:
+    """Throughput and latency percentiles of the durations
+
+    :param durations: seconds taken by each operation
+    :returns: dict of ops_per_sec, mean and p50, p90, p99 in milliseconds
+    """
+    n = len(durations)
+    total = sum(durations)
+    ordered = sorted(durations)
+    res = {
+        'count': n,
+        'ops_per_sec': n / total if total else float('inf'),
+        'mean_ms': 1000 * total / n,
+    }
+    for p in PERCENTILES:
+        # nearest-rank
+        idx = min(n - 1, max(0, -(-p * n // 100) - 1))
+        res[f'p{p}_ms'] = 1000 * ordered[idx]
+
+    return res
+
+
+def run(db_types=('memory',), benchmarks=None, local_services=(),
+        **options) -> dict:
+    """Run the benchmarks
+
+    :param db_types: The keys of ``DB_URLS`` to run against.
+    :param benchmarks: The names in ``BENCHMARKS`` to run. (Default all)
+    :param local_services: The services to stand in locally.
+                           See ``kydb.testing.local_services``.
+    :param options: Override ``DEFAULT_OPTIONS``
+    :returns: dict of ``meta`` and ``results``. Results are keyed by
+              ``<db_type>:<benchmark>[<param>]``
+    """
+    options = dict(DEFAULT_OPTIONS, **options)
+    names = benchmarks or list(BENCHMARKS)
+    results = {}
+    with ExitStack() as stack:
+        if local_services:
+            missing = stack.enter_context(run_local_services(local_services))
+            if missing:
+                raise ImportError('Missing local service dependencies: ' +
+                                  ', '.join(missing))
+
+        for db_type in db_types:
+            url = get_url(db_type)
+            for name in names:
+                for label, durations in BENCHMARKS[name](url, options):
+                    results[f'{db_type}:{label}'] = summarise(durations)
+
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'time': time.time(),
+            'options': options,
+        },
+        'results': results
+    }
+
+
+def compare(results: dict, baseline: dict, threshold=0.2) -> dict:
+    """Find the benchmarks slower than the baseline
+
+    :param results: as returned by ``run``
+    :param baseline: as returned by ``run``, i.e. loaded from JSON
+    :param threshold: The fraction of throughput that can be lost
+                      before it counts as a regression.
+    :returns: dict of name to the ratio of ops_per_sec over the baseline's
+    """
+    regressions = {}
+    base_results = baseline['results']
+    for name, stats in results['results'].items():
+        base = base_results.get(name)
+        if not base:
+            continue
+
+        ratio = stats['ops_per_sec'] / base['ops_per_sec']
+        if ratio < 1 - threshold:
+            regressions[name] = ratio
+
+    return regressions
+
+
+__all__ = [
+    'BENCHMARKS',
+    'DB_URLS',
+    'DEFAULT_OPTIONS',
+    'summarise',
+    'run',
+    'compare'
+]
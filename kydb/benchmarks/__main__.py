@@ -0,0 +1,75 @@
+from . import run, compare, BENCHMARKS, DB_URLS, DEFAULT_OPTIONS
+from kydb.testing import get_local_services
+import argparse
+import json
+import sys
+
+
+def _sizes(s: str):
+    return tuple(int(x) for x in s.split(','))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m kydb.benchmarks',
+        description='Benchmark the hot paths of kydb.')
+    parser.add_argument('--db', action='append', choices=list(DB_URLS),
+                        help='db type to run against (repeatable). '
+                             'Default memory')
+    parser.add_argument('--bench', action='append', choices=list(BENCHMARKS),
+                        help='benchmark to run (repeatable). Default all')
+    parser.add_argument('--iterations', type=int,
+                        default=DEFAULT_OPTIONS['iterations'])
+    parser.add_argument('--value-sizes', type=_sizes,
+                        default=DEFAULT_OPTIONS['value_sizes'],
+                        help='comma separated sizes in bytes')
+    parser.add_argument('--folder-sizes', type=_sizes,
+                        default=DEFAULT_OPTIONS['folder_sizes'],
+                        help='comma separated number of objects')
+    parser.add_argument('--no-local-services', action='store_true',
+                        help='use the real s3, dynamodb and redis instead '
+                             'of the services in $KYDB_TEST_LOCAL_SERVICES')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='JSON of a previous run '
+                                           'to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='fraction of throughput that can be lost '
+                             'before failing. Default 0.2')
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.db or ['memory'],
+        args.bench,
+        local_services=() if args.no_local_services
+        else get_local_services(),
+        iterations=args.iterations,
+        value_sizes=args.value_sizes,
+        folder_sizes=args.folder_sizes)
+
+    print(f'{"benchmark":<40} {"ops/s":>10} {"p50 ms":>9} '
+          f'{"p90 ms":>9} {"p99 ms":>9}')
+    for name, stats in results['results'].items():
+        print(f'{name:<40} {stats["ops_per_sec"]:>10.1f} '
+              f'{stats["p50_ms"]:>9.3f} {stats["p90_ms"]:>9.3f} '
+              f'{stats["p99_ms"]:>9.3f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.threshold)
+        for name, ratio in regressions.items():
+            print(f'REGRESSION {name}: {ratio:.0%} of baseline throughput')
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
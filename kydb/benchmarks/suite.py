@@ -0,0 +1,182 @@
+"""The benchmarks
+
+Each benchmark is a generator taking ``(db_url, options)`` and yielding
+``(name, durations)`` where durations are the seconds each operation took.
+Setup and tear down are not timed.
+"""
+from tempfile import gettempdir
+import os
+import time
+import kydb
+
+# The bucket and table are the same as the unit tests so that
+# kydb.testing.local_services can stand them in.
+DB_URLS = {
+    'memory': 'memory://kydb-benchmarks',
+    'files': 'files:/' + gettempdir() + '/kydb_benchmarks',
+    'redis': 'redis://{}:6379'.format(
+        os.environ.get('KINYU_UNITTEST_REDIS_HOST', 'localhost')),
+    's3': 's3://' + os.environ.get('KINYU_UNITTEST_S3_BUCKET', 'kydb-test'),
+    'dynamodb': 'dynamodb://' + os.environ.get(
+        'KINYU_UNITTEST_DYNAMODB', 'kydb-test-table'),
+}
+
+BASE_PATH = 'kydb-benchmarks'
+
+DBOBJ_CONFIG = {
+    'BenchObj': {
+        'module_path': __name__,
+        'class_name': 'BenchObj'
+    }
+}
+
+
+class BenchObj(kydb.DbObj):
+
+    @kydb.stored
+    def payload(self):
+        return b''
+
+    @kydb.stored
+    def count(self):
+        return 0
+
+
+def get_url(db_type: str) -> str:
+    return DB_URLS[db_type] + '/' + BASE_PATH
+
+
+def timed(func, iterations: int, setup=None):
+    """Time func iterations times
+
+    :param setup: Called before each iteration, untimed.
+    :returns: list of the seconds each call took
+    """
+    durations = []
+    for i in range(iterations):
+        if setup:
+            setup(i)
+
+        start = time.perf_counter()
+        func(i)
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def _value(size: int) -> bytes:
+    return os.urandom(size)
+
+
+def bench_set(url, options):
+    db = kydb.connect(url)
+    for size in options['value_sizes']:
+        value = _value(size)
+        yield f'set[{size}]', timed(
+            lambda i: db.set(f'/set/{size}/obj{i}', value),
+            options['iterations'])
+
+        db.rm_tree(f'/set/{size}')
+
+
+def bench_read(url, options):
+    db = kydb.connect(url)
+    for size in options['value_sizes']:
+        key = f'/read/{size}/obj'
+        db[key] = _value(size)
+        yield f'read[{size}]', timed(
+            lambda i: db.read(key, reload=True), options['iterations'])
+
+        db.rm_tree(f'/read/{size}')
+
+
+def bench_exists(url, options):
+    db = kydb.connect(url)
+    key = '/exists/obj'
+    db[key] = 1
+    yield 'exists[hit]', timed(
+        lambda i: db.exists(key), options['iterations'])
+    yield 'exists[miss]', timed(
+        lambda i: db.exists('/exists/missing'), options['iterations'])
+    db.rm_tree('/exists')
+
+
+def _make_folder(db, folder: str, size: int):
+    db.set_raw_many((db._get_full_path(f'{folder}/obj{i}'),
+                     db._serialise(i)) for i in range(size))
+
+
+def bench_list_dir(url, options):
+    db = kydb.connect(url)
+    for size in options['folder_sizes']:
+        folder = f'/list_dir/{size}'
+        _make_folder(db, folder, size)
+        yield f'list_dir[{size}]', timed(
+            lambda i: list(db.list_dir(folder)), options['iterations'])
+
+        db.rm_tree(folder)
+
+
+def bench_rm_tree(url, options):
+    db = kydb.connect(url)
+    for size in options['folder_sizes']:
+        folder = f'/rm_tree/{size}'
+        yield f'rm_tree[{size}]', timed(
+            lambda i: db.rm_tree(folder),
+            options['tree_iterations'],
+            setup=lambda i: _make_folder(db, folder, size))
+
+
+def bench_dbobj(url, options):
+    db = kydb.connect(url)
+    db.upload_objdb_config(DBOBJ_CONFIG)
+    for size in options['value_sizes']:
+        key = f'/dbobj/{size}/obj'
+        db.new('BenchObj', key, payload=_value(size)).write()
+
+        def read(i):
+            db.read(key, reload=True).payload()
+
+        yield f'dbobj_read[{size}]', timed(read, options['iterations'])
+        db.rm_tree(f'/dbobj/{size}')
+
+
+def bench_cache(url, options):
+    db = kydb.connect('memory://kydb-benchmarks-cache|' + url)
+    for size in options['value_sizes']:
+        key = f'/cache/{size}/obj'
+        db[key] = _value(size)
+        yield f'cache_hit[{size}]', timed(
+            lambda i: db.read(key), options['iterations'])
+
+        def evict(i):
+            db.cache_db.delete(key)
+            db.persist_db.clear_cache()
+
+        yield f'cache_miss[{size}]', timed(
+            lambda i: db.read(key), options['iterations'], setup=evict)
+        db.rm_tree(f'/cache/{size}')
+
+
+def bench_union(url, options):
+    db = kydb.connect('memory://kydb-benchmarks-union;' + url)
+    front, back = db.dbs
+    for size in options['value_sizes']:
+        key = f'/union/{size}/obj'
+        back[key] = _value(size)
+        yield f'union_fallthrough[{size}]', timed(
+            lambda i: db.read(key), options['iterations'],
+            setup=lambda i: back.clear_cache())
+        back.rm_tree(f'/union/{size}')
+
+
+BENCHMARKS = {
+    'set': bench_set,
+    'read': bench_read,
+    'exists': bench_exists,
+    'list_dir': bench_list_dir,
+    'rm_tree': bench_rm_tree,
+    'dbobj': bench_dbobj,
+    'cache': bench_cache,
+    'union': bench_union,
+}
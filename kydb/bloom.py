@@ -0,0 +1,40 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """A compact set of strings that may give false positives
+    but never false negatives.
+
+    :param capacity: The number of items expected
+    :param error_rate: The false positive rate at capacity
+
+::
+
+    bf = BloomFilter(1000)
+    bf.add('/foo')
+    '/foo' in bf # returns True
+    '/bar' in bf # returns False (most likely)
+    """
+
+    def __init__(self, capacity: int, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.num_bits = max(
+            64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(
+            1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _indexes(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str):
+        for i in self._indexes(item):
+            self._bits[i >> 3] |= 1 << (i & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[i >> 3] & (1 << (i & 7))
+                   for i in self._indexes(item))
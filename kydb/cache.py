@@ -3,16 +3,126 @@ from .interface import KYDBInterface
 from contextlib import ExitStack
 from .objdb import ObjDBMixin, DBOBJ_CONFIG_PATH
 from .dbobj import DbObj
+from .single_flight import SingleFlight
+from .refresher import BackgroundRefresher
+from . import metrics
+from urllib.parse import quote, unquote
+import logging
+import threading
+import time
 import pickle
 
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_QUEUE_PATH = '/.write-behind/'
+
 
 class CacheDB(KYDBInterface, ObjDBMixin):
     """CacheDB
+
+    :param cache_db: The fast db, i.e. redis
+    :param persist_db: The slow but durable db, i.e. s3
+    :param write_behind: If True, writes go to cache_db synchronously
+                         and are persisted to persist_db by a background
+                         worker. (Default value = False)
+    :param flush_interval: Seconds between background flushes
+                           when write_behind is on. (Default value = 1.0)
+
+Write-behind mode::
+
+    db = CacheDB(kydb.connect('redis://my-cache'),
+                 kydb.connect('s3://my-bucket'),
+                 write_behind=True)
+
+    with db:
+        for i in range(1000):
+            db['/intraday/result'] = i  # Only the last value gets to s3
+
+    # Leaving the context (or calling db.flush()) blocks until
+    # everything written so far is in persist_db.
+
+The keys waiting to be persisted are recorded in cache_db under
+``/.write-behind/`` so that they are picked up again by the next
+``CacheDB`` of the same two dbs in write-behind mode should the process
+die before flushing.
+
+The worker thread exits once nothing is pending, or after ``close``.
+Failed flushes are logged and retried with a growing delay, up to
+``WRITE_BEHIND_MAX_RETRIES`` times in a row. The keys then stay queued
+until the next write or ``flush``, which raises the error.
+
+    :param ttl: Seconds an object lives in cache_db. (Default value = None)
+    :param folder_ttls: dict of folder to ttl. Overrides ``ttl`` for
+                        objects under the folder. The deepest folder wins.
+    :param admit_reads: Only promote an object read from persist_db into
+                        cache_db once it has been read more than this many
+                        times. (Default value = 0)
+    :param admit_max_size: Only promote objects whose serialised size in bytes
+                           is no bigger than this. (Default value = None)
+
+TTL and admission::
+
+    db = kydb.connect('redis://my-cache|s3://my-bucket',
+                      ttl=3600,
+                      folder_ttls={'/market-data/': 60},
+                      admit_reads=1,
+                      admit_max_size=1024 * 1024)
+
+    :param soft_ttl: Seconds after an object is promoted into cache_db
+                     that a read of it still returns it straight away
+                     but also refreshes it from persist_db in the
+                     background. Should be less than ``ttl``, which is
+                     when reads block. (Default value = None)
+
+Stale-while-revalidate::
+
+    db = kydb.connect('redis://my-cache|s3://my-bucket',
+                      ttl=600, soft_ttl=60)
+
+    # Hot keys are refreshed in the background once a minute and
+    # never expire, so reads of them never wait on s3.
     """
 
-    def __init__(self, cache_db: BaseDB, persist_db: BaseDB):
+    # Stop counting reads of keys not yet admitted beyond this many keys
+    ADMIT_READS_MAX_KEYS = 100000
+    # Failed background flushes in a row before the worker gives up
+    WRITE_BEHIND_MAX_RETRIES = 10
+    # Most seconds between retries of a failed background flush
+    WRITE_BEHIND_MAX_BACKOFF = 60.0
+
+    def __init__(self, cache_db: BaseDB, persist_db: BaseDB,
+                 write_behind=False, flush_interval=1.0,
+                 ttl=None, folder_ttls=None,
+                 admit_reads=0, admit_max_size=None, soft_ttl=None):
         self.cache_db = cache_db
         self.persist_db = persist_db
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self.folder_ttls = sorted(
+            ((cache_db._ensure_slashes(cache_db._get_full_path(k)), v)
+             for k, v in (folder_ttls or {}).items()),
+            key=lambda x: len(x[0]), reverse=True)
+        self.admit_reads = admit_reads
+        self.admit_max_size = admit_max_size
+        self._read_counts = {}
+        self.soft_ttl = soft_ttl
+        # key -> when this process last promoted it into cache_db
+        self._promoted_at = {}
+        self._refresher = BackgroundRefresher() if soft_ttl else None
+        self._single_flight = SingleFlight()
+        self._dbobj_classes = {}
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._stop = threading.Event()
+        # Per pair of dbs, as others may share cache_db
+        self._queue_folder = WRITE_BEHIND_QUEUE_PATH + quote(
+            f'{cache_db.url}|{persist_db.url}', safe='') + '/'
+
+        if write_behind:
+            self._recover_pending()
 
     def cache_context(self) -> 'KYDBInterface':
         """This is related to in memory cache
@@ -33,6 +143,27 @@ class CacheDB(KYDBInterface, ObjDBMixin):
     def ls(self, folder: str, include_dir=True):
         return list(self.list_dir(folder, include_dir))
 
+    def export(self, folder: str, path: str) -> int:
+        """Export always looks at the persist_db"""
+        self.flush()
+        return self.persist_db.export(folder, path)
+
+    def import_(self, path: str, folder: str = '/') -> int:
+        """Import into the persist_db
+
+        cache_db is filled as the objects are read. Objects already
+        in cache_db are not replaced.
+        """
+        return self.persist_db.import_(path, folder)
+
+    def walk(self, folder: str, max_depth=None, pattern=None):
+        """Walk always looks at the persist_db"""
+        return self.persist_db.walk(folder, max_depth, pattern)
+
+    def find(self, pattern: str, recursive=True):
+        """Find always looks at the persist_db"""
+        yield from self.persist_db.find(pattern, recursive)
+
     def __repr__(self):
         """
         The representation of the db.
@@ -54,7 +185,210 @@ class CacheDB(KYDBInterface, ObjDBMixin):
         the two dbs will be out of sync
         """
         self.cache_db[key] = value
-        self.persist_db[key] = value
+        path = self.cache_db._get_full_path(key)
+        if self.write_behind:
+            self._enqueue(self.cache_db._ensure_slashes(key)[:-1])
+        else:
+            self.persist_db[key] = value
+            self._expire(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def flush(self):
+        """Block until all pending write-behind writes are in persist_db
+
+        Does nothing if write_behind is off.
+        """
+        self._drain()
+
+    def close(self):
+        """Stop the write-behind worker and flush what is pending"""
+        self._stop.set()
+        worker = self._worker
+        if worker is not None:
+            worker.join()
+
+        self.flush()
+
+    def _recover_pending(self):
+        """Re-queue writes left over by a previous process"""
+        try:
+            names = list(self.cache_db.list_dir_raw(
+                self._queue_folder, False, 200))
+        except KeyError:
+            return
+
+        with self._pending_lock:
+            self._pending.update(unquote(x) for x in names)
+            if self._pending:
+                self._ensure_worker()
+
+    def _queue_path(self, key: str) -> str:
+        return self._queue_folder + quote(key, safe='')
+
+    def _relative_key(self, path: str) -> str:
+        """The key of path without cache_db's base_path"""
+        base_path = self.cache_db.base_path
+        return path[len(base_path) - 1:] if path.startswith(base_path) \
+            else path
+
+    def _enqueue(self, key: str):
+        """Queue key, without base_path, to be written to persist_db"""
+        with self._pending_lock:
+            if key not in self._pending:
+                self.cache_db.set_raw(self._queue_path(key),
+                                      self.cache_db._serialise(True))
+                self._pending.add(key)
+
+            self._ensure_worker()
+
+    def _ensure_worker(self):
+        """Start the worker if it is not running. Call with _pending_lock"""
+        if self._worker is None and not self._stop.is_set():
+            self._worker = threading.Thread(
+                target=self._run_worker, daemon=True,
+                name='kydb-write-behind')
+            self._worker.start()
+
+    def _run_worker(self):
+        failures = 0
+        while not self._stop.wait(min(
+                self.flush_interval * 2 ** failures,
+                self.WRITE_BEHIND_MAX_BACKOFF)):
+            try:
+                self._drain()
+                failures = 0
+            except Exception:
+                failures += 1
+                logger.exception('Write-behind flush to %s failed (%d/%d)',
+                                 self.persist_db.url, failures,
+                                 self.WRITE_BEHIND_MAX_RETRIES)
+
+            with self._pending_lock:
+                if not self._pending or \
+                        failures >= self.WRITE_BEHIND_MAX_RETRIES:
+                    self._worker = None
+                    return
+
+        with self._pending_lock:
+            self._worker = None
+
+    def _drain(self):
+        """Persist every pending key in one batch
+
+        Repeated writes to the same key since the last drain
+        are coalesced into one write of the latest value.
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                batch = self._pending
+                self._pending = set()
+
+            if not batch:
+                return
+
+            items = []
+            try:
+                for key in batch:
+                    try:
+                        data = self.cache_db.get_raw(
+                            self.cache_db._get_full_path(key))
+                    except KeyError:
+                        # Deleted since, nothing to persist
+                        continue
+
+                    items.append((self.persist_db._get_full_path(key), data))
+
+                self.persist_db.set_raw_many(items)
+            except Exception:
+                with self._pending_lock:
+                    self._pending.update(batch)
+                raise
+
+            for path, _ in items:
+                self.persist_db._on_raw_write(path)
+
+            with self._pending_lock:
+                for key in batch:
+                    if key not in self._pending:
+                        self.cache_db.delete_raw(self._queue_path(key))
+                        # Only safe to expire once it is persisted
+                        self._expire(self.cache_db._get_full_path(key))
+
+    def _get_ttl(self, path: str):
+        for folder, ttl in self.folder_ttls:
+            if path.startswith(folder):
+                return ttl
+
+        return self.ttl
+
+    def _expire(self, path: str):
+        ttl = self._get_ttl(path)
+        if ttl is not None:
+            self.cache_db.expire_raw(path, ttl)
+
+    def _admit(self, key: str, data: bytes) -> bool:
+        """Should the object read from persist_db go into cache_db?"""
+        if self.admit_max_size is not None and \
+                len(data) > self.admit_max_size:
+            return False
+
+        if not self.admit_reads:
+            return True
+
+        count = self._read_counts.get(key, 0) + 1
+        if count > self.admit_reads:
+            self._read_counts.pop(key, None)
+            return True
+
+        if len(self._read_counts) >= self.ADMIT_READS_MAX_KEYS:
+            self._read_counts.clear()
+
+        self._read_counts[key] = count
+        return False
+
+    def _refresh_if_due(self, key: str):
+        """Refresh key from persist_db in the background past soft_ttl"""
+        promoted = self._promoted_at.get(key)
+        if promoted is None:
+            # Promoted by another process, start counting from now
+            if len(self._promoted_at) >= self.ADMIT_READS_MAX_KEYS:
+                self._promoted_at.clear()
+
+            self._promoted_at[key] = time.time()
+        elif time.time() - promoted >= self.soft_ttl:
+            self._refresher.submit(key, lambda: self._refresh(key))
+
+    def _refresh(self, key: str):
+        item = self.persist_db.read(key, reload=True)
+        self._promote(key, item, force=True)
+        # So the next read does not get the old object
+        # from cache_db's in-process cache
+        self.cache_db._cache.pop(self.cache_db._get_full_path(key), None)
+
+    def _promote(self, key: str, item, force=False):
+        """Write the item read from persist_db into cache_db
+
+        :param force: Skip the admission policy.
+        """
+        if self.is_dbobj(item):
+            data = pickle.dumps(self.get_dbobj_data(item))
+        else:
+            data = self.cache_db._serialise(item)
+
+        if not force and not self._admit(key, data):
+            return
+
+        if self.soft_ttl is not None:
+            self._promoted_at[key] = time.time()
+
+        path = self.cache_db._get_full_path(key)
+        self.cache_db.set_raw(path, data)
+        self._expire(path)
 
     def delete(self, key: str):
         """Delete the item in both cache_db and persist_db
@@ -62,6 +396,7 @@ class CacheDB(KYDBInterface, ObjDBMixin):
         Warning: If cache_db deletes successfully and persist_db fails
         the two dbs will be out of sync
         """
+        self.flush()
         self.cache_db.delete(key)
         self.persist_db.delete(key)
 
@@ -71,6 +406,7 @@ class CacheDB(KYDBInterface, ObjDBMixin):
         Warning: If cache_db deletes successfully and persist_db fails
         the two dbs will be out of sync
         """
+        self.flush()
         self.cache_db.rmdir(key)
         self.persist_db.rmdir(key)
 
@@ -80,6 +416,7 @@ class CacheDB(KYDBInterface, ObjDBMixin):
         Warning: If cache_db deletes successfully and persist_db fails
         the two dbs will be out of sync
         """
+        self.flush()
         self.cache_db.rm_tree(key)
         self.persist_db.rm_tree(key)
 
@@ -94,6 +431,8 @@ class CacheDB(KYDBInterface, ObjDBMixin):
         """Refresh both cache_db and persist_db"""
         self.cache_db.refresh(key)
         self.persist_db.refresh(key)
+        if not key or key == DBOBJ_CONFIG_PATH:
+            self._clear_dbobj_classes()
 
     def read(self, key: str, reload=False):
         """Get Item from CacheDB
@@ -101,29 +440,59 @@ class CacheDB(KYDBInterface, ObjDBMixin):
         Try to get the item from the cache_db first
         If it does not exist, get it from the persist_db
         and then write it to the cache_db
-        """
-
-        def _ensure_db(obj):
-            if isinstance(obj, DbObj):
-                obj.db = self
-
-            return obj
 
+        Concurrent reads of the same key that miss cache_db
+        share one fetch from persist_db.
+        """
         if self.cache_db.exists(key):
+            metrics.emit(self.cache_db.url, 'cachedb_hit', key)
             raw_data = self.cache_db.get_raw(key)
 
             data = pickle.loads(raw_data)
             if self.is_data_dbobj(data):
-                m = data['meta']
-                return self.db_obj_new(m['class_name'], m['key'], data['data'])
+                res = self.read_dbobj(data)
+            else:
+                res = self._ensure_db(self.cache_db[key])
+
+            if self.soft_ttl is not None:
+                self._refresh_if_due(key)
 
-            return _ensure_db(self.cache_db[key])
+            return res
 
-        item = _ensure_db(self.persist_db[key])
-        self.cache_db[key] = item
+        metrics.emit(self.cache_db.url, 'cachedb_miss', key)
+        return self._single_flight.do(
+            key, lambda: self._read_through(key))
 
+    def _read_through(self, key: str):
+        item = self._ensure_db(self.persist_db[key])
+        self._promote(key, item)
         return item
 
+    def prefetch(self, folder: str, recursive=False, pattern=None) -> int:
+        """Fetch the objects in folder from persist_db and
+        write them into cache_db"""
+        return len(self.read_dir(folder, recursive, pattern))
+
+    def read_dir(self, folder: str, recursive=False, pattern=None) -> dict:
+        """Read the objects in folder from persist_db
+
+        They are written into cache_db the same as ``read`` would.
+        """
+        res = {}
+        for key, item in self.persist_db._fetch_dir(
+                folder, recursive, pattern):
+            item = self._ensure_db(item)
+            self._promote(key, item)
+            res[key] = item
+
+        return res
+
+    def _ensure_db(self, obj):
+        if isinstance(obj, DbObj):
+            obj.db = self
+
+        return obj
+
     def mkdir(self, folder: str):
         """Apply mkdir to both cache_db and persist_db"""
         self.cache_db.mkdir(folder)
@@ -137,6 +506,7 @@ class CacheDB(KYDBInterface, ObjDBMixin):
         """Upload objdb_config to both cache_db and persist_db"""
         self.cache_db.upload_objdb_config(objdb_config)
         self.persist_db.upload_objdb_config(objdb_config)
+        self._clear_dbobj_classes()
 
     def _get_dbobj_config(self, class_name: str):
         if not self.cache_db.exists(DBOBJ_CONFIG_PATH):
@@ -145,6 +515,21 @@ class CacheDB(KYDBInterface, ObjDBMixin):
 
         return super()._get_dbobj_config(class_name)
 
+    def watch(self, feed=None):
+        """Watch both cache_db and persist_db
+
+        :param feed: Not supported as each db needs its own feed.
+        """
+        if feed is not None:
+            raise ValueError('CacheDB watches with the default feeds')
+
+        self.cache_db.watch()
+        self.persist_db.watch()
+
+    def unwatch(self):
+        self.cache_db.unwatch()
+        self.persist_db.unwatch()
+
     def clear_cache(self):
         """Clear the cache
 
@@ -154,15 +539,38 @@ class CacheDB(KYDBInterface, ObjDBMixin):
         """
         self.cache_db.clear_cache()
         self.persist_db.clear_cache()
+        self._clear_dbobj_classes()
+
+    def set_dbobj_raw(self, key: str, data: dict, changed=None):
+        """
+        Set the data of a DbObj both on cache_db and persist_db
+
+        In write_behind mode persist_db is written in the background.
+        """
+        if self.write_behind:
+            self.cache_db.set_dbobj_raw(key, data, changed)
+            self._enqueue(self._relative_key(key))
+            return
+
+        self.persist_db.set_dbobj_raw(key, data, changed)
+        self.cache_db.set_dbobj_raw(key, data, changed)
+        self._expire(key)
 
     def set_raw(self, key: str, value):
         """
         Set data from the DB based on key.
 
-        It will set it both on cache_db and persist_db
+        It will set it both on cache_db and persist_db.
+        In write_behind mode persist_db is written in the background.
 
         :param key: str:  The key to set, including base_path.
         :param value: The raw, pickled data.
         """
+        if self.write_behind:
+            self.cache_db.set_raw(key, value)
+            self._enqueue(self._relative_key(key))
+            return
+
         self.persist_db.set_raw(key, value)
         self.cache_db.set_raw(key, value)
+        self._expire(key)
@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+from .dbobj import computed_scope
 import copy
 
 
@@ -13,6 +14,7 @@ def cache_context(db):
     db._cache = copy.copy(orig_cache)
 
     try:
-        yield db
+        with computed_scope():
+            yield db
     finally:
         db._cache = orig_cache
@@ -0,0 +1,279 @@
+"""Change feeds tell a db which of its cached objects were
+written elsewhere so only those are dropped from the cache.
+
+::
+
+    db = kydb.connect('redis://my-host')
+    db.watch()
+
+    db['/foo'] # cached
+    # another process writes /foo
+    db['/foo'] # read again from redis
+"""
+import os
+import threading
+import time
+import uuid
+
+# Changes published by ChangeLogFeed are objects in this folder,
+# at the root of the db regardless of base_path.
+CHANGE_LOG_PATH = '/.changes/'
+
+
+class ChangeFeed:
+    """Base class of the change feeds
+
+    Derived classes implement ``publish`` and ``poll``, or
+    override ``start`` if changes are pushed to them.
+
+    :param db: The db to watch
+    :param interval: Seconds between polls
+    """
+
+    def __init__(self, db, interval=1.0):
+        self.db = db
+        self.interval = interval
+        # Identifies the changes published by this feed
+        self.origin = uuid.uuid4().hex
+        self._callback = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        """Call callback with the path of each object changed elsewhere"""
+        self._callback = callback
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True,
+            name=f'kydb-change-feed-{self.db.db_name}')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+        self._thread = None
+
+    def publish(self, path: str):
+        """Tell the other watchers path has been written or deleted
+
+        :param path: The path including base_path
+        """
+        pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                # Keep watching through transient errors
+                pass
+
+    def poll(self):
+        """Notify the changes since the last poll"""
+        raise NotImplementedError()
+
+    def _notify(self, path: str):
+        self._callback(path)
+
+
+class RedisChangeFeed(ChangeFeed):
+    """Changes published on a redis pub/sub channel per db"""
+
+    def __init__(self, db, interval=1.0):
+        super().__init__(db, interval)
+        self.channel = f'kydb-changes:{db.db_name}'
+        self._pubsub = None
+
+    def start(self, callback):
+        # Subscribe before returning so no change published after is missed
+        self._pubsub = self.db.connection.pubsub(
+            ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+        super().start(callback)
+
+    def stop(self):
+        super().stop()
+        if self._pubsub:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def publish(self, path: str):
+        self.db.connection.publish(self.channel, f'{self.origin} {path}')
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                self._stop.wait(self.interval)
+
+    def poll(self):
+        message = self._pubsub.get_message(timeout=self.interval)
+        if not message:
+            return
+
+        data = message['data']
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        origin, path = data.split(' ', 1)
+        if origin != self.origin:
+            self._notify(path)
+
+
+class FileChangeFeed(ChangeFeed):
+    """Polls the modification time of the cached files
+
+    Nothing needs publishing, the file system is the feed.
+    """
+
+    def start(self, callback):
+        self._last_poll = time.time_ns()
+        super().start(callback)
+
+    def poll(self):
+        last_poll, self._last_poll = self._last_poll, time.time_ns()
+        for path in list(self.db._cache):
+            try:
+                mtime = os.stat(self.db._get_fs_path(path)).st_mtime_ns
+            except FileNotFoundError:
+                self._notify(path)
+                continue
+
+            if mtime >= last_poll:
+                self._notify(path)
+
+
+class ChangeLogFeed(ChangeFeed):
+    """Changes are objects in ``/.changes/`` of the db itself
+
+    Works on any db but costs an extra write to the db for every
+    ``set`` and ``delete``, plus the folder markers of a new bucket on
+    dbs without real folders.
+
+    Changes are bucketed into a folder per ``BUCKET_SECONDS`` so each
+    poll only lists the buckets within lookback, not the whole log.
+    A change is noticed if it becomes visible within lookback seconds
+    of its time stamp, so lookback must cover the clock skew between
+    writers and how long the db takes to list new objects. Changes are
+    pruned after retention, so it is best-effort.
+
+    :param retention: Seconds changes are kept for
+    :param lookback: Seconds behind now that each poll looks for changes
+    """
+
+    # Seconds of changes per folder of the log
+    BUCKET_SECONDS = 10
+
+    def __init__(self, db, interval=1.0, retention=3600, lookback=30):
+        super().__init__(db, interval)
+        self.retention = retention
+        self.lookback = lookback
+        self._count = 0
+        self._lock = threading.Lock()
+        # Names of the changes seen within lookback
+        self._seen = set()
+        self._last_prune = 0.0
+
+    def start(self, callback):
+        # Only changes from now on are notified
+        self._seen = set(self._list_recent(time.time_ns()))
+        super().start(callback)
+
+    @staticmethod
+    def _stamp(ns: int) -> str:
+        return f'{ns:020d}'
+
+    @classmethod
+    def _bucket(cls, ns: int) -> str:
+        return f'{ns // (cls.BUCKET_SECONDS * 10 ** 9):012d}'
+
+    def publish(self, path: str):
+        with self._lock:
+            self._count += 1
+            count = self._count
+
+        ns = time.time_ns()
+        name = f'{self._stamp(ns)}-{self.origin}-{count}'
+        self.db.set_raw(f'{CHANGE_LOG_PATH}{self._bucket(ns)}/{name}',
+                        self.db._serialise(path))
+
+    def _list_recent(self, now: int):
+        """yields the names of the changes in the buckets within lookback"""
+        ns = now - int(self.lookback * 1e9)
+        end = self._bucket(now)
+        while True:
+            bucket = self._bucket(ns)
+            try:
+                for name in self.db.list_dir_raw(
+                        f'{CHANGE_LOG_PATH}{bucket}/', False, 1000):
+                    yield bucket + '/' + name
+            except KeyError:
+                pass
+
+            if bucket >= end:
+                return
+
+            ns += self.BUCKET_SECONDS * 10 ** 9
+
+    def poll(self):
+        now = time.time_ns()
+        oldest = self._stamp(now - int(self.lookback * 1e9))
+        recent = set()
+        for name in self._list_recent(now):
+            # Not by the last name seen, which would skip changes
+            # that show up late or were stamped by a clock behind
+            change = name.split('/', 1)[1]
+            if change < oldest:
+                continue
+
+            recent.add(name)
+            if name not in self._seen and \
+                    change.split('-')[1] != self.origin:
+                self._read_change(name)
+
+        # Forget what fell out of lookback
+        self._seen = recent
+
+        if now / 1e9 - self._last_prune >= self.BUCKET_SECONDS:
+            self._last_prune = now / 1e9
+            self._prune(now)
+
+    def _read_change(self, name: str):
+        try:
+            data = self.db.get_raw(CHANGE_LOG_PATH + name)
+        except KeyError:
+            return
+
+        self._notify(self.db._deserialise(data))
+
+    def _prune(self, now: int):
+        """Remove the buckets older than retention"""
+        expired = self._bucket(now - int(self.retention * 1e9))
+        try:
+            buckets = [x[:-1] for x in self.db.list_dir_raw(
+                CHANGE_LOG_PATH, True, 1000) if x.endswith('/')]
+        except KeyError:
+            return
+
+        for bucket in buckets:
+            if bucket >= expired:
+                continue
+
+            folder = f'{CHANGE_LOG_PATH}{bucket}/'
+            try:
+                for name in list(self.db.list_dir_raw(folder, False, 1000)):
+                    self._delete(folder + name)
+
+                self.db.rmdir_raw(folder)
+            except (KeyError, FileNotFoundError, OSError):
+                # Pruned by another watcher
+                pass
+
+    def _delete(self, path: str):
+        try:
+            self.db.delete_raw(path)
+        except (KeyError, FileNotFoundError):
+            pass
@@ -5,5 +5,6 @@ DB_MODULES = {
     's3': 'S3DB',
     'http': 'HttpDB',
     'https': 'HttpsDB',
-    'files': 'FileDB'
+    'files': 'FileDB',
+    'diskcache': 'DiskCacheDB'
 }
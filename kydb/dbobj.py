@@ -1,5 +1,73 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from weakref import WeakKeyDictionary, ref
+import threading
+import pickle
+
 IS_DB_OBJ = '__is_dbobj__'
 
+# Memoised results of @computed methods. One table per cache context,
+# the innermost last. Each table maps obj -> {(name, args): result}
+_memo_tables = ContextVar('kydb_memo_tables', default=(WeakKeyDictionary(),))
+
+# The computed calls in progress on this thread, innermost last
+_computing = threading.local()
+
+
+def _computing_stack() -> list:
+    try:
+        return _computing.stack
+    except AttributeError:
+        _computing.stack = []
+        return _computing.stack
+
+
+def _add_dependent(obj, source):
+    """The computed call in progress depends on source of obj
+
+    :param source: a stored value name or (name, args) of a computed call
+    """
+    stack = _computing_stack()
+    if stack:
+        dep_obj, name, args = stack[-1]
+        # Weak so objects computed from obj are still freed
+        obj._dependents.setdefault(source, set()).add(
+            (ref(dep_obj), name, args))
+
+
+def _invalidate(obj, source):
+    """Drop the memoised results that depend on source of obj"""
+    dependents = obj._dependents.pop(source, None)
+    if not dependents:
+        return
+
+    tables = _memo_tables.get()
+    for dep_ref, name, args in dependents:
+        dep_obj = dep_ref()
+        if dep_obj is None:
+            continue
+
+        for table in tables:
+            memo = table.get(dep_obj)
+            if memo:
+                memo.pop((name, args), None)
+
+        _invalidate(dep_obj, (name, args))
+
+
+@contextmanager
+def computed_scope():
+    """Results of @computed methods calculated within this
+    context are forgotten on exit.
+
+    Used by ``cache_context``.
+    """
+    token = _memo_tables.set(_memo_tables.get() + (WeakKeyDictionary(),))
+    try:
+        yield
+    finally:
+        _memo_tables.reset(token)
+
 
 class StoredValue:
     """Any function decorated with @kydb.stored would
@@ -16,13 +84,14 @@ class StoredValue:
         def name(self):
             return 'John'
     """
+    __slots__ = ('_obj', '_attr')
 
-    def __init__(self, default_func):
-        self._default_func = default_func
-        self._value = None
+    def __init__(self, obj, attr):
+        self._obj = obj
+        self._attr = attr
 
-    def get_default(self, obj):
-        return self._default_func()
+    def get_default(self, obj=None):
+        return self._attr.default_func(self._obj)
 
     def setvalue(self, value):
         """Set the value
@@ -35,7 +104,9 @@ example::
     greeter.name() # returns 'Jane'
 
         """
-        self._value = value
+        self._obj._stored_values[self._attr.name] = value
+        self._obj._dirty.add(self._attr.name)
+        _invalidate(self._obj, self._attr.name)
 
     def clear(self):
         """Clears the value.
@@ -51,10 +122,100 @@ example::
     greeter.name() # returns 'John'
 
         """
-        self._value = self.get_default(self)
+        self.setvalue(self.get_default())
 
     def __call__(self):
-        return self._value
+        _add_dependent(self._obj, self._attr.name)
+        try:
+            return self._obj._stored_values[self._attr.name]
+        except KeyError:
+            return self._obj._load_stored_value(self._attr.name)
+
+
+class StoredAttribute:
+    """The descriptor @kydb.stored puts on the class in place of the method
+
+    Accessing it on an object returns a StoredValue bound to that object.
+    The values themselves live in the object's ``_stored_values`` dict.
+    """
+
+    def __init__(self, default_func):
+        self.default_func = default_func
+        self.name = default_func.__name__
+        self.__doc__ = default_func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+
+        return StoredValue(obj, self)
+
+
+class ComputedValue:
+    """Any method decorated with @kydb.computed would
+        turn the method into a ComputedValue
+
+    Calling it returns the memoised result if there is one.
+    """
+    __slots__ = ('_obj', '_attr')
+
+    def __init__(self, obj, attr):
+        self._obj = obj
+        self._attr = attr
+
+    def __call__(self, *args):
+        obj = self._obj
+        call = (self._attr.name, args)
+        _add_dependent(obj, call)
+
+        tables = _memo_tables.get()
+        # Results of the enclosing contexts are still valid
+        for table in reversed(tables):
+            memo = table.get(obj)
+            if memo is not None and call in memo:
+                return memo[call]
+
+        stack = _computing_stack()
+        stack.append((obj,) + call)
+        try:
+            res = self._attr.func(obj, *args)
+        finally:
+            stack.pop()
+
+        tables[-1].setdefault(obj, {})[call] = res
+        return res
+
+    def invalidate(self, *args):
+        """Forget the memoised result for args"""
+        call = (self._attr.name, args)
+        for table in _memo_tables.get():
+            memo = table.get(self._obj)
+            if memo:
+                memo.pop(call, None)
+
+        _invalidate(self._obj, call)
+
+
+class ComputedAttribute:
+    """The descriptor @kydb.computed puts on the class in place of the method
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+
+        return ComputedValue(obj, self)
 
 
 class DbObj:
@@ -79,28 +240,127 @@ class DbObj:
 
     """
 
+    # The stored attribute names and their StoredAttribute, in the same order.
+    # Worked out once per class in __init_subclass__
+    _stored_attrs = ()
+    _stored_attributes = ()
+    # Set by write while _segments are up to date
+    _segments_current = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        attrs = {}
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if isinstance(value, StoredAttribute):
+                    attrs[name] = value
+                elif name in attrs:
+                    # Overridden by something that is not stored
+                    del attrs[name]
+
+        cls._stored_attrs = tuple(sorted(attrs))
+        cls._stored_attributes = tuple(attrs[x] for x in cls._stored_attrs)
+
     def __init__(self, db, class_name: str, key: str, **kwargs):
         self.class_name = class_name
         self.db = db
         self.key = key
 
-        self._stored_attrs = [x for x in dir(self) if
-                              is_marked_as_stored_value(getattr(self, x))]
+        values = {}
+        for attr in self._stored_attributes:
+            v = kwargs.get(attr.name)
+            values[attr.name] = attr.default_func(self) if v is None else v
+
+        self._stored_values = values
+        # Pickled stored values as last read or written
+        self._segments = {}
+        # Stored values changed since last read or written
+        self._dirty = set(self._stored_attrs)
+        self._persisted = False
+        # stored value name or computed call -> computed calls using it,
+        # as (weakref to obj, name, args)
+        self._dependents = {}
+        self.init()
 
-        for attr in self._stored_attrs:
-            setattr(self, attr, StoredValue(getattr(self, attr)))
+    @classmethod
+    def _from_segments(cls, db, class_name: str, key: str, segments: dict):
+        """Create the object from the pickled stored values in the DB
 
-        setattr(self, IS_DB_OBJ, True)
+        The stored values are only unpickled when first accessed.
+        """
+        obj = cls.__new__(cls)
+        obj.class_name = class_name
+        obj.db = db
+        obj.key = key
+        obj._stored_values = {}
+        obj._segments = {}
+        for attr in cls._stored_attributes:
+            segment = segments.get(attr.name)
+            if segment is None:
+                obj._stored_values[attr.name] = attr.default_func(obj)
+            else:
+                obj._segments[attr.name] = segment
+
+        obj._dirty = set()
+        obj._persisted = True
+        obj._dependents = {}
+        obj.init()
+        return obj
+
+    def _load_stored_value(self, name: str):
+        # Once in _stored_values it is compared with its segment on write
+        # in case it is changed in place
+        value = pickle.loads(self._segments[name])
+        self._stored_values[name] = value
+        return value
+
+    def _get_segments(self) -> dict:
+        """The pickled stored values
+
+        Values never accessed since last read are not pickled again,
+        nor any value if ``write`` has just pickled them.
+        """
+        if not self._segments_current:
+            self._update_segments()
 
-        for attr in self._stored_attrs:
-            sv = getattr(self, attr)
-            v = kwargs.get(attr)
-            if v is None:
-                v = sv.get_default(self)
+        return dict(self._segments)
 
-            sv.setvalue(v)
+    def _update_segments(self):
+        """Pickle the values accessed or set and mark those whose
+        pickle changed as dirty
 
-        self.init()
+        This finds changes made in place, i.e. appending to a stored list,
+        which ``setvalue`` never sees.
+        """
+        segments = self._segments
+        for name, value in self._stored_values.items():
+            segment = pickle.dumps(value)
+            if segments.get(name) != segment:
+                segments[name] = segment
+                self._dirty.add(name)
+
+    def _mark_clean(self):
+        """After _segments are written"""
+        self._dirty = set()
+        self._persisted = True
+
+    def is_dirty(self) -> bool:
+        """True if the object has changes that are not yet written
+
+example::
+
+    greeter = db[key]
+    greeter.is_dirty() # returns False
+    greeter.name.setvalue('Jane')
+    greeter.is_dirty() # returns True
+    greeter.write()
+    greeter.is_dirty() # returns False
+        """
+        if not self._persisted:
+            return True
+
+        self._update_segments()
+        return bool(self._dirty)
 
     def init(self):
         """ Implement this to add additional initialisation
@@ -140,16 +400,72 @@ class DbObj:
         return {x: getattr(self, x)() for x in self._stored_attrs}
 
     def write(self):
-        self.db[self.key] = self
+        """Write the object to the DB
+
+        Does nothing if no stored value changed since the object was
+        last read or written. Otherwise DBs that can, i.e. redis and
+        dynamodb, only write the stored values that changed.
+
+        Values changed in place are found by pickling again every
+        value accessed and comparing it with what was read.
+        """
+        if self._persisted:
+            self._update_segments()
+            if not self._dirty:
+                return
+
+            # Not pickled again on the way to the DB
+            self._segments_current = True
+
+        try:
+            self.db[self.key] = self
+        finally:
+            self._segments_current = False
 
     def delete(self):
         self.db.delete(self.key)
 
 
+setattr(DbObj, IS_DB_OBJ, True)
+
+
 def is_marked_as_stored_value(f):
-    return hasattr(f, '_marked_as_stored_value')
+    return isinstance(f, StoredAttribute)
 
 
 def stored(f):
-    f._marked_as_stored_value = True
-    return f
+    return StoredAttribute(f)
+
+
+def computed(f):
+    """Memoise the result of a DbObj method
+
+    The result is recalculated only after a stored value it used,
+    directly or through other DbObjs and computed methods, is changed
+    with ``setvalue`` or ``clear``. Arguments must be hashable.
+
+    Results calculated within a ``cache_context`` are forgotten
+    when it exits.
+
+example::
+
+    class Position(kydb.DbObj):
+
+        @kydb.stored
+        def qty(self):
+            return 0
+
+        @kydb.stored
+        def quote(self):
+            return None
+
+        @kydb.computed
+        def value(self):
+            return self.qty() * self.quote().price()
+
+    pos.value() # calculated
+    pos.value() # memoised
+    pos.quote().price.setvalue(101)
+    pos.value() # calculated again
+    """
+    return ComputedAttribute(f)
@@ -0,0 +1,25 @@
+"""Thread pools shared by the whole process, so calls that fan out,
+i.e. walk and get_raw_many, do not each start their own.
+
+Tasks on a pool must not wait for other tasks on the same pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+# (name, max_workers) -> executor
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def shared_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """The pool named name with max_workers threads
+
+    :param name: Used as the prefix of the thread names
+    """
+    with _executors_lock:
+        executor = _executors.get((name, max_workers))
+        if executor is None:
+            executor = _executors[(name, max_workers)] = ThreadPoolExecutor(
+                max_workers, thread_name_prefix=name)
+
+        return executor
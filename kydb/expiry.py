@@ -0,0 +1,26 @@
+import time
+
+
+class ExpiryEmulationMixin:
+    """ Used for providing expire for DB implementations
+        that does not have such mechanics.
+
+        The expiry times are only known to this process.
+        An expired key is deleted when it is next accessed.
+    """
+
+    def expire_raw(self, key: str, ttl: float):
+        self._expiries[key] = time.time() + ttl
+
+    def _expire_if_due(self, key: str) -> bool:
+        """ Returns True if key was expired and deleted """
+        expiry = self._expiries.get(key)
+        if expiry is not None and expiry <= time.time():
+            del self._expiries[key]
+            self.delete_raw(key)
+            return True
+
+        return False
+
+    def _clear_expiry(self, key: str):
+        self._expiries.pop(key, None)
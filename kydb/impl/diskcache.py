@@ -0,0 +1,129 @@
+from kydb.base import BaseDB
+from kydb.local_cache import LocalCache
+from kydb import metrics
+import os
+
+DEFAULT_MAX_SIZE = 10 << 30
+
+
+def default_path() -> str:
+    return os.environ.get('KYDB_DISKCACHE_PATH') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'kydb')
+
+
+class DiskCacheDB(BaseDB):
+    """
+    A read-through cache on local disk in front of another db.
+
+    Prefix the url of the db with ``diskcache+``::
+
+        db = kydb.connect('diskcache+s3://my-bucket')
+
+    The raw bytes read are kept under ``~/.cache/kydb``, or
+    ``$KYDB_DISKCACHE_PATH``, so they survive restarts and are shared by
+    the processes on the host. The least recently read are evicted
+    beyond max_size.
+
+    Before a cached entry is used its version is checked against the db
+    with one small request, i.e. HEAD for the ETag in S3. DBs without
+    versions rely on the ttl alone.
+
+    Configured with the ``diskcache`` section in ``$KYDB_CONFIG_PATH``::
+
+        dbs:
+          my-bucket:
+            diskcache:
+              path: /mnt/nvme/kydb
+              max_size: 107374182400
+              ttl: 86400
+              validate: true
+
+    Writes and everything else go straight to the db behind.
+    """
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        from kydb.api import _connect
+        self.db = _connect(url.split('+', 1)[1])
+        config = (self._config or {}).get('diskcache') or {}
+        self.disk_cache = LocalCache(
+            config.get('path') or default_path(),
+            config.get('max_size', DEFAULT_MAX_SIZE),
+            config.get('ttl'))
+        self.validate = config.get('validate', True)
+
+    def get_raw(self, key: str):
+        local_key = self.db._local_key(key)
+        entry = self.disk_cache.get_entry(local_key)
+        if entry is not None:
+            data, version = entry
+            if self._is_valid(key, version):
+                metrics.emit(self.url, 'diskcache_hit', key)
+                return data
+
+        metrics.emit(self.url, 'diskcache_miss', key)
+        data, version = self.db.get_raw_with_version(key)
+        self.disk_cache.put(local_key, data, version or '')
+        return data
+
+    def _is_valid(self, key: str, version: str) -> bool:
+        if not self.validate or not version:
+            return True
+
+        try:
+            return self.db.get_version_raw(key) == version
+        except KeyError:
+            return False
+
+    def get_version_raw(self, key: str) -> str:
+        return self.db.get_version_raw(key)
+
+    def content_version(self, data):
+        return self.db.content_version(data)
+
+    def is_content_version(self, version: str) -> bool:
+        return self.db.is_content_version(version)
+
+    def get_size_raw(self, key: str):
+        return self.db.get_size_raw(key)
+
+    def set_raw(self, key: str, value):
+        self.disk_cache.discard(self.db._local_key(key))
+        self.db.set_raw(key, value)
+
+    def set_raw_many(self, items):
+        def discarded():
+            for key, value in items:
+                self.disk_cache.discard(self.db._local_key(key))
+                yield key, value
+
+        self.db.set_raw_many(discarded())
+
+    def set_dbobj_raw(self, key: str, data: dict, changed=None):
+        self.disk_cache.discard(self.db._local_key(key))
+        self.db.set_dbobj_raw(key, data, changed)
+
+    def delete_raw(self, key: str):
+        self.disk_cache.discard(self.db._local_key(key))
+        self.db.delete_raw(key)
+
+    def expire_raw(self, key: str, ttl: float):
+        self.db.expire_raw(key, ttl)
+
+    def exists_raw(self, key: str) -> bool:
+        return self.db.exists_raw(key)
+
+    def mkdir_raw(self, folder: str):
+        self.db.mkdir_raw(folder)
+
+    def is_dir_raw(self, folder: str) -> bool:
+        return self.db.is_dir_raw(folder)
+
+    def rmdir_raw(self, folder: str):
+        self.db.rmdir_raw(folder)
+
+    def list_dir_raw(self, folder: str, include_dir: bool, page_size: int):
+        return self.db.list_dir_raw(folder, include_dir, page_size)
+
+    def find_raw(self, prefix: str):
+        return self.db.find_raw(prefix)
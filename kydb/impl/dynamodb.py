@@ -1,15 +1,29 @@
 from kydb.base import BaseDB
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
 from kydb.folder_meta import FolderMetaMixin
+from botocore.exceptions import ClientError
 import boto3
+from itertools import islice
+import pickle
+import os
+
+
+def new_version() -> str:
+    return os.urandom(8).hex()
 
 
 class DynamoDB(FolderMetaMixin, BaseDB):
+    """
+    Each item has a ``version`` attribute, a hash of the contents
+    or, for DbObjs, a random stamp replaced on each write.
+    """
+    # Keys fetched per BatchGetItem in get_raw_many. 100 is the max.
+    PREFETCH_BATCH_SIZE = 100
 
     def __init__(self, url: str):
         super().__init__(url)
-        dynamodb = boto3.resource('dynamodb')
-        self.table = dynamodb.Table(self.db_name)
+        self.dynamodb = boto3.resource('dynamodb')
+        self.table = self.dynamodb.Table(self.db_name)
 
     def get_raw(self, key):
         items = self.table.query(
@@ -18,21 +32,168 @@ class DynamoDB(FolderMetaMixin, BaseDB):
         if not items:
             raise KeyError(key)
 
-        return items[0]['contents'].value
+        return self._item_to_raw(items[0])
+
+    def get_version_raw(self, key: str) -> str:
+        """ Fetches only the version attribute """
+        item = self.table.get_item(
+            Key={'path': key},
+            ProjectionExpression='#path, #version',
+            ExpressionAttributeNames={
+                '#path': 'path', '#version': 'version'}).get('Item')
+        if item is None:
+            raise KeyError(key)
+
+        # Written before versions existed
+        return item.get('version', '')
+
+    def exists_raw(self, key: str) -> bool:
+        """ Fetches only the key """
+        return 'Item' in self.table.get_item(
+            Key={'path': key},
+            ProjectionExpression='#path',
+            ExpressionAttributeNames={'#path': 'path'})
+
+    def get_raw_with_version(self, key: str):
+        items = self.table.query(
+            KeyConditionExpression=Key('path').eq(key))['Items']
+
+        if not items:
+            raise KeyError(key)
+
+        return self._item_to_raw(items[0]), items[0].get('version', '')
+
+    def content_version(self, data) -> str:
+        """ Plain values are versioned by a hash of their content """
+        return self._content_hash(data).hex()
+
+    def is_content_version(self, version: str) -> bool:
+        """ The stamps of DbObjs are shorter than the content hashes """
+        return len(version) == len(self.content_version(b''))
+
+    def get_raw_many(self, keys):
+        """ Uses BatchGetItem in batches of PREFETCH_BATCH_SIZE """
+        keys = iter(keys)
+        while True:
+            batch = list(islice(keys, self.PREFETCH_BATCH_SIZE))
+            if not batch:
+                return
+
+            request = {self.db_name: {'Keys': [{'path': x} for x in batch]}}
+            while request:
+                res = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in res['Responses'].get(self.db_name, []):
+                    yield item['path'], self._item_to_raw(item)
+
+                request = res.get('UnprocessedKeys')
+
+    @staticmethod
+    def _item_to_raw(item):
+        fields = item.get('fields')
+        if fields is None:
+            return item['contents'].value
+
+        # A DbObj with each stored value in its own field
+        data = pickle.loads(item['contents'].value)
+        data['data'] = {k: v.value for k, v in fields.items()}
+        return pickle.dumps(data)
+
+    def set_dbobj_raw(self, key: str, data: dict, changed=None):
+        """ Store the DbObj with the stored values in a ``fields`` map
+
+        So that only the changed fields need writing.
+        """
+        segments = data['data']
+        if changed is not None:
+            if not changed:
+                return
+
+            names = sorted(changed)
+            try:
+                self.table.update_item(
+                    Key={'path': key},
+                    UpdateExpression='SET #version = :version, ' + ', '.join(
+                        f'#fields.#n{i} = :v{i}' for i in range(len(names))),
+                    ConditionExpression='attribute_exists(#fields)',
+                    ExpressionAttributeNames={
+                        '#fields': 'fields',
+                        '#version': 'version',
+                        **{f'#n{i}': x for i, x in enumerate(names)}},
+                    ExpressionAttributeValues={
+                        ':version': new_version(),
+                        **{f':v{i}': segments[x]
+                           for i, x in enumerate(names)}})
+                return
+            except ClientError as err:
+                code = err.response['Error']['Code']
+                if code != 'ConditionalCheckFailedException':
+                    raise
+
+        folder = key.rsplit('/', 1)[0]
+        if folder:
+            self.mkdir_raw(folder)
+
+        self.table.put_item(Item={
+            'path': key,
+            'folder': folder + '/',
+            'contents': pickle.dumps(dict(data, data={})),
+            'fields': segments,
+            'version': new_version()
+        })
 
     def folder_meta_set_raw(self, key: str, value):
         folder = key.rsplit('/', 1)[0] + '/'
         self.table.put_item(Item={
             'path': key,
             'folder': folder,
-            'contents': value
+            'contents': value,
+            'version': self.content_version(value)
         })
 
+    def set_raw_many(self, items):
+        """ Uses batch_writer to write in batches of 25 """
+        with self.table.batch_writer(overwrite_by_pkeys=['path']) as batch:
+            for key, value in items:
+                key = self._ensure_slashes(key)[:-1]
+                folder = key.rsplit('/', 1)[0]
+                if folder:
+                    self.mkdir_raw(folder)
+
+                batch.put_item(Item={
+                    'path': key,
+                    'folder': folder + '/',
+                    'contents': value,
+                    'version': self.content_version(value)
+                })
+
     def delete_raw(self, key: str):
         self.table.delete_item(Key={
             'path': key,
         })
 
+    def find_raw(self, prefix: str):
+        """ A scan filtered by begins_with on the path
+
+        path is the partition key, which cannot be queried by prefix,
+        so the table is still read but only the matching paths are
+        returned, 1MB of items per request.
+        """
+        kwargs = {
+            'FilterExpression': Attr('path').begins_with(prefix),
+            'ProjectionExpression': '#path',
+            'ExpressionAttributeNames': {'#path': 'path'}
+        }
+        while True:
+            res = self.table.scan(**kwargs)
+            for item in res.get('Items', []):
+                yield item['path']
+
+            start_key = res.get('LastEvaluatedKey')
+            if start_key is None:
+                break
+
+            kwargs['ExclusiveStartKey'] = start_key
+
     def list_dir_meta_folder(self, folder: str, page_size: int):
         folder = self._ensure_slashes(folder)
 
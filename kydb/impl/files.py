@@ -1,10 +1,12 @@
 from kydb.base import BaseDB
+from kydb.expiry import ExpiryEmulationMixin
+from kydb.change_feed import FileChangeFeed
 import pathlib
 import os
 import os.path
 
 
-class FileDB(BaseDB):
+class FileDB(ExpiryEmulationMixin, BaseDB):
     """
     Example::
 
@@ -20,11 +22,29 @@ class FileDB(BaseDB):
         super().__init__(url)
 
     def get_raw(self, key: str):
+        self._expire_if_due(key)
         try:
             return open(self._get_fs_path(key), 'rb').read()
         except FileNotFoundError:
             raise KeyError(key)
 
+    def get_version_raw(self, key: str) -> str:
+        """ The modification time and size of the file """
+        self._expire_if_due(key)
+        try:
+            stat = os.stat(self._get_fs_path(key))
+        except FileNotFoundError:
+            raise KeyError(key)
+
+        return f'{stat.st_mtime_ns}-{stat.st_size}'
+
+    def get_size_raw(self, key: str) -> int:
+        self._expire_if_due(key)
+        try:
+            return os.stat(self._get_fs_path(key)).st_size
+        except FileNotFoundError:
+            raise KeyError(key)
+
     def mkdir_raw(self, folder: str):
         folder = self._get_fs_path(folder)
         pathlib.Path(folder).mkdir(parents=True, exist_ok=True)
@@ -39,6 +59,7 @@ class FileDB(BaseDB):
                          key would be /foo/bar
         :param value: The raw, pickled data.
         """
+        self._clear_expiry(key)
         fullpath = self._get_fs_path(key)
         folder = fullpath.rsplit('/', 1)[0]
         pathlib.Path(folder).mkdir(parents=True, exist_ok=True)
@@ -56,8 +77,12 @@ class FileDB(BaseDB):
                          key would be /foo/bar
 
         """
+        self._clear_expiry(key)
         os.remove(self._get_fs_path(key))
 
+    def _default_change_feed(self):
+        return FileChangeFeed(self)
+
     def _get_fs_path(self, key: str):
         return '/' + self.db_name + key
 
@@ -82,6 +107,28 @@ class FileDB(BaseDB):
         except FileNotFoundError:
             raise KeyError(folder)
 
+    def find_raw(self, prefix: str):
+        """ Walks the tree with os.scandir from the deepest folder
+        in prefix """
+        folder = prefix.rsplit('/', 1)[0] + '/'
+        fs_prefix = self._get_fs_path(prefix)
+        root = len(self._get_fs_path(''))
+        stack = [self._get_fs_path(folder)]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            for entry in entries:
+                if entry.is_dir():
+                    if (entry.path + '/').startswith(fs_prefix):
+                        stack.append(entry.path)
+                elif entry.path.startswith(fs_prefix):
+                    path = entry.path[root:]
+                    if not self._expire_if_due(path):
+                        yield path
+
     def rmdir_raw(self, folder: str):
         try:
             os.rmdir(self._get_fs_path(folder))
@@ -89,5 +136,6 @@ class FileDB(BaseDB):
             raise KeyError('Cannot remove folder: ' + folder)
 
     def exists_raw(self, key) -> bool:
+        self._expire_if_due(key)
         path = self._get_fs_path(key)
         return os.path.exists(path) and not os.path.isdir(path)
@@ -1,28 +1,94 @@
 from kydb.base import BaseDB
 from kydb.folder_meta import FolderMetaMixin
+from kydb.expiry import ExpiryEmulationMixin
+from kydb import snapshot
 import re
 
 
-class MemoryDB(FolderMetaMixin, BaseDB):
+class MemoryDB(ExpiryEmulationMixin, FolderMetaMixin, BaseDB):
     __cache = {}
 
     def __init__(self, url: str):
         super().__init__(url)
         self.__cache[self.db_name] = {}
+        # Boot from a snapshot made by export
+        path = (self._config or {}).get('snapshot')
+        if path:
+            self.import_(path)
 
     def get_raw(self, key):
         if self.base_path != '/' and \
                 key == self._folder_meta_path(self.base_path, ''):
             raise KeyError(key)
 
-        return self.__cache[self.db_name][key]
+        self._expire_if_due(key)
+        res = self.__cache[self.db_name][key]
+        if isinstance(res, memoryview):
+            # Imported from a snapshot without copying
+            return bytes(res)
+
+        return res
+
+    def get_version_raw(self, key: str) -> str:
+        """ A hash of the data. Cheap when it is already in memory """
+        return self.content_version(self.get_raw(key))
+
+    def content_version(self, data) -> str:
+        return self._content_hash(data).hex()
+
+    def is_content_version(self, version: str) -> bool:
+        return True
+
+    def get_size_raw(self, key: str) -> int:
+        self._expire_if_due(key)
+        return len(self.__cache[self.db_name][key])
+
+    def get_raw_many(self, keys):
+        """ Reads from memory gain nothing from concurrency """
+        for key in keys:
+            try:
+                yield key, self.get_raw(key)
+            except KeyError:
+                pass
 
     def folder_meta_set_raw(self, key: str, value):
+        self._clear_expiry(key)
         self.__cache[self.db_name][key] = value
 
     def delete_raw(self, key: str):
+        self._clear_expiry(key)
         del self.__cache[self.db_name][key]
 
+    def find_raw(self, prefix: str):
+        cache = self.__cache[self.db_name]
+        for path in [x for x in cache if x.startswith(prefix)]:
+            if not self._expire_if_due(path):
+                yield path
+
+    def import_raw(self, snap, folder: str) -> int:
+        """ The values stay in the snapshot file mapped into memory
+        until read, so loading costs little more than reading the index """
+        cache = self.__cache[self.db_name]
+        folders = set()
+        count = 0
+        for kind, key, data in snap:
+            path = folder + key
+            if kind == snapshot.FOLDER:
+                folders.add(path)
+                continue
+
+            folders.add(path.rsplit('/', 1)[0])
+            self._clear_expiry(path)
+            cache[path] = data
+            self._on_raw_write(path)
+            count += 1
+
+        for path in folders:
+            if path:
+                self.mkdir_raw(path)
+
+        return count
+
     def get_cache(self):
         return self.__cache[self.db_name]
 
@@ -1,13 +1,34 @@
 from kydb.base import BaseDB
 from kydb.folder_meta import FolderMetaMixin
+from kydb.change_feed import RedisChangeFeed
 from redis.exceptions import ResponseError
+from itertools import islice
 import redis
 import boto3
 import os
 import base64
+import pickle
+import re
+
+# The hash field that holds a DbObj's meta data.
+# The other fields hold the pickled stored values.
+DBOBJ_HEADER_FIELD = '.dbobj'
+
+
+def new_version() -> str:
+    return os.urandom(8).hex()
 
 
 class RedisDB(FolderMetaMixin, BaseDB):
+    """
+    Each folder is a hash of the names of the objects in it.
+    The value of each name is the version of the object, a hash of
+    the value or, for DbObjs, a random stamp replaced on each write.
+    """
+    # Keys fetched per MGET in get_raw_many
+    PREFETCH_BATCH_SIZE = 100
+    # The COUNT hint of each SCAN in find_raw
+    SCAN_COUNT = 1000
 
     def __init__(self, url: str):
         super().__init__(url)
@@ -73,20 +94,185 @@ class RedisDB(FolderMetaMixin, BaseDB):
         return kwargs
 
     def get_raw(self, key: str):
-        try:
-            res = self.connection.get(key)
-        except ResponseError:
-            raise KeyError(f'{key} is not a valid key')
+        """ A string, or a DbObj stored as a hash, in one round trip
+
+        Whichever does not match the type of key fails with WRONGTYPE.
+        """
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.hgetall(key)
+        res, fields = pipe.execute(raise_on_error=False)
+        if isinstance(res, ResponseError):
+            return self._dbobj_from_fields(key, fields)
 
         if not res:
             raise KeyError(key)
 
         return res
 
+    def get_version_raw(self, key: str) -> str:
+        """ The version from the folder hash
+
+        The key itself is checked in the same round trip, as the
+        version stays in the folder hash after a PEXPIRE of the key.
+        """
+        folder, obj = key.rsplit('/', 1)
+        pipe = self.connection.pipeline()
+        pipe.hget(folder, obj)
+        pipe.exists(key)
+        res, exists = pipe.execute(raise_on_error=False)
+        if res is None or isinstance(res, ResponseError) or not exists:
+            raise KeyError(key)
+
+        return res.decode()
+
+    def exists_raw(self, key: str) -> bool:
+        """ Without fetching the value. Hashes are folders
+        unless they hold a DbObj """
+        pipe = self.connection.pipeline()
+        pipe.type(key)
+        pipe.hexists(key, DBOBJ_HEADER_FIELD)
+        key_type, is_dbobj = pipe.execute(raise_on_error=False)
+        if key_type == b'string':
+            return True
+
+        return key_type == b'hash' and is_dbobj is True
+
+    def content_version(self, data) -> str:
+        """ Plain values are versioned by a hash of their content """
+        return self._content_hash(data).hex()
+
+    def is_content_version(self, version: str) -> bool:
+        """ The stamps of DbObjs are shorter than the content hashes """
+        return len(version) == len(self.content_version(b''))
+
+    def get_size_raw(self, key: str):
+        """ STRLEN. None for DbObjs stored as hashes """
+        try:
+            size = self.connection.strlen(key)
+        except ResponseError:
+            return None
+
+        if not size:
+            raise KeyError(key)
+
+        return size
+
+    def get_raw_many(self, keys):
+        """ Uses MGET in batches of PREFETCH_BATCH_SIZE
+
+        DbObjs stored as hashes are fetched on their own.
+        """
+        keys = iter(keys)
+        while True:
+            batch = list(islice(keys, self.PREFETCH_BATCH_SIZE))
+            if not batch:
+                return
+
+            missing = []
+            for key, res in zip(batch, self.connection.mget(batch)):
+                if res:
+                    yield key, res
+                else:
+                    missing.append(key)
+
+            if not missing:
+                continue
+
+            # Perhaps DbObjs stored as hashes, fetched together
+            pipe = self.connection.pipeline(transaction=False)
+            for key in missing:
+                pipe.hgetall(key)
+
+            for key, fields in zip(missing,
+                                   pipe.execute(raise_on_error=False)):
+                try:
+                    yield key, self._dbobj_from_fields(key, fields)
+                except KeyError:
+                    pass
+
+    def find_raw(self, prefix: str):
+        """ SCAN MATCH on the prefix
+
+        Hashes are folders unless they hold a DbObj.
+        """
+        match = re.sub(r'([*?\[\]\\])', r'\\\1', prefix) + '*'
+        for key in self.connection.scan_iter(
+                match=match, count=self.SCAN_COUNT, _type='string'):
+            yield key.decode()
+
+        hashes = list(self.connection.scan_iter(
+            match=match, count=self.SCAN_COUNT, _type='hash'))
+        pipe = self.connection.pipeline()
+        for key in hashes:
+            pipe.hexists(key, DBOBJ_HEADER_FIELD)
+
+        for key, is_dbobj in zip(hashes, pipe.execute()):
+            if is_dbobj:
+                yield key.decode()
+
+    def _dbobj_from_fields(self, key: str, fields):
+        """ The DbObj pickled from the fields of its hash
+
+        :param fields: The result of HGETALL, or its error
+        """
+        if isinstance(fields, ResponseError):
+            raise KeyError(f'{key} is not a valid key')
+
+        header = fields.pop(DBOBJ_HEADER_FIELD.encode(), None)
+        if header is None:
+            raise KeyError(f'{key} is not a valid key')
+
+        data = pickle.loads(header)
+        data['data'] = {k.decode(): v for k, v in fields.items()}
+        return pickle.dumps(data)
+
+    def set_dbobj_raw(self, key: str, data: dict, changed=None):
+        """ Store the DbObj as a hash with a field per stored value
+
+        So that only the changed fields need writing.
+        """
+        segments = data['data']
+        folder, obj = key.rsplit('/', 1)
+        if changed is not None:
+            # Checked in the same transaction as the write. If it was
+            # not a DbObj hash it is written whole below.
+            pipe = self.connection.pipeline()
+            pipe.hexists(key, DBOBJ_HEADER_FIELD)
+            if changed:
+                pipe.hset(key, mapping={x: segments[x] for x in changed})
+                pipe.hset(folder, obj, new_version())
+
+            if pipe.execute(raise_on_error=False)[0] is True:
+                return
+
+        header = dict(data, data={})
+        if folder:
+            self.mkdir_raw(folder)
+
+        pipe = self.connection.pipeline()
+        pipe.hset(folder, obj, new_version())
+        pipe.delete(key)
+        pipe.hset(key, mapping={
+            DBOBJ_HEADER_FIELD: pickle.dumps(header), **segments})
+        pipe.execute()
+
     def folder_meta_set_raw(self, key: str, value):
         folder, obj = key.rsplit('/', 1)
-        self.connection.hset(folder, obj, '.')
-        self.connection.set(key, value)
+        pipe = self.connection.pipeline()
+        pipe.hset(folder, obj, self.content_version(value))
+        pipe.set(key, value)
+        pipe.execute()
+
+    def _default_change_feed(self):
+        return RedisChangeFeed(self)
+
+    def expire_raw(self, key: str, ttl: float):
+        """ Uses redis PEXPIRE
+
+        Note the key stays listed in its folder after it expires.
+        """
+        self.connection.pexpire(key, int(ttl * 1000))
 
     def delete_raw(self, key: str):
         self.connection.delete(key)
@@ -1,5 +1,6 @@
 from kydb.base import BaseDB
 from botocore.exceptions import ClientError, ParamValidationError
+import hashlib
 import io
 import boto3
 from kydb.folder_meta import FolderMetaMixin
@@ -21,6 +22,52 @@ class S3DB(FolderMetaMixin, BaseDB):
         except ParamValidationError:
             raise KeyError(key)
 
+    def get_version_raw(self, key: str) -> str:
+        """ The ETag from HEAD """
+        try:
+            return self.s3.head_object(
+                Bucket=self.db_name, Key=key[1:])['ETag']
+        except ClientError:
+            raise KeyError(key)
+        except ParamValidationError:
+            raise KeyError(key)
+
+    def exists_raw(self, key: str) -> bool:
+        """ HEAD rather than GET the object """
+        try:
+            self.get_version_raw(key)
+            return True
+        except KeyError:
+            return False
+
+    def content_version(self, data) -> str:
+        """ The ETag of an object uploaded in one part is its MD5 """
+        return '"' + hashlib.md5(data).hexdigest() + '"'
+
+    def is_content_version(self, version: str) -> bool:
+        """ Unless uploaded in parts, where the ETag ends with -parts """
+        return '-' not in version
+
+    def get_size_raw(self, key: str) -> int:
+        """ The ContentLength from HEAD """
+        try:
+            return self.s3.head_object(
+                Bucket=self.db_name, Key=key[1:])['ContentLength']
+        except ClientError:
+            raise KeyError(key)
+        except ParamValidationError:
+            raise KeyError(key)
+
+    def get_raw_with_version(self, key: str):
+        """ The data and ETag from one GET """
+        try:
+            res = self.s3.get_object(Bucket=self.db_name, Key=key[1:])
+            return res['Body'].read(), res['ETag']
+        except ClientError:
+            raise KeyError(key)
+        except ParamValidationError:
+            raise KeyError(key)
+
     def folder_meta_set_raw(self, key: str, value):
         buf = io.BytesIO(value)
         self.s3.upload_fileobj(buf, self.db_name, key[1:])
@@ -31,6 +78,15 @@ class S3DB(FolderMetaMixin, BaseDB):
             Key=key[1:]
         )
 
+    def find_raw(self, prefix: str):
+        """ Lists the keys with the prefix, without a delimiter,
+        so the whole tree is listed 1000 keys per request """
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for res in paginator.paginate(Bucket=self.db_name,
+                                      Prefix=prefix[1:]):
+            for item in res.get('Contents', []):
+                yield '/' + item['Key']
+
     def list_dir_meta_folder(self, folder: str, page_size: int):
         """ List the folder
 
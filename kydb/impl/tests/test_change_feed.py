@@ -0,0 +1,141 @@
+from kydb.api import _resolve_db_class
+from kydb.change_feed import (
+    ChangeLogFeed, RedisChangeFeed, FileChangeFeed, CHANGE_LOG_PATH)
+from kydb.impl.tests.test_impl import DB_URLS, ALL_DB_TYPES
+import pytest
+import time
+
+FEEDS = {
+    'redis': RedisChangeFeed,
+    'files': FileChangeFeed,
+}
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return True
+
+        time.sleep(0.02)
+
+    return False
+
+
+def new_db(db_type):
+    # Not via connect so each has its own in-process cache
+    url = DB_URLS[db_type] + '/test_change_feed'
+    return _resolve_db_class(url)(url)
+
+
+@pytest.mark.parametrize('db_type', [
+    x for x in ['memory', 's3', 'redis', 'dynamodb', 'files']
+    if x in ALL_DB_TYPES])
+def test_watch(db_type):
+    writer = new_db(db_type)
+    reader = new_db(db_type)
+    feed_cls = FEEDS.get(db_type, ChangeLogFeed)
+    writer.watch(feed_cls(writer, interval=0.05))
+    feed = reader.watch(feed_cls(reader, interval=0.05))
+    assert type(feed) is type(reader._default_change_feed())
+    try:
+        key = '/unittests/test_watch/foo'
+        other = '/unittests/test_watch/bar'
+        writer[key] = 1
+        writer[other] = 1
+        # Let the reader see those changes before caching
+        time.sleep(0.3)
+        assert reader[key] == 1
+        assert reader[other] == 1
+
+        # Make sure the change is a different mtime for files
+        time.sleep(0.01)
+        writer[key] = 2
+        assert wait_for(lambda: reader._get_full_path(key)
+                        not in reader._cache)
+        assert reader[key] == 2
+        # Only the changed key was dropped
+        assert reader._get_full_path(other) in reader._cache
+
+        writer.delete(key)
+        assert wait_for(lambda: reader._get_full_path(key)
+                        not in reader._cache)
+    finally:
+        writer.unwatch()
+        reader.unwatch()
+        writer.rm_tree('/unittests/test_watch')
+
+
+@pytest.mark.parametrize('db_type', [
+    x for x in ['memory', 's3', 'redis', 'dynamodb']
+    if x in ALL_DB_TYPES])
+def test_publish_without_watching(db_type):
+    writer = new_db(db_type)
+    writer.publish_changes = True
+    reader = new_db(db_type)
+    feed_cls = FEEDS.get(db_type, ChangeLogFeed)
+    reader.watch(feed_cls(reader, interval=0.05))
+    try:
+        key = '/unittests/test_publish_without_watching/foo'
+        writer[key] = 1
+        time.sleep(0.3)
+        assert reader[key] == 1
+
+        writer[key] = 2
+        assert wait_for(lambda: reader._get_full_path(key)
+                        not in reader._cache)
+        assert reader[key] == 2
+        assert writer._change_feed is None
+    finally:
+        reader.unwatch()
+        writer.rm_tree('/unittests/test_publish_without_watching')
+
+
+def test_change_log_prune():
+    db = new_db('memory')
+    feed = ChangeLogFeed(db, interval=60, retention=0)
+    feed.start(lambda path: None)
+    try:
+        feed.publish('/foo')
+        assert list(db.list_dir_raw(CHANGE_LOG_PATH, True, 200))
+        # Whole buckets are pruned once past retention
+        feed._prune(time.time_ns() + feed.BUCKET_SECONDS * 10 ** 9)
+        assert not list(db.list_dir_raw(CHANGE_LOG_PATH, True, 200))
+    finally:
+        feed.stop()
+
+
+def test_change_log_late():
+    db = new_db('memory')
+    other = ChangeLogFeed(db)
+    feed = ChangeLogFeed(db, interval=60, lookback=30)
+    changed = []
+    feed.start(changed.append)
+    try:
+        other.publish('/foo')
+        feed.poll()
+        assert changed == ['/foo']
+
+        # Stamped before the last change seen, i.e. a clock behind
+        ns = time.time_ns() - 5 * 10 ** 9
+        name = f'{feed._stamp(ns)}-{other.origin}-99'
+        db.set_raw(f'{CHANGE_LOG_PATH}{feed._bucket(ns)}/{name}',
+                   db._serialise('/bar'))
+        feed.poll()
+        assert changed == ['/foo', '/bar']
+
+        # Each change is only notified once
+        feed.poll()
+        assert changed == ['/foo', '/bar']
+
+        # Beyond lookback
+        ns = time.time_ns() - 60 * 10 ** 9
+        name = f'{feed._stamp(ns)}-{other.origin}-100'
+        db.set_raw(f'{CHANGE_LOG_PATH}{feed._bucket(ns)}/{name}',
+                   db._serialise('/baz'))
+        feed.poll()
+        assert changed == ['/foo', '/bar']
+    finally:
+        feed.stop()
+        seconds = feed.retention + feed.BUCKET_SECONDS
+        feed._prune(time.time_ns() + seconds * 10 ** 9)
@@ -0,0 +1,69 @@
+from kydb.impl.diskcache import DiskCacheDB
+from kydb import metrics
+from tempfile import gettempdir
+import kydb
+import os
+import pytest
+
+S3_URL = 's3://' + os.environ.get('KINYU_UNITTEST_S3_BUCKET', 'kydb-test')
+FILES_URL = 'files:/' + gettempdir() + '/kydb_tests'
+
+
+@pytest.fixture
+def events():
+    events = []
+    metrics.add_listener(events.append)
+    yield events
+    metrics.remove_listener(events.append)
+
+
+def outcomes(events):
+    return [x.op for x in events if x.op.startswith('diskcache')]
+
+
+def test_connect():
+    db = kydb.connect('diskcache+memory://test_diskcache')
+    assert isinstance(db, DiskCacheDB)
+    assert db.db is kydb.connect('memory://test_diskcache')
+
+
+@pytest.mark.parametrize('url', [S3_URL, FILES_URL])
+def test_read_through(url, tmp_path, monkeypatch, events):
+    monkeypatch.setenv('KYDB_DISKCACHE_PATH', str(tmp_path))
+    db = DiskCacheDB('diskcache+' + url + '/test_diskcache')
+    key = '/unittests/test_diskcache/foo'
+    db[key] = 123
+    assert db.read(key, reload=True) == 123
+    assert db.read(key, reload=True) == 123
+    assert outcomes(events) == ['diskcache_miss', 'diskcache_hit']
+
+    # Survives restarts
+    del events[:]
+    db2 = DiskCacheDB('diskcache+' + url + '/test_diskcache')
+    assert db2.read(key) == 123
+    assert outcomes(events) == ['diskcache_hit']
+
+    # Written behind its back, the version no longer matches
+    del events[:]
+    db.db[key] = 456
+    assert db2.read(key, reload=True) == 456
+    assert outcomes(events) == ['diskcache_miss']
+
+    db.rm_tree('/unittests/test_diskcache')
+    with pytest.raises(KeyError):
+        db2.read(key, reload=True)
+
+
+def test_no_validate(tmp_path, monkeypatch, events):
+    monkeypatch.setenv('KYDB_DISKCACHE_PATH', str(tmp_path))
+    db = DiskCacheDB('diskcache+memory://test_diskcache')
+    db.validate = False
+    db['/foo'] = 1
+    assert db.read('/foo', reload=True) == 1
+    db.db['/foo'] = 2
+    # The entry is used until it expires
+    assert db.read('/foo', reload=True) == 1
+    # Writes through the DiskCacheDB do discard it
+    db['/foo'] = 3
+    assert db.read('/foo', reload=True) == 3
+    db.delete('/foo')
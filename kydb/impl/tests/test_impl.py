@@ -5,6 +5,9 @@ from tempfile import gettempdir
 import os
 from contextlib import contextmanager
 from itertools import product
+import time
+from kydb.tests.test_objdb import DBOBJ_CONFIG
+from kydb.base import BaseDB
 
 
 def get_test_db_types():
@@ -238,3 +241,311 @@ def test_pagination(db_type, base_path):
             set(db.list_dir('/unittests/test_list_dir/foo', page_size=1))
         assert ['obj5'] == list(db.list_dir(
             '/unittests/test_list_dir/foo/bar', page_size=1))
+
+
+@pytest.mark.parametrize('db_type,base_path', MARK_PARAMS)
+def test_find(db_type, base_path):
+    with list_dir_db(db_type, base_path) as db:
+        folder = '/unittests/test_list_dir/'
+        everything = {folder + 'obj1', folder + 'foo/obj2',
+                      folder + 'foo/obj3', folder + 'foo/obj4',
+                      folder + 'foo/bar/obj5'}
+        assert set(db.find(folder)) == everything
+        assert set(db.find(folder[:-5])) == everything
+        assert set(db.find(folder + 'foo/')) == everything - {folder + 'obj1'}
+        assert set(db.find(folder + '*/obj[23]')) == {
+            folder + 'foo/obj2', folder + 'foo/obj3'}
+        assert set(db.find(folder + '*5')) == {folder + 'foo/bar/obj5'}
+
+        assert list(db.find(folder, recursive=False)) == [folder + 'obj1']
+        assert list(db.find(folder + '*5', recursive=False)) == []
+        assert set(db.find(folder + '*/obj*', recursive=False)) == {
+            folder + 'foo/obj2', folder + 'foo/obj3', folder + 'foo/obj4'}
+
+        assert list(db.find('/unittests/test_find_nothing/')) == []
+
+        if db_type == 'memory':
+            # The fallback walking the folders finds the same
+            prefix = db._get_full_path(folder + 'fo')
+            assert set(BaseDB.find_raw(db, prefix)) == {
+                x for x in db.find_raw(prefix) if '/.' not in x}
+
+
+@pytest.mark.parametrize('db_type,base_path', [
+    x for x in MARK_PARAMS if x[0] in ('memory', 'redis', 'files')])
+def test_expire(db_type, base_path):
+    db = get_db(db_type, base_path)
+    key = '/unittests/test_expire/foo'
+    db[key] = 123
+    db.expire(key, 0.05)
+    assert db.exists(key)
+    time.sleep(0.1)
+    assert not db.exists(key)
+
+    # Writing again cancels the expiry
+    db[key] = 123
+    db.expire(key, 0.05)
+    db[key] = 234
+    time.sleep(0.1)
+    assert db.exists(key)
+    db.rm_tree('/unittests/test_expire')
+
+
+@pytest.mark.parametrize('db_type,base_path', MARK_PARAMS)
+def test_dbobj_partial_write(db_type, base_path):
+    db = get_db(db_type, base_path)
+    db.upload_objdb_config(DBOBJ_CONFIG)
+    key = '/unittests/test_dbobj_partial_write/greeter'
+    db.new('ExtendedGreeter', key, name='Tony', age=40).write()
+
+    obj = db.read(key, reload=True)
+    assert obj.get_stored_dict() == {'age': 40, 'name': 'Tony'}
+    obj.age.setvalue(41)
+    obj.write()
+
+    obj = db.read(key, reload=True)
+    assert obj.get_stored_dict() == {'age': 41, 'name': 'Tony'}
+
+    # Written from scratch again, i.e. after the key was deleted
+    obj.delete()
+    obj.name.setvalue('Jane')
+    db[key] = obj
+    obj = db.read(key, reload=True)
+    assert obj.get_stored_dict() == {'age': 41, 'name': 'Jane'}
+    db.rm_tree('/unittests/test_dbobj_partial_write')
+
+
+@pytest.mark.parametrize('db_type,base_path', MARK_PARAMS)
+def test_dbobj_in_place_write(db_type, base_path):
+    db = get_db(db_type, base_path)
+    db.upload_objdb_config(DBOBJ_CONFIG)
+    key = '/unittests/test_dbobj_in_place_write/basket'
+    db.new('Basket', key).write()
+
+    obj = db.read(key, reload=True)
+    obj.items().append(1)
+    obj.name.setvalue('y')
+    obj.write()
+    obj = db.read(key, reload=True)
+    assert obj.get_stored_dict() == {'items': [1], 'name': 'y'}
+
+    obj.items().append(2)
+    obj.write()
+    assert db.read(key, reload=True).items() == [1, 2]
+    db.rm_tree('/unittests/test_dbobj_in_place_write')
+
+
+@pytest.mark.parametrize('db_type,base_path', [
+    x for x in MARK_PARAMS if x[0] == 'redis'])
+def test_redis_dbobj_round_trips(db_type, base_path, monkeypatch):
+    import redis
+    db = get_db(db_type, base_path)
+    db.upload_objdb_config(DBOBJ_CONFIG)
+    key = '/unittests/test_redis_dbobj_round_trips/basket'
+    db.new('Basket', key).write()
+    path = db._get_full_path(key)
+
+    round_trips = []
+    execute_command = redis.client.Redis.execute_command
+    execute = redis.client.Pipeline.execute
+
+    def counting_execute_command(self, *args, **kwargs):
+        round_trips.append(args[0])
+        return execute_command(self, *args, **kwargs)
+
+    def counting_execute(self, *args, **kwargs):
+        round_trips.append('pipeline')
+        return execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(redis.client.Redis, 'execute_command',
+                        counting_execute_command)
+    monkeypatch.setattr(redis.client.Pipeline, 'execute', counting_execute)
+    try:
+        db.get_raw(path)
+        assert round_trips == ['pipeline']
+
+        del round_trips[:]
+        obj = db.read(key, reload=True)
+        obj.name.setvalue('y')
+        del round_trips[:]
+        db.set_dbobj_raw(path, db.get_dbobj_data(obj), {'name'})
+        assert round_trips == ['pipeline']
+    finally:
+        monkeypatch.undo()
+        db.rm_tree('/unittests/test_redis_dbobj_round_trips')
+
+
+@pytest.mark.parametrize('db_type', [
+    x for x in ALL_DB_TYPES if x in ('memory', 'redis', 'dynamodb')])
+def test_sync_dbobj(db_type):
+    src = get_db(db_type, 'test_sync_src')
+    dst = get_db(db_type, 'test_sync_dst')
+    folder = '/unittests/test_sync_dbobj/'
+    for db in (src, dst):
+        db.upload_objdb_config(DBOBJ_CONFIG)
+        db.new('Basket', folder + 'basket', items=[1]).write()
+
+    try:
+        # The same DbObj in both, with different version stamps
+        stats = kydb.sync(src, dst, folder)
+        assert (stats.copied, stats.unchanged) == (0, 1)
+
+        src.new('Basket', folder + 'basket', items=[2]).write()
+        stats = kydb.sync(src, dst, folder)
+        assert stats.copied == 1
+        assert dst.read(folder + 'basket', reload=True).items() == [2]
+    finally:
+        src.rm_tree(folder)
+        dst.rm_tree(folder)
+
+
+@pytest.mark.parametrize('db_type,base_path', MARK_PARAMS)
+def test_prefetch(db_type, base_path):
+    with list_dir_db(db_type, base_path) as db:
+        folder = '/unittests/test_list_dir/'
+        assert db.read_dir(folder) == {folder + 'obj1': 1}
+        assert db.read_dir(folder, recursive=True) == {
+            folder + 'obj1': 1,
+            folder + 'foo/obj2': 2,
+            folder + 'foo/obj3': 2,
+            folder + 'foo/obj4': 3,
+            folder + 'foo/bar/obj5': 4,
+        }
+        assert db.read_dir(folder, recursive=True, pattern='foo/obj[23]') \
+            == {folder + 'foo/obj2': 2, folder + 'foo/obj3': 2}
+
+        if db_type == 'union':
+            assert db.prefetch(folder + 'foo') == 3
+            return
+
+        db.clear_cache()
+        assert db.prefetch(folder, recursive=True) == 5
+        # Served from the cache
+        db.delete_raw(db._get_full_path(folder + 'foo/bar/obj5'))
+        assert db[folder + 'foo/bar/obj5'] == 4
+
+
+@pytest.mark.parametrize('db_type,base_path', [
+    x for x in MARK_PARAMS if x[0] != 'union'])
+def test_stale_after(db_type, base_path):
+    db = get_db(db_type, base_path)
+    key = '/unittests/test_stale_after/foo'
+    path = db._get_full_path(key)
+    db[key] = 1
+    version = db.get_version_raw(path)
+    assert db.get_raw_with_version(path) == (db.get_raw(path), version)
+
+    db.stale_after = 0
+    try:
+        assert db.read(key, reload=True) == 1
+        # Unchanged so served from the cache after checking the version
+        with kydb.profile() as prof:
+            assert db[key] == 1
+
+        assert [x.op for x in prof.events
+                if x.op.startswith('get')] == ['get_version']
+
+        # Written behind the cache's back
+        time.sleep(0.01)
+        db.set_raw(path, db._serialise(2))
+        assert db.get_version_raw(path) != version
+        assert db[key] == 2
+    finally:
+        db.stale_after = None
+        db.rm_tree('/unittests/test_stale_after')
+
+    with pytest.raises(KeyError):
+        db.get_version_raw(path)
+
+
+@pytest.mark.parametrize('db_type,base_path', [
+    x for x in MARK_PARAMS if x[0] != 'union'])
+def test_elide_unchanged(db_type, base_path):
+    db = get_db(db_type, base_path)
+    key = '/unittests/test_elide_unchanged/foo'
+    db.elide_unchanged = True
+    elided = db.elided_writes
+    try:
+        db[key] = 1
+        db[key] = 1
+        assert db.elided_writes == elided + 1
+        db[key] = 2
+        assert db.elided_writes == elided + 1
+        assert db.read(key, reload=True) == 2
+
+        # A fresh process knows no hashes, but the stored version can be
+        # derived from the content in all but files
+        db._content_hashes.clear()
+        with kydb.profile() as prof:
+            db[key] = 2
+
+        sets = [x for x in prof.events if x.op in ('set', 'set_elided')]
+        if db_type == 'files':
+            assert [x.op for x in sets] == ['set']
+        else:
+            assert [x.op for x in sets] == ['set_elided']
+
+        # Elided writes are still seen by the listeners
+        written = []
+        db._write_listeners.append(written.append)
+        try:
+            db[key] = 2
+            assert written == [db._get_full_path(key)]
+        finally:
+            db._write_listeners.remove(written.append)
+
+        # Deleted elsewhere
+        elided = db.elided_writes
+        db.delete_raw(db._get_full_path(key))
+        db[key] = 2
+        assert db.elided_writes == elided
+        assert db.read(key, reload=True) == 2
+    finally:
+        db.elide_unchanged = False
+        db.rm_tree('/unittests/test_elide_unchanged')
+
+
+@pytest.mark.parametrize('db_type,base_path', [
+    x for x in MARK_PARAMS if x[0] in ('s3', 'redis', 'dynamodb', 'files')])
+def test_elide_unchanged_no_get(db_type, base_path):
+    db = get_db(db_type, base_path)
+    key = '/unittests/test_elide_unchanged_no_get/foo'
+    db.elide_unchanged = True
+    try:
+        db[key] = b'x' * 100000
+        gets = []
+        get_raw = db.get_raw
+
+        def counting_get_raw(key):
+            gets.append(key)
+            return get_raw(key)
+
+        db.get_raw = counting_get_raw
+        elided = db.elided_writes
+        db[key] = b'x' * 100000
+        assert db.elided_writes == elided + 1
+        # Eliding the write does not download the object
+        assert gets == []
+    finally:
+        db.__dict__.pop('get_raw', None)
+        db.elide_unchanged = False
+        db.rm_tree('/unittests/test_elide_unchanged_no_get')
+
+
+@pytest.mark.parametrize('db_type,base_path', [
+    x for x in MARK_PARAMS if x[0] in ('memory', 'redis', 'files')])
+def test_elide_unchanged_expired(db_type, base_path):
+    db = get_db(db_type, base_path)
+    key = '/unittests/test_elide_unchanged_expired/foo'
+    db.elide_unchanged = True
+    try:
+        db[key] = 1
+        db.expire(key, 0.05)
+        time.sleep(0.1)
+        elided = db.elided_writes
+        db[key] = 1
+        assert db.elided_writes == elided
+        assert db.exists(key)
+    finally:
+        db.elide_unchanged = False
+        db.rm_tree('/unittests/test_elide_unchanged_expired')
@@ -65,6 +65,26 @@ i.e. the below are illegal and would raise KeyError
         i.e. object with a (.) dot prefix.
 
         Note: only use this if you know what you're doing
+
+With ``elide_unchanged`` set, on the db or in its config, the write is
+skipped if the serialised value is what is already stored. That is
+known from the version in the DB where it is derived from the content
+(memory, redis, dynamodb, s3), else from a hash of the bytes this db
+last read or wrote at key. Either way key must still exist. Skipped
+writes are counted in ``elided_writes`` and ``elided_bytes`` and
+reported to ``kydb.metrics`` as ``set_elided``. They are still
+published to watchers like any other write::
+
+    db.elide_unchanged = True
+    db[key] = big_value
+    db[key] = big_value # Not written
+    db.elided_writes # returns 1
+
+.. warning::
+
+    Where the hash remembered from this db is used (files), it is
+    trusted even if another process has since written something else
+    at key, unless the db is watched.
         """
         raise NotImplementedError()
 
@@ -96,6 +116,76 @@ i.e. the below are illegal and would raise KeyError
         """
         raise NotImplementedError()
 
+    def walk(self, folder: str, max_depth=None, pattern=None):
+        """ Walk the tree under folder, like ``os.walk``
+
+        The subfolders are listed concurrently, up to
+        ``kydb.walk.WALK_WORKERS`` at a time across all walks in the
+        process, and each folder is yielded
+        as soon as its listing arrives. So the order is not fixed,
+        other than a folder coming before its subfolders.
+
+        :param folder: The top folder
+        :param max_depth: Do not go deeper than this many levels below
+                          folder. 0 lists only folder. (Default: no limit)
+        :param pattern: Only include objects whose path relative to folder
+                        matches this glob, i.e. ``'*/*.csv'``
+        :returns: generator of (folder, subfolders, objects). folder
+                  ends with ``/``, the rest are names within it.
+
+As in ``os.walk``, removing names from subfolders skips them::
+
+    for folder, subfolders, objects in db.walk('/trades/'):
+        subfolders[:] = [x for x in subfolders if x.startswith('2024-')]
+        for name in objects:
+            print(folder + name)
+
+        """
+        raise NotImplementedError()
+
+    def find(self, pattern: str, recursive=True):
+        """ Find the objects whose keys match a prefix or glob
+
+        The search is done by the DB where it can, i.e. one listing of
+        the prefix in S3 or a SCAN in redis, rather than an ``ls`` of
+        every folder.
+
+        :param pattern: A key prefix, or a glob with ``*``, ``?`` or
+                        ``[...]``. The part before the first wildcard is
+                        the prefix searched for.
+        :param recursive: If False, wildcards do not match ``/`` and a
+                          prefix only finds the objects in its folder.
+                          (Default value = True)
+        :returns: generator of the keys. Folders are not included.
+
+example::
+
+    db.find('/trades/2024-') # Everything under /trades/2024-*
+    db.find('/trades/2024-*/*.csv')
+    db.find('/trades/', recursive=False) # Same as objects in ls
+
+        """
+        raise NotImplementedError()
+
+    def expire(self, key: str, ttl: float):
+        """
+        Delete the key from the db after ttl seconds.
+        Writing to the key again cancels the expiry.
+
+        :param key: str:  The key to expire.
+        :param ttl: float:  Time to live in seconds.
+
+example::
+
+    db[key] = 123
+    db.expire(key, 60) # key disappears in 60 seconds
+
+Note: Only supported by redis, memory and files.
+For memory and files the expiry is only known to the
+current process.
+        """
+        raise NotImplementedError()
+
     def delete(self, key: str):
         """
         Delete a key from the db.
@@ -202,6 +292,100 @@ example::
     db.read(key) # read from cache
     db.read(key, reload=True) # Force loading from DB
 
+With ``stale_after`` set, on the db or as ``stale_after`` in its config,
+a cached object older than that many seconds is revalidated by fetching
+only its version from the DB. It is loaded again only if it changed::
+
+    db.stale_after = 60
+    db.read(key) # read from DB
+    db.read(key) # read from cache
+    time.sleep(60)
+    db.read(key) # from cache after checking the version is unchanged
+
+With ``soft_ttl`` set, a cached object older than that many seconds
+is still returned straight away but reloaded in the background, so
+hot keys never wait on the DB. Only after ``hard_ttl`` does the read
+block on reloading it::
+
+    db.soft_ttl = 60
+    db.hard_ttl = 600
+
+        """
+        raise NotImplementedError()
+
+    def prefetch(self, folder: str, recursive=False, pattern=None) -> int:
+        """Fetch all the objects in folder into the cache
+
+        The objects are fetched concurrently, or in batches where the db
+        supports it, so later reads of them are served from the cache.
+
+        :param folder: The folder to fetch.
+        :param recursive: Fetch the sub-folders too. (Default value = False)
+        :param pattern: Only fetch objects whose path relative to folder
+                        matches this glob, i.e. ``'*.csv'``
+        :returns: The number of objects fetched.
+
+example::
+
+    db.prefetch('/prices/2020-01-01/')
+    for key in db.ls('/prices/2020-01-01/'):
+        db['/prices/2020-01-01/' + key] # From cache
+
+        """
+        raise NotImplementedError()
+
+    def read_dir(self, folder: str, recursive=False, pattern=None) -> dict:
+        """Read all the objects in folder
+
+        Same as ``prefetch`` but returns the objects.
+
+        :returns: dict of key to object.
+
+example::
+
+    db.read_dir('/prices/2020-01-01/') # returns
+    # {'/prices/2020-01-01/AAPL': 123.4, '/prices/2020-01-01/MSFT': 56.7}
+
+        """
+        raise NotImplementedError()
+
+    def export(self, folder: str, path: str) -> int:
+        """Write everything under folder into one snapshot file
+
+        The raw values are written as stored, without deserialising
+        them, along with the empty folders. System objects are left out.
+
+        :param folder: The folder to export
+        :param path: The file to write
+        :returns: The number of objects written
+
+example::
+
+    db.export('/fixtures/', '/tmp/fixtures.kydb')
+
+        """
+        raise NotImplementedError()
+
+    def import_(self, path: str, folder: str = '/') -> int:
+        """Load a snapshot made by ``export`` into folder
+
+        :param path: The snapshot file
+        :param folder: The folder to load it into. (Default value = '/')
+        :returns: The number of objects loaded
+
+A memory db maps the file into memory and only copies each value out
+when it is read, so large fixtures load in about the time it takes to
+read the index. It can also boot from a snapshot with ``snapshot``
+in its config::
+
+    db = kydb.connect('memory://test')
+    db.import_('/tmp/fixtures.kydb', '/fixtures/')
+
+    # Or in $KYDB_CONFIG_PATH
+    dbs:
+      test:
+        snapshot: /tmp/fixtures.kydb
+
         """
         raise NotImplementedError()
 
@@ -269,6 +453,34 @@ example::
         """
         raise NotImplementedError()
 
+    def watch(self, feed=None):
+        """Drop objects from the in-process cache as they change elsewhere
+
+        Instead of ``refresh`` clearing the whole cache, only the
+        objects written or deleted by other processes are dropped.
+        Writes and deletes through this db are published to the feed.
+
+        :param feed: A ``kydb.change_feed.ChangeFeed``. The default is
+                     redis pub/sub for redis, modification times for
+                     files and a change log in the db for the rest.
+        :returns: The feed
+
+Processes that write but never watch, i.e. batch jobs, need
+``publish_changes`` set, on the db or in its config, for the
+watchers to see their writes::
+
+    db.watch()
+    db['/foo'] # read and cached
+    # another process watching the db, or with publish_changes, sets /foo
+    db['/foo'] # read again
+
+        """
+        raise NotImplementedError()
+
+    def unwatch(self):
+        """Stop watching for changes"""
+        raise NotImplementedError()
+
     def clear_cache(self):
         """Clear the cache
 
@@ -0,0 +1,204 @@
+"""A cache of raw bytes shared by the processes on a host
+
+Each entry is a file named by the hash of its key. Files are written
+to a temporary name then renamed so readers never see a partial entry.
+The access time of a file records when it was last read, for LRU
+eviction, and the modification time when it was written, for the TTL.
+
+By default the files are in ``/dev/shm`` which is memory backed so
+reads never touch a disk.
+
+The cache is best-effort. Failing to write an entry, i.e. when
+``/dev/shm`` is full, is logged and the entry is skipped.
+"""
+from typing import Optional, Tuple
+from tempfile import gettempdir
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SHM_DIR = '/dev/shm'
+
+DEFAULT_MAX_SIZE = 1 << 30
+
+# Seconds an entry is served for without checking the db
+DEFAULT_TTL = 60
+
+# After eviction the cache is at most this fraction of max_size
+LOW_WATER = 0.9
+
+
+def default_path() -> str:
+    root = SHM_DIR if os.path.isdir(SHM_DIR) else gettempdir()
+    return os.path.join(root, 'kydb-cache')
+
+
+class LocalCache:
+    """Raw bytes keyed by db url and path, shared across processes
+
+    :param path: The directory holding the entries.
+                 (Default value = /dev/shm/kydb-cache)
+    :param max_size: Bytes kept before the least recently read entries
+                     are evicted. (Default value = 1GiB)
+    :param ttl: Seconds an entry is valid for after it is written.
+                None keeps it until evicted. (Default value = 60)
+
+.. warning::
+
+    Writes through a db on this host discard its entries, but writes
+    from other hosts, or straight to the db, do not. Such entries are
+    stale for up to ttl seconds.
+
+::
+
+    cache = LocalCache(max_size=4 << 30, ttl=3600)
+    cache.put('s3://my-bucket/ref/calendars', data)
+    cache.get('s3://my-bucket/ref/calendars') # returns data
+    """
+
+    def __init__(self, path: str = None, max_size: int = DEFAULT_MAX_SIZE,
+                 ttl: Optional[float] = DEFAULT_TTL):
+        self.path = path or default_path()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._written = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'LocalCache':
+        """Create from the ``local_cache`` section of the db config
+
+        i.e. in ``$KYDB_CONFIG_PATH``::
+
+            dbs:
+              my-bucket:
+                local_cache:
+                  path: /dev/shm/kydb-cache
+                  max_size: 4294967296
+                  ttl: 3600
+        """
+        config = config or {}
+        return cls(config.get('path'),
+                   config.get('max_size', DEFAULT_MAX_SIZE),
+                   config.get('ttl', DEFAULT_TTL))
+
+    def _file(self, key: str) -> str:
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.path, name)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The data cached for key or None"""
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """The data and its version cached for key or None"""
+        filename = self._file(key)
+        try:
+            with open(filename, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if self.ttl is not None and \
+                        time.time() - stat.st_mtime > self.ttl:
+                    self._remove(filename)
+                    return None
+
+                content = f.read()
+
+            # Mark as read for LRU
+            os.utime(filename, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logger.warning('Cannot read %s from local cache %s', key,
+                           self.path, exc_info=True)
+            return None
+
+        header, data = content.split(b'\n', 1)
+        return data, header.decode()
+
+    def put(self, key: str, data: bytes, version: str = '') -> bool:
+        """Cache data for key
+
+        :param version: i.e. the ETag of the data.
+                        Must not contain a new line.
+        :returns: False if it could not be written
+        """
+        filename = self._file(key)
+        tmp = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(version.encode() + b'\n')
+                f.write(data)
+
+            os.replace(tmp, filename)
+        except OSError:
+            logger.warning('Cannot write %s to local cache %s', key,
+                           self.path, exc_info=True)
+            self._remove(tmp)
+            return False
+
+        with self._lock:
+            self._written += len(data)
+            due = self._written > self.max_size * (1 - LOW_WATER)
+            if due:
+                self._written = 0
+
+        if due:
+            try:
+                self.evict()
+            except OSError:
+                logger.warning('Cannot evict from local cache %s',
+                               self.path, exc_info=True)
+
+        return True
+
+    def discard(self, key: str):
+        """Remove the entry for key if there is one"""
+        self._remove(self._file(key))
+
+    @staticmethod
+    def _remove(filename: str):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove the least recently read entries until the cache
+        is within max_size"""
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_size:
+            return
+
+        target = self.max_size * LOW_WATER
+        for _, size, filename in sorted(entries):
+            if total <= target:
+                break
+
+            self._remove(filename)
+            total -= size
+
+    def clear(self):
+        """Remove all the entries"""
+        with os.scandir(self.path) as it:
+            for entry in it:
+                self._remove(entry.path)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.path}>'
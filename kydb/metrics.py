@@ -0,0 +1,327 @@
+"""Metrics of db operations
+
+Listeners are called with a ``MetricEvent`` for every raw backend
+operation, (de)serialisation and in-process cache hit, miss and eviction.
+Nothing is measured while there are no listeners.
+
+::
+
+    from kydb import metrics
+
+    registry = metrics.MetricsRegistry()
+    metrics.add_listener(registry)
+
+    db['/foo']
+    registry.snapshot()[(db.url, 'get')].count  # returns 1
+    registry.hit_ratio(db.url)
+
+A Prometheus or StatsD adapter is just another listener::
+
+    def to_statsd(event):
+        statsd.timing(f'kydb.{event.op}', event.duration * 1000)
+
+    metrics.add_listener(to_statsd)
+"""
+from typing import NamedTuple, Optional
+from bisect import bisect_left
+import functools
+import threading
+import time
+
+# The ops of BaseDB that are measured and their names in MetricEvent
+RAW_OPS = {
+    'get_raw': 'get',
+    'get_raw_with_version': 'get_with_version',
+    'get_version_raw': 'get_version',
+    'set_raw': 'set',
+    'set_raw_many': 'set_many',
+    'set_dbobj_raw': 'set_dbobj',
+    'delete_raw': 'delete',
+    'exists_raw': 'exists',
+    'list_dir_raw': 'list_dir',
+    'find_raw': 'find',
+}
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_listeners = []
+
+# The db whose raw op is in progress on this thread. Raw ops it
+# calls on itself, i.e. exists_raw calling get_raw, are not reported.
+_active = threading.local()
+
+
+class MetricEvent(NamedTuple):
+    """An operation on a db
+
+    :param db: The url of the db
+    :param op: i.e. ``get``, ``set``, ``deserialise``, ``cache_hit``
+    :param key: The path including base_path. None for whole-cache evictions.
+    :param duration: seconds
+    :param bytes_in: bytes read from the db
+    :param bytes_out: bytes written to the db
+    :param error: The exception class name if the op raised
+    """
+    db: str
+    op: str
+    key: Optional[str]
+    duration: float = 0.0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    error: Optional[str] = None
+
+
+def add_listener(listener):
+    """Call listener with a MetricEvent after every operation
+
+    Listeners are called on the thread doing the operation
+    so must be quick and thread safe.
+    """
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+
+def enabled() -> bool:
+    return bool(_listeners)
+
+
+def emit(*args, **kwargs):
+    """Send a MetricEvent to the listeners"""
+    if _listeners:
+        event = MetricEvent(*args, **kwargs)
+        for listener in list(_listeners):
+            listener(event)
+
+
+def _size(value) -> int:
+    try:
+        return len(value)
+    except TypeError:
+        return 0
+
+
+def _bytes_in(op: str, res) -> int:
+    if op == 'get':
+        return _size(res)
+
+    if op == 'get_with_version' and res:
+        return _size(res[0])
+
+    return 0
+
+
+def _bytes_out(op: str, args, kwargs) -> int:
+    if op == 'set':
+        return _size(args[0])
+
+    if op == 'set_dbobj':
+        # data and changed of set_dbobj_raw
+        data = args[0]
+        changed = args[1] if len(args) > 1 else kwargs.get('changed')
+        return sum(_size(v) for k, v in data.items()
+                   if changed is None or k in changed)
+
+    return 0
+
+
+def instrument(func, op: str):
+    """Wrap the raw op func of a BaseDB to emit a MetricEvent"""
+    if op in ('list_dir', 'find'):
+        return _instrument_listing(func, op)
+
+    if op == 'set_many':
+        return _instrument_batch(func, op)
+
+    @functools.wraps(func)
+    def wrapper(self, key, *args, **kwargs):
+        if not _listeners:
+            return func(self, key, *args, **kwargs)
+
+        outer = getattr(_active, 'db', None)
+        if outer is self:
+            return func(self, key, *args, **kwargs)
+
+        _active.db = self
+        error = None
+        res = None
+        start = time.perf_counter()
+        try:
+            res = func(self, key, *args, **kwargs)
+            return res
+        except Exception as err:
+            error = type(err).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _active.db = outer
+            emit(self.url, op, key, duration,
+                 bytes_in=_bytes_in(op, res),
+                 bytes_out=_bytes_out(op, args, kwargs),
+                 error=error)
+
+    wrapper._kydb_instrumented = True
+    return wrapper
+
+
+def _instrument_batch(func, op: str):
+    """For ops taking (path, data) items, i.e. set_raw_many
+
+    Emits a MetricEvent per item with its path and size. The time of
+    the whole batch is split evenly between them.
+    """
+    @functools.wraps(func)
+    def wrapper(self, items, *args, **kwargs):
+        if not _listeners:
+            return func(self, items, *args, **kwargs)
+
+        outer = getattr(_active, 'db', None)
+        if outer is self:
+            return func(self, items, *args, **kwargs)
+
+        sizes = []
+
+        def sized(items):
+            for item in items:
+                sizes.append((item[0], _size(item[1])))
+                yield item
+
+        _active.db = self
+        error = None
+        start = time.perf_counter()
+        try:
+            return func(self, sized(items), *args, **kwargs)
+        except Exception as err:
+            error = type(err).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _active.db = outer
+            if not sizes:
+                # Nothing written, still report the call
+                sizes.append((None, 0))
+
+            for key, size in sizes:
+                emit(self.url, op, key, duration / len(sizes),
+                     bytes_out=size, error=error)
+
+    wrapper._kydb_instrumented = True
+    return wrapper
+
+
+def _instrument_listing(func, op: str):
+    """Only the time spent fetching the listing is measured,
+    not the time the caller spends between items."""
+    @functools.wraps(func)
+    def wrapper(self, key, *args, **kwargs):
+        if not _listeners:
+            return func(self, key, *args, **kwargs)
+
+        return _timed_iter(self, op, key, func(self, key, *args, **kwargs))
+
+    wrapper._kydb_instrumented = True
+    return wrapper
+
+
+def _timed_iter(db, op, key, it):
+    duration = 0.0
+    error = None
+    it = iter(it)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                break
+            except Exception as err:
+                error = type(err).__name__
+                raise
+            finally:
+                duration += time.perf_counter() - start
+
+            yield item
+    finally:
+        emit(db.url, op, key, duration, error=error)
+
+
+class OpStats:
+    """Counters and latency histogram of one op on one db"""
+
+    __slots__ = ('count', 'errors', 'total_time', 'bytes_in', 'bytes_out',
+                 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # Counts per LATENCY_BUCKETS, not cumulative
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, event: MetricEvent):
+        self.count += 1
+        self.errors += event.error is not None
+        self.total_time += event.duration
+        self.bytes_in += event.bytes_in
+        self.bytes_out += event.bytes_out
+        self.buckets[bisect_left(LATENCY_BUCKETS, event.duration)] += 1
+
+    def copy(self) -> 'OpStats':
+        res = OpStats()
+        for name in self.__slots__:
+            setattr(res, name, getattr(self, name))
+
+        res.buckets = list(self.buckets)
+        return res
+
+    def __repr__(self):
+        return (f'<OpStats count={self.count} errors={self.errors} '
+                f'total_time={self.total_time:.6f}>')
+
+
+class MetricsRegistry:
+    """A listener aggregating the events per db url and op"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def __call__(self, event: MetricEvent):
+        with self._lock:
+            stats = self._stats.get((event.db, event.op))
+            if stats is None:
+                stats = self._stats[(event.db, event.op)] = OpStats()
+
+            stats.add(event)
+
+    def snapshot(self) -> dict:
+        """A copy of the stats
+
+        :returns: dict of (db url, op) to OpStats
+        """
+        with self._lock:
+            return {k: v.copy() for k, v in self._stats.items()}
+
+    def hit_ratio(self, db: str, prefix='cache') -> Optional[float]:
+        """Fraction of reads served by the in-process cache of db
+
+        :param prefix: ``cachedb`` for the cache_db of a CacheDB
+        :returns: None if nothing was read
+        """
+        with self._lock:
+            hit = self._stats.get((db, prefix + '_hit'))
+            miss = self._stats.get((db, prefix + '_miss'))
+            hits = hit.count if hit else 0
+            total = hits + (miss.count if miss else 0)
+
+        return hits / total if total else None
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
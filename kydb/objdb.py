@@ -18,6 +18,11 @@ class ObjDBMixin:
     def upload_objdb_config(self, config):
         """ Implements upload_objdb_config from KYDBInterface """
         self.set(DBOBJ_CONFIG_PATH, config, system_obj=True)
+        self._clear_dbobj_classes()
+
+    def _clear_dbobj_classes(self):
+        """Forget the resolved classes, i.e. when the config changes"""
+        self._dbobj_classes = {}
 
     def _get_dbobj_config(self, class_name: str):
         try:
@@ -35,10 +40,24 @@ class ObjDBMixin:
 
         return cfg
 
-    def db_obj_new(self, class_name: str, key: str, kwargs: dict):
+    def _get_dbobj_class(self, class_name: str):
+        """The class for class_name as configured in the objdb config
+
+        Resolved once and then cached until the config changes.
+        """
+        try:
+            return self._dbobj_classes[class_name]
+        except KeyError:
+            pass
+
         config = self._get_dbobj_config(class_name)
         m = importlib.import_module(config['module_path'])
         cls = getattr(m, config['class_name'])
+        self._dbobj_classes[class_name] = cls
+        return cls
+
+    def db_obj_new(self, class_name: str, key: str, kwargs: dict):
+        cls = self._get_dbobj_class(class_name)
         return cls(self, class_name, key, **kwargs)
 
     @staticmethod
@@ -51,16 +70,53 @@ class ObjDBMixin:
 
     def read_dbobj(self, data):
         meta = data['meta']
-        return self.db_obj_new(meta['class_name'],
-                               meta['key'], data['data'])
+        if not meta.get('segmented'):
+            # Written before stored values were pickled one by one
+            obj = self.db_obj_new(meta['class_name'],
+                                  meta['key'], data['data'])
+            obj._update_segments()
+            obj._mark_clean()
+            return obj
 
-    def write_dbobj(self, obj):
-        data = {
+        cls = self._get_dbobj_class(meta['class_name'])
+        return cls._from_segments(self, meta['class_name'],
+                                  meta['key'], data['data'])
+
+    @staticmethod
+    def get_dbobj_data(obj) -> dict:
+        """The data of a DbObj as it is pickled in the DB
+
+        Each stored value is pickled separately so that DBs can
+        write them separately.
+        """
+        return {
             IS_DB_OBJ: True,
             'meta': {
                 'key': obj.key,
                 'class_name': obj.class_name,
+                'segmented': True,
             },
-            'data': obj.get_stored_dict()
+            'data': obj._get_segments()
         }
-        obj.db.set_raw(self._get_full_path(obj.key), pickle.dumps(data))
+
+    def write_dbobj(self, obj):
+        data = self.get_dbobj_data(obj)
+        changed = set(obj._dirty) if obj._persisted else None
+        obj.db.set_dbobj_raw(self._get_full_path(obj.key), data, changed)
+        # So the next write only sends what changes after this one
+        obj._mark_clean()
+
+    def set_dbobj_raw(self, key: str, data: dict, changed=None):
+        """
+        Set the data of a DbObj
+
+        Derived class can override this to only write the changed
+        stored values.
+
+        :param key: str:  The key to set, including base_path.
+        :param data: dict: as returned by get_dbobj_data
+        :param changed: The names of the stored values changed since the
+                        object was last read or written.
+                        None if the whole object needs writing.
+        """
+        self.set_raw(key, pickle.dumps(data))
@@ -0,0 +1,191 @@
+from contextlib import contextmanager
+from . import metrics
+import time
+
+# Ops whose duration counts as time spent in the backend
+BACKEND_OPS = set(metrics.RAW_OPS.values())
+
+
+class KeyProfile:
+    """What happened to one key within ``kydb.profile``"""
+
+    __slots__ = ('key', 'dbs', 'fetches', 'writes', 'cache_hits',
+                 'cache_misses', 'backend_time', 'serialise_time',
+                 'deserialise_time', 'bytes_in', 'bytes_out')
+
+    def __init__(self, key: str):
+        self.key = key
+        self.dbs = set()
+        self.fetches = 0
+        self.writes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.backend_time = 0.0
+        self.serialise_time = 0.0
+        self.deserialise_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def time(self) -> float:
+        return self.backend_time + self.serialise_time + \
+            self.deserialise_time
+
+    @property
+    def bytes(self) -> int:
+        return self.bytes_in + self.bytes_out
+
+    def add(self, event: metrics.MetricEvent):
+        op = event.op
+        self.dbs.add(event.db)
+        if op in BACKEND_OPS:
+            self.backend_time += event.duration
+            if op in ('get', 'get_with_version'):
+                self.fetches += 1
+            elif op.startswith('set'):
+                self.writes += 1
+        elif op == 'deserialise':
+            self.deserialise_time += event.duration
+        elif op == 'serialise':
+            self.serialise_time += event.duration
+        elif op.endswith('_hit'):
+            self.cache_hits += 1
+        elif op.endswith('_miss'):
+            self.cache_misses += 1
+
+        # Payload sizes are reported by the raw op
+        # and again by (de)serialisation. Count them once.
+        if op in BACKEND_OPS:
+            self.bytes_in += event.bytes_in
+            self.bytes_out += event.bytes_out
+
+    def __repr__(self):
+        return (f'<KeyProfile {self.key} fetches={self.fetches} '
+                f'time={self.time:.6f} bytes={self.bytes}>')
+
+
+class Profile:
+    """The operations recorded by ``kydb.profile``"""
+
+    # The attributes of KeyProfile the report can be sorted by
+    SORT_KEYS = ('time', 'bytes', 'fetches', 'backend_time',
+                 'deserialise_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.events = []
+        self.started = None
+        self.finished = None
+
+    def __call__(self, event: metrics.MetricEvent):
+        self.events.append(event)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def keys(self) -> dict:
+        """The recorded operations grouped by key
+
+        :returns: dict of key (including base_path) to KeyProfile
+        """
+        res = {}
+        for event in self.events:
+            if event.key is None:
+                continue
+
+            stats = res.get(event.key)
+            if stats is None:
+                stats = res[event.key] = KeyProfile(event.key)
+
+            stats.add(event)
+
+        return res
+
+    def top(self, by='time', n=10) -> list:
+        """The n keys with the most of ``by``
+
+        :param by: One of ``SORT_KEYS``
+        """
+        if by not in self.SORT_KEYS:
+            raise ValueError(f'Cannot sort by {by}, '
+                             f'expected one of {self.SORT_KEYS}')
+
+        return sorted(self.keys().values(),
+                      key=lambda x: getattr(x, by), reverse=True)[:n]
+
+    def duplicate_fetches(self, min_fetches=2) -> list:
+        """The keys fetched from a backend at least min_fetches times,
+        most fetched first"""
+        return sorted(
+            (x for x in self.keys().values() if x.fetches >= min_fetches),
+            key=lambda x: x.fetches, reverse=True)
+
+    def totals(self) -> dict:
+        """Seconds spent per op across all keys"""
+        res = {}
+        for event in self.events:
+            res[event.op] = res.get(event.op, 0.0) + event.duration
+
+        return res
+
+    def report(self, by='time', n=20) -> str:
+        """A table of the top n keys by ``by`` and the duplicate fetches"""
+        lines = [f'kydb profile: {len(self.events)} operations '
+                 f'in {self.elapsed:.3f}s']
+        totals = self.totals()
+        for op in sorted(totals, key=totals.get, reverse=True):
+            lines.append(f'  {op:<20} {totals[op]:>10.6f}s')
+
+        header = (f'{"key":<50} {"time":>10} {"backend":>10} '
+                  f'{"deser":>10} {"bytes":>10} {"fetches":>8} '
+                  f'{"hits":>6}')
+        lines += ['', f'Top {n} keys by {by}:', header]
+        for x in self.top(by, n):
+            lines.append(
+                f'{x.key:<50} {x.time:>10.6f} {x.backend_time:>10.6f} '
+                f'{x.deserialise_time:>10.6f} {x.bytes:>10} '
+                f'{x.fetches:>8} {x.cache_hits:>6}')
+
+        duplicates = self.duplicate_fetches()
+        if duplicates:
+            lines += ['', 'Duplicate fetches:']
+            for x in duplicates[:n]:
+                lines.append(f'{x.key:<50} {x.fetches:>8}')
+
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profile(file=None, by='time', n=20):
+    """Record every db operation within the block
+
+    Operations on all threads are recorded, including those of
+    UnionDB and CacheDB workers.
+
+    :param file: If given, the report is written to it on exit
+    :param by: What to sort the report written to file by
+    :param n: Number of keys in the report written to file
+
+example::
+
+    with kydb.profile() as prof:
+        run_batch(db)
+
+    print(prof.report())
+    prof.top('bytes', 5)      # The 5 largest payloads
+    prof.duplicate_fetches()  # Keys fetched more than once
+
+    # Or just print the report at the end
+    with kydb.profile(sys.stderr):
+        run_batch(db)
+    """
+    prof = Profile()
+    metrics.add_listener(prof)
+    prof.started = time.perf_counter()
+    try:
+        yield prof
+    finally:
+        prof.finished = time.perf_counter()
+        metrics.remove_listener(prof)
+        if file is not None:
+            print(prof.report(by, n), file=file)
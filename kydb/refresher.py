@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+
+class BackgroundRefresher:
+    """Runs refreshes on a small thread pool, at most one per key
+
+    Used to serve stale cached values while they are reloaded.
+
+::
+
+    refresher = BackgroundRefresher()
+    # Ignored while a refresh of path is still queued or running
+    refresher.submit(path, lambda: reload(path))
+
+    :param max_workers: Number of refreshes running at once
+    :param max_pending: Refreshes beyond this many queued are dropped.
+                        The key gets submitted again on its next read.
+    """
+
+    def __init__(self, max_workers=2, max_pending=1000):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix='kydb-refresh')
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, key, func) -> bool:
+        """Call func in the background unless key is already pending
+
+        Exceptions raised by func are ignored.
+
+        :returns: True if it was scheduled
+        """
+        with self._lock:
+            if key in self._pending or \
+                    len(self._pending) >= self.max_pending:
+                return False
+
+            self._pending.add(key)
+
+        self._executor.submit(self._run, key, func)
+        return True
+
+    def _run(self, key, func):
+        try:
+            func()
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def is_pending(self, key) -> bool:
+        return key in self._pending
+
+    def wait(self):
+        """Block until all the pending refreshes are done. For testing."""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+
+            time.sleep(0.01)
@@ -0,0 +1,59 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Request coalescing
+
+    Only one call per key is in flight at a time. Threads calling
+    ``do`` with a key that is already in flight wait for it and
+    share its result, or its exception.
+
+::
+
+    flight = SingleFlight()
+    # Only one thread hits the db, the others wait for its result
+    flight.do(path, lambda: db.get_raw(path))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Call func unless a call for key is already in flight
+
+        :param key: hashable identifying the call
+        :param func: callable with no arguments
+        :returns: the result of func
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.event.set()
@@ -0,0 +1,176 @@
+"""Snapshots of a folder in one file, to load it back in bulk.
+
+The file holds the raw values back to back, then an index of
+(offset, length, kind, key) and a trailer pointing at the index::
+
+    MAGIC
+    value, value, ...
+    index entry, index entry, ...
+    index offset, number of entries, MAGIC
+
+Keys are relative to the folder exported. Reading maps the file
+into memory, so values are only copied when they are used.
+
+::
+
+    db.export('/fixtures/', '/tmp/fixtures.kydb')
+    kydb.connect('memory://test').import_('/tmp/fixtures.kydb', '/fixtures/')
+"""
+from typing import Iterator, Tuple
+import mmap
+import os
+import struct
+
+MAGIC = b'KYDBSNP1'
+# offset, length, kind, length of key
+ENTRY = struct.Struct('<QQBH')
+# index offset, number of entries
+TRAILER = struct.Struct('<QQ')
+
+OBJECT = 0
+# An empty folder. Folders with anything in them are implied by it.
+FOLDER = 1
+
+
+class SnapshotWriter:
+    """Writes a snapshot, to a temporary file until closed
+
+    ::
+
+        with SnapshotWriter(path) as writer:
+            writer.add('foo/bar', data)
+            writer.add_folder('foo/empty')
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f'{path}.{os.getpid()}.tmp'
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+        self._index = []
+
+    def add(self, key: str, data):
+        self._file.write(data)
+        self._index.append((key, self._offset, len(data), OBJECT))
+        self._offset += len(data)
+        self.count += 1
+
+    def add_folder(self, key: str):
+        self._index.append((key, 0, 0, FOLDER))
+
+    def close(self):
+        f = self._file
+        self._index.sort()
+        for key, offset, length, kind in self._index:
+            encoded = key.encode()
+            f.write(ENTRY.pack(offset, length, kind, len(encoded)))
+            f.write(encoded)
+
+        f.write(TRAILER.pack(self._offset, len(self._index)))
+        f.write(MAGIC)
+        f.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class Snapshot:
+    """A snapshot file mapped into memory
+
+    Iterating yields (kind, key, data) where data is a memoryview
+    of the file, or None for folders.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        trailer_start = len(view) - TRAILER.size - len(MAGIC)
+        if len(view) < len(MAGIC) + TRAILER.size + len(MAGIC) or \
+                view[:len(MAGIC)] != MAGIC or view[-len(MAGIC):] != MAGIC:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f'{path} is not a kydb snapshot')
+
+        self._index_offset, self._count = TRAILER.unpack_from(
+            view, trailer_start)
+        view.release()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Tuple[int, str, memoryview]]:
+        view = memoryview(self._mmap)
+        pos = self._index_offset
+        for _ in range(self._count):
+            offset, length, kind, key_length = ENTRY.unpack_from(view, pos)
+            pos += ENTRY.size
+            key = bytes(view[pos:pos + key_length]).decode()
+            pos += key_length
+            yield kind, key, \
+                view[offset:offset + length] if kind == OBJECT else None
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Values still in use, i.e. by a MemoryDB.
+            # Unmapped once they are freed.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def export(db, folder: str, path: str) -> int:
+    """See ``export`` in KYDBInterface"""
+    top = db._ensure_slashes(folder)
+    root = len(db._get_full_path(top))
+    empty_folders = []
+
+    def paths():
+        for sub, subfolders, objects in db.walk(top):
+            # Leave out system objects, before telling if sub is empty
+            subfolders[:] = [x for x in subfolders if not x.startswith('.')]
+            objects = [x for x in objects if not x.startswith('.')]
+            if sub != top and not subfolders and not objects:
+                empty_folders.append(sub[len(top):-1])
+
+            for name in objects:
+                yield db._get_full_path(sub + name)
+
+    with SnapshotWriter(path) as writer:
+        for full_path, data in db.get_raw_many(paths()):
+            writer.add(full_path[root:], data)
+
+        for key in empty_folders:
+            writer.add_folder(key)
+
+    return writer.count
+
+
+def import_(db, path: str, folder: str = '/') -> int:
+    """See ``import_`` in KYDBInterface"""
+    snapshot = Snapshot(path)
+    try:
+        return db.import_raw(
+            snapshot, db._get_full_path(db._ensure_slashes(folder)))
+    finally:
+        snapshot.close()
@@ -0,0 +1,298 @@
+"""Copy the objects in a folder from one db to another,
+skipping those that are already the same.
+
+::
+
+    kydb.sync('dynamodb://prod-db', 'redis://research', '/trades/2024-01/')
+"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .base import BaseDB
+from .executors import shared_executor
+import os
+
+# How objects are compared with the destination
+COMPARE_MODES = ('version', 'hash', 'size', None)
+
+
+class SyncStats:
+    """What ``sync`` did, or would do with ``dry_run``"""
+
+    __slots__ = ('listed', 'copied', 'unchanged', 'resumed', 'bytes',
+                 'diff')
+
+    def __init__(self):
+        self.listed = 0
+        self.copied = 0
+        self.unchanged = 0
+        # Skipped as they were done before the checkpoint
+        self.resumed = 0
+        self.bytes = 0
+        # The keys that differ. Only kept with dry_run
+        self.diff = []
+
+    def __repr__(self):
+        return (f'<SyncStats listed={self.listed} copied={self.copied} '
+                f'unchanged={self.unchanged} resumed={self.resumed} '
+                f'bytes={self.bytes}>')
+
+
+def sync(src, dst, folder='/', compare='version', dry_run=False,
+         checkpoint=None, batch_size=100, max_workers=4) -> SyncStats:
+    """Copy the objects under folder from src to dst
+
+    The raw bytes are copied without deserialising them, in batches
+    read with ``get_raw_many`` and written with ``set_raw_many``. Up to
+    max_workers batches are in flight at once.
+
+    :param src: The url or db to copy from
+    :param dst: The url or db to copy to
+    :param folder: The folder to copy, recursively
+    :param compare: How to tell an object is already in dst.
+
+        - ``'version'``: the versions of the object in src and dst, read
+          without the data. If both dbs derive versions from the content
+          the same way (memory, redis, dynamodb) they are compared
+          directly. Otherwise the object is read from src and its version
+          in dst worked out from the bytes, or for dbs without content
+          versions and objects whose version is a stamp (i.e. DbObjs),
+          compared by ``'hash'``.
+        - ``'hash'``: read the object from both and compare the bytes.
+        - ``'size'``: the lengths of the object in src and dst, read
+          without the data where the db can (memory, redis, s3, files).
+          Otherwise compared by ``'hash'``.
+        - ``None``: copy everything.
+
+        Only the objects that differ are read from src, other than
+        those compared by ``'hash'``.
+
+    :param dry_run: Only work out what would be copied, see ``diff``.
+    :param checkpoint: A file recording the keys done so far. A sync
+                       interrupted with the same checkpoint carries on
+                       where it stopped. It is removed once finished.
+    :param batch_size: Objects per batch
+    :param max_workers: Batches in flight
+    :returns: SyncStats
+
+example::
+
+    stats = kydb.sync('dynamodb://prod-db', 'files://tmp/research',
+                      '/trades/2024-01/', checkpoint='/tmp/trades.sync')
+    stats.copied # returns the number of objects copied
+    """
+    if compare not in COMPARE_MODES:
+        raise ValueError(f'compare must be one of {COMPARE_MODES}, '
+                         f'got {compare}')
+
+    src = _get_db(src)
+    dst = _get_db(dst)
+    stats = SyncStats()
+    done = _read_checkpoint(checkpoint)
+
+    def copy_batch(keys):
+        # src path -> dst path
+        paths = {src._get_full_path(x): dst._get_full_path(x) for x in keys}
+        src_changed, items = _diff(src, dst, paths, compare)
+        missing = [x for x in src_changed if paths[x] not in items]
+        for path, data in src.get_raw_many(missing):
+            items[paths[path]] = data
+
+        # Less those removed from src since listed
+        changed = [paths[x] for x in src_changed if paths[x] in items]
+        if changed and not dry_run:
+            dst.set_raw_many((x, items[x]) for x in changed)
+            for path in changed:
+                dst._on_raw_write(path)
+
+        base = len(dst.base_path) - 1
+        return keys, [x[base:] for x in changed], \
+            sum(len(items[x]) for x in changed)
+
+    def batches():
+        batch = []
+        for key in src.find(BaseDB._ensure_slashes(folder)):
+            stats.listed += 1
+            if key in done:
+                stats.resumed += 1
+                continue
+
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    log = open(checkpoint, 'a') if checkpoint and not dry_run else None
+
+    def finished(futures):
+        for future in futures:
+            keys, changed, size = future.result()
+            stats.copied += len(changed)
+            stats.unchanged += len(keys) - len(changed)
+            stats.bytes += size
+            if dry_run:
+                stats.diff += changed
+
+            if log:
+                log.write(''.join(x + '\n' for x in keys))
+                log.flush()
+
+    try:
+        with ThreadPoolExecutor(max_workers,
+                                thread_name_prefix='kydb-sync') as executor:
+            pending = set()
+            for batch in batches():
+                pending.add(executor.submit(copy_batch, batch))
+                if len(pending) >= max_workers:
+                    completed, pending = wait(
+                        pending, return_when=FIRST_COMPLETED)
+                    finished(completed)
+
+            finished(pending)
+    finally:
+        if log:
+            log.close()
+
+    if log:
+        os.remove(checkpoint)
+
+    return stats
+
+
+def _get_db(db) -> BaseDB:
+    if isinstance(db, str):
+        from .api import connect
+        db = connect(db)
+
+    if not isinstance(db, BaseDB):
+        raise ValueError(f'Can only sync a single db, got {db}')
+
+    return db
+
+
+def _read_checkpoint(checkpoint) -> set:
+    if not checkpoint or not os.path.exists(checkpoint):
+        return set()
+
+    with open(checkpoint) as f:
+        # A line cut short by an interruption is not a key done
+        return set(line[:-1] for line in f if line.endswith('\n'))
+
+
+# Returned by _meta if the key does not exist
+MISSING = object()
+
+
+def _meta(db: BaseDB, func_name: str, path: str):
+    """get_version_raw or get_size_raw of path
+
+    :returns: MISSING if path does not exist,
+              None if it cannot be read without the data
+    """
+    try:
+        return getattr(db, func_name)(path)
+    except KeyError:
+        return MISSING
+    except NotImplementedError:
+        return None
+
+
+def _map_meta(func_name: str, src: BaseDB, dst: BaseDB, paths: dict) -> dict:
+    """src path -> (meta in src, meta in dst), read concurrently"""
+    def both(path):
+        return _meta(src, func_name, path), \
+            _meta(dst, func_name, paths[path])
+
+    executor = shared_executor('kydb-sync-meta', BaseDB.PREFETCH_WORKERS)
+    return dict(zip(paths, executor.map(both, paths)))
+
+
+def _diff(src: BaseDB, dst: BaseDB, paths: dict, compare):
+    """The paths of src whose data is not already in dst
+
+    :param paths: src path -> dst path
+    :returns: (the src paths, dst path -> data of those read from src)
+    """
+    if compare is None:
+        return list(paths), {}
+
+    changed = []
+    # src path -> dst path of those compared by hash
+    unknown = {}
+    if compare == 'size':
+        for path, (size, dst_size) in _map_meta(
+                'get_size_raw', src, dst, paths).items():
+            if size is MISSING:
+                continue
+
+            if dst_size is MISSING or \
+                    None not in (size, dst_size) and size != dst_size:
+                changed.append(path)
+            elif size is None or dst_size is None:
+                unknown[path] = paths[path]
+
+        items = {}
+        return changed + _diff_hashes(src, dst, unknown, items), items
+
+    if compare == 'version':
+        return _diff_versions(src, dst, paths)
+
+    items = {}
+    return _diff_hashes(src, dst, paths, items), items
+
+
+def _diff_versions(src: BaseDB, dst: BaseDB, paths: dict):
+    """See _diff"""
+    scheme = src.content_version(b'')
+    same_scheme = scheme is not None and scheme == dst.content_version(b'')
+    changed = []
+    # Read from src to work out their version in dst
+    to_read = {}
+    # src path -> dst path of those compared by hash
+    unknown = {}
+    for path, (version, dst_version) in _map_meta(
+            'get_version_raw', src, dst, paths).items():
+        if version is MISSING:
+            continue
+
+        if dst_version is MISSING:
+            changed.append(path)
+        elif dst_version is None or \
+                not dst.is_content_version(dst_version):
+            # i.e. A DbObj stamped on write
+            unknown[path] = paths[path]
+        elif same_scheme and version is not None and \
+                src.is_content_version(version):
+            if version != dst_version:
+                changed.append(path)
+        else:
+            to_read[path] = dst_version
+
+    items = {}
+    changed += _diff_hashes(src, dst, unknown, items)
+    for path, data in src.get_raw_many(to_read):
+        items[paths[path]] = data
+        if dst.content_version(data) != to_read[path]:
+            changed.append(path)
+
+    return changed, items
+
+
+def _diff_hashes(src: BaseDB, dst: BaseDB, paths: dict, items: dict) -> list:
+    """The src paths whose bytes differ in dst
+
+    :param paths: src path -> dst path
+    :param items: dst path -> data, updated with what is read from src
+    """
+    if not paths:
+        return []
+
+    existing = dict(dst.get_raw_many(paths.values()))
+    changed = []
+    for path, data in src.get_raw_many(paths):
+        items[paths[path]] = data
+        if existing.get(paths[path]) != data:
+            changed.append(path)
+
+    return changed
@@ -0,0 +1,105 @@
+import os
+from contextlib import contextmanager, ExitStack
+
+
+LOCAL_SERVICES = ('s3', 'dynamodb', 'redis')
+
+
+def get_local_services():
+    """The services to run locally
+
+    The environment variable ``KYDB_TEST_LOCAL_SERVICES`` accepts a comma
+    separated list of services (``s3``, ``dynamodb``, ``redis``).
+    """
+    return {
+        s.strip()
+        for s in os.environ.get(
+            "KYDB_TEST_LOCAL_SERVICES", ",".join(LOCAL_SERVICES)
+        ).split(",")
+        if s.strip()
+    }
+
+
+@contextmanager
+def local_services(services):
+    """Run in-memory stand-ins for s3, dynamodb and redis
+
+    s3 and dynamodb are mocked with ``moto`` and redis with ``fakeredis``.
+    The s3 bucket ``$KINYU_UNITTEST_S3_BUCKET`` and dynamodb table
+    ``$KINYU_UNITTEST_DYNAMODB`` are created.
+
+    :param services: The services to run
+    :returns: yields the sorted list of missing third-party libraries.
+              Nothing is started when it is not empty.
+    """
+    missing = []
+    if {'s3', 'dynamodb'} & set(services):
+        try:
+            from moto import mock_aws
+        except ImportError:
+            missing.append("moto")
+
+    if "redis" in services:
+        try:
+            import redis
+            import fakeredis
+        except ImportError:
+            missing.append("fakeredis")
+
+    if missing:
+        yield missing
+        return
+
+    with ExitStack() as stack:
+        if {'s3', 'dynamodb'} & set(services):
+            import boto3
+            stack.enter_context(mock_aws())
+            os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+        if "s3" in services:
+            s3 = boto3.client("s3", region_name="us-east-1")
+            bucket = os.environ.get("KINYU_UNITTEST_S3_BUCKET", "kydb-test")
+            s3.create_bucket(Bucket=bucket)
+
+        if "dynamodb" in services:
+            dynamodb = boto3.client("dynamodb", region_name="us-east-1")
+            table = os.environ.get(
+                "KINYU_UNITTEST_DYNAMODB", "kydb-test-table")
+            dynamodb.create_table(
+                TableName=table,
+                KeySchema=[{"AttributeName": "path", "KeyType": "HASH"}],
+                AttributeDefinitions=[
+                    {"AttributeName": "path", "AttributeType": "S"},
+                    {"AttributeName": "folder", "AttributeType": "S"},
+                ],
+                ProvisionedThroughput={
+                    "ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
+                GlobalSecondaryIndexes=[
+                    {
+                        "IndexName": "folder-index",
+                        "KeySchema": [
+                            {"AttributeName": "folder", "KeyType": "HASH"}],
+                        "Projection": {"ProjectionType": "ALL"},
+                        "ProvisionedThroughput": {
+                            "ReadCapacityUnits": 5,
+                            "WriteCapacityUnits": 5,
+                        },
+                    }
+                ],
+            )
+
+        if "redis" in services:
+            server = fakeredis.FakeServer()
+            original = redis.Redis
+
+            def fake_constructor(*args, **kwargs):
+                return fakeredis.FakeRedis(server=server, *args, **kwargs)
+
+            redis.Redis = fake_constructor
+
+            def restore():
+                redis.Redis = original
+
+            stack.callback(restore)
+
+        yield missing
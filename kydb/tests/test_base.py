@@ -1,5 +1,8 @@
 from kydb import BaseDB
+from concurrent.futures import ThreadPoolExecutor
+import pickle
 import pytest
+import time
 
 
 class DummyDb(BaseDB):
@@ -16,6 +19,12 @@ class DummyDb(BaseDB):
         self.cache[key] = value
 
 
+class SlowDummyDb(DummyDb):
+    def get_raw(self, key):
+        time.sleep(0.05)
+        return super().get_raw(key)
+
+
 @pytest.fixture
 def db():
     return DummyDb('memory://unittests')
@@ -93,3 +102,61 @@ def test_mkdir_bad_folder(db):
 
     with pytest.raises(ValueError):
         db.mkdir('/')
+
+
+def test_concurrent_read():
+    db = SlowDummyDb('memory://test_concurrent_read')
+    key = '/my-folder/foo'
+    db.cache[key] = pickle.dumps(123)
+
+    with ThreadPoolExecutor(16) as pool:
+        res = list(pool.map(lambda _: db.read(key), range(16)))
+
+    assert res == [123] * 16
+    assert db.raw_read_count == 1
+
+
+def test_stale_while_revalidate():
+    db = SlowDummyDb('memory://test_swr')
+    db.soft_ttl = 0.1
+    db.hard_ttl = 0.5
+    key = '/foo'
+    db[key] = 1
+    db.set_raw(key, pickle.dumps(2))
+
+    # Fresh
+    assert db[key] == 1
+    time.sleep(0.1)
+
+    # Stale is served at once and refreshed in the background
+    start = time.time()
+    assert db[key] == 1
+    assert db[key] == 1
+    assert time.time() - start < 0.05
+    db._refresher.wait()
+    assert db.raw_read_count == 1
+    assert db[key] == 2
+
+    # Past hard_ttl the read waits
+    db.set_raw(key, pickle.dumps(3))
+    time.sleep(0.5)
+    assert db[key] == 3
+    assert db.raw_read_count == 2
+
+
+def test_background_refresher():
+    from kydb.refresher import BackgroundRefresher
+    refresher = BackgroundRefresher(max_workers=1)
+    calls = []
+
+    def slow():
+        time.sleep(0.05)
+        calls.append(1)
+
+    assert refresher.submit('a', slow)
+    assert not refresher.submit('a', slow)
+    assert refresher.is_pending('a')
+    refresher.wait()
+    assert calls == [1]
+    assert refresher.submit('a', slow)
+    refresher.wait()
@@ -0,0 +1,58 @@
+from kydb import benchmarks
+from kydb.benchmarks.__main__ import main
+import json
+import pytest
+
+
+def run_tiny(**kwargs):
+    return benchmarks.run(
+        ['memory'], iterations=3, tree_iterations=2,
+        value_sizes=(10,), folder_sizes=(3,), **kwargs)
+
+
+def test_run():
+    res = run_tiny()
+    results = res['results']
+    for name in ('set[10]', 'read[10]', 'exists[hit]', 'list_dir[3]',
+                 'rm_tree[3]', 'dbobj_read[10]', 'cache_hit[10]',
+                 'cache_miss[10]', 'union_fallthrough[10]'):
+        stats = results['memory:' + name]
+        assert stats['ops_per_sec'] > 0
+        assert stats['p50_ms'] <= stats['p90_ms'] <= stats['p99_ms']
+
+    # Round trips through JSON
+    assert json.loads(json.dumps(res))['results'] == results
+
+
+def test_summarise():
+    stats = benchmarks.summarise([0.001 * (i + 1) for i in range(100)])
+    assert stats['count'] == 100
+    assert stats['p50_ms'] == pytest.approx(50)
+    assert stats['p90_ms'] == pytest.approx(90)
+    assert stats['p99_ms'] == pytest.approx(99)
+
+
+def test_compare():
+    baseline = {'results': {
+        'memory:read[10]': {'ops_per_sec': 1000},
+        'memory:set[10]': {'ops_per_sec': 1000},
+    }}
+    results = {'results': {
+        'memory:read[10]': {'ops_per_sec': 900},
+        'memory:set[10]': {'ops_per_sec': 700},
+        'memory:exists[hit]': {'ops_per_sec': 1},
+    }}
+    assert benchmarks.compare(results, baseline, threshold=0.2) == {
+        'memory:set[10]': pytest.approx(0.7)}
+
+
+def test_main(tmp_path):
+    output = tmp_path / 'bench.json'
+    args = ['--bench', 'read', '--iterations', '2', '--value-sizes', '10',
+            '--no-local-services']
+    assert main(args + ['--output', str(output)]) == 0
+
+    baseline = json.loads(output.read_text())
+    baseline['results']['memory:read[10]']['ops_per_sec'] *= 1e6
+    output.write_text(json.dumps(baseline))
+    assert main(args + ['--baseline', str(output)]) == 1
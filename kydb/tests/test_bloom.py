@@ -0,0 +1,14 @@
+from kydb.bloom import BloomFilter
+
+
+def test_bloom_filter():
+    bf = BloomFilter(1000)
+    keys = [f'/my-folder/obj{i}' for i in range(1000)]
+    for key in keys:
+        bf.add(key)
+
+    # Never a false negative
+    assert all(key in bf for key in keys)
+
+    false_positives = sum(f'/other/obj{i}' in bf for i in range(10000))
+    assert false_positives < 300
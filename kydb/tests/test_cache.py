@@ -1,7 +1,10 @@
 import kydb
+import pytest
 from kydb.tests.test_objdb import DBOBJ_CONFIG, Greeter
 from kydb.objdb import DBOBJ_CONFIG_PATH
 from kydb.cache import CacheDB
+from concurrent.futures import ThreadPoolExecutor
+import time
 
 
 def test_simple_datatype():
@@ -153,3 +156,204 @@ def test_objdb_config_cache_miss():
     #  Check that we can still read key1
     db.clear_cache()
     assert db[key1].db == db
+
+
+def test_write_behind():
+    cache_db = kydb.connect('memory://cache5')
+    persist_db = kydb.connect('memory://persist5')
+    db = CacheDB(cache_db, persist_db, write_behind=True,
+                 flush_interval=60)
+    key = '/test_write_behind/foo'
+
+    with db:
+        for i in range(10):
+            db[key] = i
+
+        # Written to cache_db straight away, persist_db has to wait
+        assert db[key] == 9
+        assert cache_db.read(key, reload=True) == 9
+        assert not persist_db.exists(key)
+
+    assert persist_db.read(key, reload=True) == 9
+    assert list(cache_db.list_dir_raw(db._queue_folder, False, 200)) == []
+
+
+def test_write_behind_recovery():
+    cache_db = kydb.connect('memory://cache6')
+    persist_db = kydb.connect('memory://persist6')
+    db = CacheDB(cache_db, persist_db, write_behind=True,
+                 flush_interval=60)
+    key = '/test_write_behind/foo'
+    db[key] = 123
+    assert not persist_db.exists(key)
+
+    # Pretend the process died, a new CacheDB picks up the queue
+    db2 = CacheDB(cache_db, persist_db, write_behind=True,
+                  flush_interval=60)
+    db2.flush()
+    assert persist_db.read(key, reload=True) == 123
+
+
+def test_write_behind_shared_cache_db():
+    cache_db = kydb.connect('memory://cache7')
+    persist_db = kydb.connect('memory://persist7')
+    other_db = kydb.connect('memory://persist7b')
+    db = CacheDB(cache_db, persist_db, write_behind=True,
+                 flush_interval=60)
+    key = '/test_write_behind/foo'
+    db[key] = 123
+
+    # Another CacheDB over the same cache_db leaves the queue alone
+    other = CacheDB(cache_db, other_db, write_behind=True,
+                    flush_interval=60)
+    other.flush()
+    assert not other_db.exists(key)
+
+    db.flush()
+    assert persist_db.read(key, reload=True) == 123
+
+
+def test_write_behind_base_path():
+    cache_db = kydb.connect('memory://wbc/cbase')
+    persist_db = kydb.connect('memory://wbp/pbase')
+    db = CacheDB(cache_db, persist_db, write_behind=True,
+                 flush_interval=60)
+    # Cached by persist_db before the write
+    persist_db['/foo'] = 0.5
+    assert persist_db['/foo'] == 0.5
+    db['/foo'] = 1
+    db.flush()
+    assert persist_db.exists('/foo')
+    assert persist_db['/foo'] == 1
+    assert not persist_db.exists('/cbase/foo')
+
+
+def test_write_behind_worker():
+    cache_db = kydb.connect('memory://cache_worker')
+    persist_db = kydb.connect('memory://persist_worker')
+    db = CacheDB(cache_db, persist_db, write_behind=True,
+                 flush_interval=0.01)
+    db['/foo'] = 1
+    worker = db._worker
+    worker.join(1)
+    # Exits once nothing is pending
+    assert not worker.is_alive()
+    assert db._worker is None
+    assert persist_db.read('/foo', reload=True) == 1
+
+    db['/foo'] = 2
+    db.close()
+    assert db._worker is None
+    assert persist_db.read('/foo', reload=True) == 2
+
+
+def test_write_behind_errors(caplog, monkeypatch):
+    cache_db = kydb.connect('memory://cache_errors')
+    persist_db = kydb.connect('memory://persist_errors')
+    db = CacheDB(cache_db, persist_db, write_behind=True,
+                 flush_interval=0.001)
+    monkeypatch.setattr(db, 'WRITE_BEHIND_MAX_RETRIES', 3)
+
+    def fail(items):
+        raise IOError('persist_db is down')
+
+    monkeypatch.setattr(persist_db, 'set_raw_many', fail)
+    db['/foo'] = 1
+    worker = db._worker
+    worker.join(1)
+    # Gave up but the key is still pending
+    assert not worker.is_alive()
+    assert len([x for x in caplog.records
+                if 'persist_db is down' in x.exc_text]) == 3
+    with pytest.raises(IOError):
+        db.flush()
+
+    monkeypatch.undo()
+    db.flush()
+    assert persist_db.read('/foo', reload=True) == 1
+
+
+def test_ttl():
+    cache_db = kydb.connect('memory://cache7')
+    persist_db = kydb.connect('memory://persist7')
+    db = CacheDB(cache_db, persist_db, ttl=60,
+                 folder_ttls={'/short/': 0.01})
+
+    db['/short/foo'] = 1
+    db['/long/foo'] = 2
+    time.sleep(0.02)
+    assert not cache_db.exists('/short/foo')
+    assert cache_db.exists('/long/foo')
+
+    # Promoted again on read and expires again
+    assert db['/short/foo'] == 1
+    assert cache_db.exists('/short/foo')
+    time.sleep(0.02)
+    assert not cache_db.exists('/short/foo')
+
+
+def test_admission():
+    cache_db = kydb.connect('memory://cache8')
+    persist_db = kydb.connect('memory://persist8')
+    db = CacheDB(cache_db, persist_db, admit_reads=1, admit_max_size=100)
+    persist_db['/small'] = 'a'
+    persist_db['/big'] = 'a' * 1000
+
+    assert db['/small'] == 'a'
+    assert not cache_db.exists('/small')
+    assert db['/small'] == 'a'
+    assert cache_db.exists('/small')
+
+    for _ in range(3):
+        assert db['/big'] == 'a' * 1000
+    assert not cache_db.exists('/big')
+
+
+def test_concurrent_read():
+    db = kydb.connect('memory://cache9|memory://persist9')
+    db.persist_db['/foo'] = 123
+    db.persist_db.clear_cache()
+    reads = []
+    get_raw = db.persist_db.get_raw
+
+    def slow_get_raw(key):
+        reads.append(key)
+        time.sleep(0.05)
+        return get_raw(key)
+
+    db.persist_db.get_raw = slow_get_raw
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(lambda _: db['/foo'], range(8))) == [123] * 8
+
+    assert reads == ['/foo']
+
+
+def test_prefetch():
+    db = kydb.connect('memory://cache_prefetch|memory://persist_prefetch')
+    folder = '/test_prefetch/'
+    for i in range(5):
+        db.persist_db[f'{folder}obj{i}'] = i
+
+    assert db.prefetch(folder) == 5
+    # Now in cache_db
+    assert db.cache_db.read_dir(folder) == {
+        f'{folder}obj{i}': i for i in range(5)}
+    assert db.read_dir(folder, pattern='obj[12]') == {
+        folder + 'obj1': 1, folder + 'obj2': 2}
+    db.rm_tree(folder)
+
+
+def test_soft_ttl():
+    db = kydb.connect('memory://cache_swr|memory://persist_swr',
+                      soft_ttl=0.05)
+    key = '/test_soft_ttl/foo'
+    db.persist_db[key] = 1
+    assert db[key] == 1
+    db.persist_db[key] = 2
+    assert db[key] == 1
+    time.sleep(0.05)
+    # Stale served, then refreshed
+    assert db[key] == 1
+    db._refresher.wait()
+    assert db[key] == 2
+    db.rm_tree('/test_soft_ttl')
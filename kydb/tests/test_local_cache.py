@@ -0,0 +1,108 @@
+from kydb.local_cache import LocalCache, DEFAULT_TTL
+from kydb.impl.memory import MemoryDB
+import errno
+import os
+import time
+
+
+def test_put_get(tmp_path):
+    cache = LocalCache(str(tmp_path))
+    assert cache.get('memory://foo/bar') is None
+    cache.put('memory://foo/bar', b'hello\nworld', version='v1')
+    assert cache.get('memory://foo/bar') == b'hello\nworld'
+    assert cache.get_entry('memory://foo/bar') == (b'hello\nworld', 'v1')
+
+    # Another process sees the same entries
+    other = LocalCache(str(tmp_path))
+    assert other.get('memory://foo/bar') == b'hello\nworld'
+
+    cache.discard('memory://foo/bar')
+    assert other.get('memory://foo/bar') is None
+    cache.discard('memory://foo/bar')
+
+
+def test_ttl(tmp_path):
+    cache = LocalCache(str(tmp_path), ttl=0.05)
+    cache.put('memory://foo/bar', b'hello')
+    assert cache.get('memory://foo/bar') == b'hello'
+    time.sleep(0.1)
+    assert cache.get('memory://foo/bar') is None
+    assert not os.listdir(tmp_path)
+
+
+def test_evict(tmp_path):
+    cache = LocalCache(str(tmp_path), max_size=1000)
+    for i in range(5):
+        cache.put(f'memory://foo/obj{i}', b'x' * 200)
+        # Make obj0 the most recently read
+        cache.get('memory://foo/obj0')
+        time.sleep(0.01)
+
+    cache.put('memory://foo/obj5', b'x' * 200)
+    assert cache.get('memory://foo/obj0') is not None
+    assert cache.get('memory://foo/obj1') is None
+    assert cache.get('memory://foo/obj5') is not None
+
+    cache.clear()
+    assert not os.listdir(tmp_path)
+
+
+def test_db(tmp_path):
+    db = MemoryDB('memory://test_local_cache')
+    db.local_cache = LocalCache(str(tmp_path))
+    db['/foo'] = 123
+    assert db.read('/foo', reload=True) == 123
+
+    # Another process connecting to the same db reads from local_cache
+    other = MemoryDB('memory://test_local_cache_other')
+    other.db_name = db.db_name
+    other.local_cache = LocalCache(str(tmp_path))
+    db.get_cache().clear()
+    assert other.read('/foo') == 123
+
+    # Writes discard the entry
+    db['/foo'] = 456
+    assert other.read('/foo', reload=True) == 456
+
+
+def test_config(tmp_path, monkeypatch):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(f'''
+dbs:
+  test_local_cache_config:
+    local_cache:
+      path: {tmp_path}/cache
+      max_size: 1000
+      ttl: 60
+''')
+    monkeypatch.setenv('KYDB_CONFIG_PATH', str(config_path))
+    db = MemoryDB('memory://test_local_cache_config')
+    cache = db.local_cache
+    assert (cache.path, cache.max_size, cache.ttl) == (
+        f'{tmp_path}/cache', 1000, 60)
+
+    monkeypatch.delenv('KYDB_CONFIG_PATH')
+    assert MemoryDB('memory://test_local_cache_config').local_cache is None
+
+
+def test_put_error(tmp_path, monkeypatch):
+    db = MemoryDB('memory://test_local_cache_full')
+    db.local_cache = LocalCache(str(tmp_path))
+    db['/foo'] = 123
+
+    def replace(src, dst):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    monkeypatch.setattr(os, 'replace', replace)
+    # The read still succeeds
+    assert db.read('/foo', reload=True) == 123
+    assert db.local_cache.put('memory://foo', b'hello') is False
+    monkeypatch.undo()
+    assert os.listdir(tmp_path) == []
+    assert db.local_cache.get('memory://foo') is None
+
+
+def test_default_ttl(tmp_path):
+    assert LocalCache(str(tmp_path)).ttl == DEFAULT_TTL
+    assert LocalCache.from_config({'path': str(tmp_path)}).ttl == DEFAULT_TTL
+    assert LocalCache.from_config({'ttl': None}).ttl is None
@@ -0,0 +1,131 @@
+import kydb
+from kydb import metrics
+import pytest
+
+
+@pytest.fixture
+def events():
+    events = []
+    metrics.add_listener(events.append)
+    yield events
+    metrics.remove_listener(events.append)
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.MetricsRegistry()
+    metrics.add_listener(registry)
+    yield registry
+    metrics.remove_listener(registry)
+
+
+def test_raw_ops(events):
+    db = kydb.connect('memory://test_metrics')
+    db['/foo'] = b'x' * 100
+    sets = [x for x in events if x.op == 'set']
+    assert [x.key for x in sets] == ['/foo']
+    assert sets[0].bytes_out > 100
+    assert sets[0].db == db.url
+    assert [x.key for x in events if x.op == 'serialise'] == ['/foo']
+
+    del events[:]
+    assert db.read('/foo', reload=True) == b'x' * 100
+    assert [x.op for x in events] == ['cache_miss', 'get', 'deserialise']
+    assert events[1].bytes_in == events[2].bytes_in > 100
+
+    del events[:]
+    db['/foo']
+    assert [x.op for x in events] == ['cache_hit']
+
+    # get_raw called by exists_raw is not reported on its own
+    del events[:]
+    assert db.exists('/foo')
+    assert not db.exists('/bar')
+    assert [x.op for x in events] == ['exists', 'exists']
+
+    del events[:]
+    assert db.ls('/') == ['foo']
+    assert [x.op for x in events] == ['list_dir']
+
+    del events[:]
+    with pytest.raises(KeyError):
+        db.get_raw('/bar')
+
+    assert events[0].error == 'KeyError'
+
+    del events[:]
+    db.refresh('/foo')
+    db.clear_cache()
+    assert [(x.op, x.key) for x in events] == [
+        ('cache_evict', '/foo'), ('cache_evict', None)]
+
+    db.delete('/foo')
+
+
+def test_batch_ops(events):
+    db = kydb.connect('memory://test_metrics')
+    db.set_raw_many((f'/obj{i}', b'x' * (i + 1)) for i in range(3))
+    assert [(x.op, x.key, x.bytes_out) for x in events] == [
+        ('set_many', f'/obj{i}', i + 1) for i in range(3)]
+
+    del events[:]
+    db.set_dbobj_raw('/dbobj', {'a': b'xx', 'b': b'yyy'})
+    db.set_dbobj_raw('/dbobj', {'a': b'xx', 'b': b'yyy'}, {'b'})
+    assert [(x.op, x.key, x.bytes_out) for x in events] == [
+        ('set_dbobj', '/dbobj', 5), ('set_dbobj', '/dbobj', 3)]
+
+    for i in range(3):
+        db.delete(f'/obj{i}')
+
+    db.delete('/dbobj')
+
+
+def test_disabled():
+    events = []
+    metrics.add_listener(events.append)
+    metrics.remove_listener(events.append)
+    db = kydb.connect('memory://test_metrics')
+    db['/foo'] = 1
+    db['/foo']
+    assert not events
+    assert not metrics.enabled()
+    db.delete('/foo')
+
+
+def test_registry(registry):
+    db = kydb.connect('memory://test_metrics')
+    for i in range(3):
+        db[f'/obj{i}'] = i + 1
+
+    db.clear_cache()
+    for i in range(3):
+        db[f'/obj{i}']
+        db[f'/obj{i}']
+
+    stats = registry.snapshot()
+    assert stats[(db.url, 'set')].count == 3
+    assert stats[(db.url, 'get')].count == 3
+    assert sum(stats[(db.url, 'get')].buckets) == 3
+    assert stats[(db.url, 'get')].bytes_in > 0
+    assert registry.hit_ratio(db.url) == 0.5
+
+    registry.reset()
+    assert registry.snapshot() == {}
+    assert registry.hit_ratio(db.url) is None
+    for i in range(3):
+        db.delete(f'/obj{i}')
+
+
+def test_cachedb(registry):
+    db = kydb.connect('memory://test_metrics_cache|memory://test_metrics')
+    db['/foo'] = 1
+    db.cache_db.delete('/foo')
+    db['/foo']
+    db['/foo']
+    assert registry.hit_ratio(db.cache_db.url, 'cachedb') == 0.5
+
+    stats = registry.snapshot()
+    # Each db in the stack is measured on its own
+    assert (db.persist_db.url, 'set') in stats
+    assert (db.cache_db.url, 'set') in stats
+    db.delete('/foo')
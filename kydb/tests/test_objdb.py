@@ -1,6 +1,9 @@
 import kydb
 import pytest
 from kydb.exceptions import DbObjException
+import gc
+import importlib
+import weakref
 
 OBJ_MODULE_PATH = 'kydb.tests.test_objdb'
 OBJ_CLASS_NAME = 'Greeter'
@@ -13,6 +16,14 @@ DBOBJ_CONFIG = {
     'Greeter': {
         'module_path': OBJ_MODULE_PATH,
         'class_name': OBJ_CLASS_NAME
+    },
+    'ExtendedGreeter': {
+        'module_path': OBJ_MODULE_PATH,
+        'class_name': 'ExtendedGreeter'
+    },
+    'Basket': {
+        'module_path': OBJ_MODULE_PATH,
+        'class_name': 'Basket'
     }
 }
 
@@ -145,3 +156,302 @@ def test_multiple(db):
     assert(greeter1.greet() == 'Hello Tony')
     assert(greeter2.greet() == 'Hello Mary')
     assert(greeter3.greet() == 'Hello Jane')
+
+
+class DefaultCounter(kydb.DbObj):
+    default_calls = 0
+
+    @kydb.stored
+    def name(self):
+        DefaultCounter.default_calls += 1
+        return 'John'
+
+
+class ExtendedGreeter(Greeter):
+
+    @kydb.stored
+    def age(self):
+        return 30
+
+
+def test_stored_attrs_per_class(db):
+    assert Greeter._stored_attrs == ('name',)
+    assert ExtendedGreeter._stored_attrs == ('age', 'name')
+
+    obj = ExtendedGreeter(db, 'ExtendedGreeter', '/extended', name='Tony')
+    assert obj.get_stored_dict() == {'age': 30, 'name': 'Tony'}
+    assert obj.greet() == 'Hello Tony'
+
+    DefaultCounter(db, 'DefaultCounter', '/counter', name='Tony')
+    assert DefaultCounter.default_calls == 0
+    obj = DefaultCounter(db, 'DefaultCounter', '/counter')
+    assert DefaultCounter.default_calls == 1
+    obj.name.clear()
+    assert DefaultCounter.default_calls == 2
+
+
+def test_dbobj_class_cache(db, monkeypatch):
+    imports = []
+    import_module = importlib.import_module
+
+    def counting_import_module(name):
+        imports.append(name)
+        return import_module(name)
+
+    monkeypatch.setattr(importlib, 'import_module', counting_import_module)
+    db.clear_cache()
+    for i in range(10):
+        assert type(db.new('Greeter', f'/greeter{i}')).__name__ == 'Greeter'
+
+    assert imports == [OBJ_MODULE_PATH]
+
+    # Uploading a new config takes effect straight away
+    db.upload_objdb_config({
+        'Greeter': {
+            'module_path': OBJ_MODULE_PATH,
+            'class_name': 'ExtendedGreeter'
+        }
+    })
+    assert type(db.new('Greeter', '/greeter')).__name__ == 'ExtendedGreeter'
+    assert imports == [OBJ_MODULE_PATH] * 2
+
+
+def test_write_only_when_dirty(db):
+    key = '/unittest/dbobj/greeter002'
+    db.new('Greeter', key, name='Tony').write()
+    writes = []
+    set_raw = db.set_raw
+
+    def counting_set_raw(path, value):
+        writes.append(path)
+        set_raw(path, value)
+
+    db.set_raw = counting_set_raw
+    try:
+        greeter = db.read(key, reload=True)
+        assert not greeter.is_dirty()
+        greeter.write()
+        assert writes == []
+
+        greeter.name.setvalue('Jane')
+        assert greeter.is_dirty()
+        greeter.write()
+        assert writes == [key]
+        assert not greeter.is_dirty()
+        assert db.read(key, reload=True).name() == 'Jane'
+    finally:
+        del db.set_raw
+        db.delete(key)
+
+
+def test_lazy_stored_values(db):
+    key = '/unittest/dbobj/extended001'
+    db.new('ExtendedGreeter', key, name='Tony', age=40).write()
+    obj = db.read(key, reload=True)
+
+    # Nothing unpickled until accessed
+    assert obj._stored_values == {}
+    assert obj.name() == 'Tony'
+    assert obj._stored_values == {'name': 'Tony'}
+
+    # Writing does not need to unpickle untouched values
+    obj.name.setvalue('Jane')
+    obj.write()
+    assert 'age' not in obj._stored_values
+
+    obj = db.read(key, reload=True)
+    assert obj.get_stored_dict() == {'age': 40, 'name': 'Jane'}
+    obj.delete()
+
+
+class Quote(kydb.DbObj):
+
+    @kydb.stored
+    def price(self):
+        return 100.0
+
+
+class Position(kydb.DbObj):
+    value_calls = 0
+
+    @kydb.stored
+    def qty(self):
+        return 1
+
+    @kydb.stored
+    def quote(self):
+        return None
+
+    @kydb.computed
+    def value(self):
+        Position.value_calls += 1
+        return self.qty() * self.quote().price()
+
+    @kydb.computed
+    def scaled_value(self, factor):
+        return self.value() * factor
+
+
+def test_computed(db):
+    quote = Quote(db, 'Quote', '/quote')
+    pos = Position(db, 'Position', '/pos', qty=2, quote=quote)
+    other = Position(db, 'Position', '/other', qty=3, quote=Quote(
+        db, 'Quote', '/quote2'))
+    Position.value_calls = 0
+
+    assert pos.scaled_value(10) == 2000.0
+    assert pos.value() == 200.0
+    assert other.value() == 300.0
+    assert Position.value_calls == 2
+
+    # Only what depends on the quote gets recalculated
+    quote.price.setvalue(101.0)
+    assert pos.scaled_value(10) == 2020.0
+    assert other.value() == 300.0
+    assert Position.value_calls == 3
+
+    pos.qty.setvalue(1)
+    assert pos.value() == 101.0
+    assert Position.value_calls == 4
+
+
+def test_computed_cache_context(db):
+    quote = Quote(db, 'Quote', '/quote')
+    pos = Position(db, 'Position', '/pos', qty=2, quote=quote)
+    assert pos.value() == 200.0
+
+    with db.cache_context():
+        what_if = Quote(db, 'Quote', '/quote', price=50.0)
+        pos.quote.setvalue(what_if)
+        assert pos.value() == 100.0
+        pos.quote.setvalue(quote)
+        Position.value_calls = 0
+        assert pos.value() == 200.0
+        assert Position.value_calls == 1
+
+    # The result from the context is gone, the base is recalculated
+    # since the quote was changed
+    Position.value_calls = 0
+    assert pos.value() == 200.0
+    assert Position.value_calls == 1
+    assert pos.value() == 200.0
+    assert Position.value_calls == 1
+
+
+def test_computed_outer_context(db):
+    quote = Quote(db, 'Quote', '/quote')
+    pos = Position(db, 'Position', '/pos', qty=2, quote=quote)
+    Position.value_calls = 0
+    assert pos.value() == 200.0
+
+    # Results from the enclosing contexts are used
+    with db.cache_context():
+        with db.cache_context():
+            assert pos.value() == 200.0
+
+    assert Position.value_calls == 1
+
+
+def test_computed_dependents_freed(db):
+    quote = Quote(db, 'Quote', '/quote')
+    pos = Position(db, 'Position', '/pos', qty=2, quote=quote)
+    assert pos.value() == 200.0
+    pos_ref = weakref.ref(pos)
+
+    # quote only weakly refers to what is computed from it
+    del pos
+    gc.collect()
+    assert pos_ref() is None
+    quote.price.setvalue(101.0)
+
+
+class Basket(kydb.DbObj):
+
+    @kydb.stored
+    def name(self):
+        return 'x'
+
+    @kydb.stored
+    def items(self):
+        return []
+
+
+def test_write_in_place_change(db):
+    key = '/unittest/dbobj/basket001'
+    db.new('Basket', key).write()
+
+    basket = db.read(key, reload=True)
+    basket.items().append(1)
+    basket.name.setvalue('y')
+    basket.write()
+    basket = db.read(key, reload=True)
+    assert basket.items() == [1]
+    assert basket.name() == 'y'
+
+    # Changed in place only
+    basket.items().append(2)
+    assert basket.is_dirty()
+    basket.write()
+    assert not basket.is_dirty()
+    assert db.read(key, reload=True).items() == [1, 2]
+    db.delete(key)
+
+
+def test_lazy_in_place_change(db):
+    key = '/unittest/dbobj/basket002'
+    db.new('Basket', key, items=[1]).write()
+
+    basket = db.read(key, reload=True)
+    assert basket._stored_values == {}
+    basket.items().append(2)
+    assert basket.is_dirty()
+    basket.write()
+    # The untouched value is still not unpickled
+    assert 'name' not in basket._stored_values
+
+    basket = db.read(key, reload=True)
+    assert basket.get_stored_dict() == {'items': [1, 2], 'name': 'x'}
+    db.delete(key)
+
+
+class PickleCounter:
+    count = 0
+
+    def __reduce__(self):
+        PickleCounter.count += 1
+        return PickleCounter, ()
+
+
+def test_write_pickles_once(db):
+    key = '/unittest/dbobj/basket003'
+    basket = db.new('Basket', key, items=[PickleCounter()])
+    PickleCounter.count = 0
+    basket.write()
+    assert PickleCounter.count == 1
+
+    basket.name.setvalue('y')
+    PickleCounter.count = 0
+    basket.write()
+    assert PickleCounter.count == 1
+    db.delete(key)
+
+
+def test_set_marks_clean(db):
+    key = '/unittest/dbobj/basket004'
+    basket = db.new('Basket', key)
+    db[key] = basket
+    assert not basket.is_dirty()
+
+    written = []
+    set_dbobj_raw = db.set_dbobj_raw
+
+    def recording_set_dbobj_raw(key, data, changed=None):
+        written.append(changed)
+        return set_dbobj_raw(key, data, changed)
+
+    db.set_dbobj_raw = recording_set_dbobj_raw
+    basket.name.setvalue('y')
+    basket.write()
+    # Only what changed since db[key] = basket
+    assert written == [{'name'}]
+    db.delete(key)
@@ -0,0 +1,49 @@
+import kydb
+import io
+import pytest
+
+
+def test_profile():
+    db = kydb.connect('memory://test_profiling')
+    db['/small'] = 1
+    db['/big'] = b'x' * 10000
+    db.clear_cache()
+
+    out = io.StringIO()
+    with kydb.profile(out) as prof:
+        for i in range(5):
+            db.read('/small', reload=True)
+
+        db['/big']
+        db['/big']
+
+    keys = prof.keys()
+    small = keys[db._get_full_path('/small')]
+    assert small.fetches == 5
+    assert small.cache_misses == 5
+    assert small.backend_time > 0
+    assert small.deserialise_time > 0
+    assert small.dbs == {db.url}
+
+    big = keys[db._get_full_path('/big')]
+    assert big.fetches == 1
+    assert big.cache_hits == 1
+    assert big.bytes > 10000
+
+    assert [x.key for x in prof.top('bytes', 1)] == [big.key]
+    assert [x.key for x in prof.duplicate_fetches()] == [small.key]
+
+    with pytest.raises(ValueError):
+        prof.top('colour')
+
+    report = out.getvalue()
+    assert report == prof.report() + '\n'
+    assert 'Duplicate fetches' in report
+
+    # Nothing recorded after exit
+    n = len(prof.events)
+    db['/small']
+    assert len(prof.events) == n
+
+    db.delete('/small')
+    db.delete('/big')
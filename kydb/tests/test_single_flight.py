@@ -0,0 +1,39 @@
+from kydb.single_flight import SingleFlight
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import pytest
+
+
+def test_do_coalesces():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait()
+        return 123
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flight.do, 'key', fetch) for _ in range(8)]
+        while not calls:
+            time.sleep(0.001)
+        release.set()
+        assert [f.result() for f in futures] == [123] * 8
+
+    assert len(calls) == 1
+
+    # Nothing in flight any more, so the next call fetches again
+    assert flight.do('key', fetch) == 123
+    assert len(calls) == 2
+
+
+def test_do_error():
+    flight = SingleFlight()
+
+    def fetch():
+        raise KeyError('key')
+
+    with pytest.raises(KeyError):
+        flight.do('key', fetch)
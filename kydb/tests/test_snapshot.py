@@ -0,0 +1,99 @@
+import kydb
+import pytest
+from kydb.snapshot import Snapshot, SnapshotWriter, OBJECT, FOLDER
+
+
+@pytest.fixture
+def db():
+    db = kydb.connect('memory://test_snapshot/base')
+    db['/fixtures/a'] = 1
+    db['/fixtures/foo/b'] = {'x': 2}
+    db['/fixtures/foo/bar/c'] = [3]
+    db.mkdir('/fixtures/empty')
+    db['/other/d'] = 4
+    return db
+
+
+def test_writer(tmp_path):
+    path = str(tmp_path / 'snap')
+    with SnapshotWriter(path) as writer:
+        writer.add('b', b'hello')
+        writer.add('a', b'')
+        writer.add_folder('c')
+
+    assert writer.count == 2
+    with Snapshot(path) as snap:
+        assert len(snap) == 3
+        assert [(kind, key, data if data is None else bytes(data))
+                for kind, key, data in snap] == [
+            (OBJECT, 'a', b''), (OBJECT, 'b', b'hello'), (FOLDER, 'c', None)]
+
+
+def test_writer_error(tmp_path):
+    path = tmp_path / 'snap'
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter(str(path)) as writer:
+            writer.add('a', b'hello')
+            raise RuntimeError()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_not_snapshot(tmp_path):
+    path = tmp_path / 'snap'
+    path.write_bytes(b'hello world' * 10)
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+def test_export_import(db, tmp_path):
+    path = str(tmp_path / 'fixtures.kydb')
+    assert db.export('/fixtures', path) == 3
+
+    db2 = kydb.connect('memory://test_snapshot2')
+    assert db2.import_(path, '/copy/') == 3
+    assert db2['/copy/a'] == 1
+    assert db2['/copy/foo/b'] == {'x': 2}
+    assert db2['/copy/foo/bar/c'] == [3]
+    assert sorted(db2.ls('/copy')) == ['a', 'empty/', 'foo/']
+    assert sorted(db2.ls('/copy/foo')) == ['b', 'bar/']
+    assert db2.ls('/copy/empty') == []
+    assert not db2.exists('/copy/d')
+
+    # A folder holding only system objects is kept, as an empty folder
+    db.set('/fixtures/system/.hidden', 5, system_obj=True)
+    assert db.export('/fixtures', path) == 3
+    db3 = kydb.connect('memory://test_snapshot3')
+    db3.import_(path)
+    assert db3.is_dir('/system')
+    assert db3.ls('/system') == []
+    assert not db3.exists('/system/.hidden')
+
+    # Values are copied out of the file on read
+    raw = db2.get_raw('/copy/a')
+    assert isinstance(raw, bytes)
+
+    db2['/copy/a'] = 10
+    db2.delete('/copy/foo/b')
+    assert db2.read('/copy/a', reload=True) == 10
+    assert not db2.exists('/copy/foo/b')
+
+
+def test_import_files(db, tmp_path):
+    path = str(tmp_path / 'fixtures.kydb')
+    db.export('/fixtures/', path)
+    files_db = kydb.connect('files:/' + str(tmp_path / 'files'))
+    assert files_db.import_(path) == 3
+    assert files_db['/foo/bar/c'] == [3]
+    assert files_db.is_dir('/empty')
+
+
+def test_boot_from_snapshot(db, tmp_path, monkeypatch):
+    path = str(tmp_path / 'fixtures.kydb')
+    db.export('/fixtures/', path)
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(
+        f'dbs:\n  test_snapshot_boot:\n    snapshot: {path}\n')
+    monkeypatch.setenv('KYDB_CONFIG_PATH', str(config_path))
+    booted = kydb.connect('memory://test_snapshot_boot')
+    assert booted['/foo/b'] == {'x': 2}
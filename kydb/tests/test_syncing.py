@@ -0,0 +1,111 @@
+import kydb
+import pytest
+from kydb.syncing import sync
+
+
+@pytest.fixture
+def src():
+    db = kydb.connect('memory://test_sync_src/base')
+    for i in range(10):
+        db[f'/trades/2024-01/t{i}'] = {'qty': i + 1}
+        db[f'/trades/2024-02/t{i}'] = {'qty': i + 1}
+
+    db['/other/x'] = 1
+    return db
+
+
+def dst_urls(tmp_path):
+    return ['memory://test_sync_dst', 'files:/' + str(tmp_path)]
+
+
+@pytest.mark.parametrize('i', range(2))
+def test_sync(src, tmp_path, i):
+    dst = kydb.connect(dst_urls(tmp_path)[i])
+    stats = sync(src, dst, '/trades/2024-01', batch_size=3)
+    assert (stats.listed, stats.copied, stats.unchanged) == (10, 10, 0)
+    assert dst['/trades/2024-01/t3'] == {'qty': 4}
+    assert not dst.exists('/trades/2024-02/t3')
+    assert dst.ls('/trades/') == ['2024-01/']
+
+    src['/trades/2024-01/t3'] = {'qty': 100}
+    dst['/trades/2024-01/t4'] = {'qty': 200}
+    stats = sync(src, dst, '/trades/2024-01', batch_size=3)
+    assert (stats.copied, stats.unchanged) == (2, 8)
+    assert dst['/trades/2024-01/t3'] == {'qty': 100}
+    assert dst['/trades/2024-01/t4'] == {'qty': 5}
+
+
+@pytest.mark.parametrize('compare', ['version', 'hash', 'size', None])
+def test_compare(src, compare):
+    dst = kydb.connect('memory://test_sync_compare')
+    sync(src, dst, '/trades/')
+    src['/trades/2024-01/t1'] = {'qty': 3}  # Same size
+    src['/trades/2024-01/t2'] = {'qty': 3000}
+    stats = sync(src, dst, '/trades/', compare=compare)
+    assert stats.copied == {
+        'version': 2, 'hash': 2, 'size': 1, None: 20}[compare]
+
+
+@pytest.mark.parametrize('compare,i', [
+    ('version', 0), ('size', 0), ('size', 1)])
+def test_resync_reads(src, tmp_path, compare, i):
+    dst = kydb.connect(dst_urls(tmp_path)[i])
+    sync(src, dst, '/trades/2024-01', compare=compare)
+
+    reads = []
+    for db in (src, dst):
+        def counting_get_raw_many(keys, get_raw_many=db.get_raw_many):
+            keys = list(keys)
+            reads.extend(keys)
+            return get_raw_many(keys)
+
+        db.get_raw_many = counting_get_raw_many
+
+    # Nothing changed so nothing is read, only versions or sizes
+    stats = sync(src, dst, '/trades/2024-01', compare=compare)
+    assert stats.unchanged == 10
+    assert reads == []
+
+    src['/trades/2024-01/t2'] = {'qty': 3000}
+    stats = sync(src, dst, '/trades/2024-01', compare=compare)
+    assert stats.copied == 1
+    assert reads == [src._get_full_path('/trades/2024-01/t2')]
+
+
+def test_dry_run(src):
+    dst = kydb.connect('memory://test_sync_dry_run')
+    dst['/trades/2024-01/t1'] = {'qty': 2}
+    stats = sync(src.url, dst.url, '/trades/2024-01/', dry_run=True)
+    assert stats.copied == 9
+    assert sorted(stats.diff) == sorted(
+        f'/trades/2024-01/t{i}' for i in range(10) if i != 1)
+    assert not dst.exists('/trades/2024-01/t0')
+
+
+def test_checkpoint(src, tmp_path):
+    dst = kydb.connect('memory://test_sync_checkpoint')
+    checkpoint = tmp_path / 'sync.checkpoint'
+    checkpoint.write_text('/trades/2024-01/t0\n/trades/2024-01/t1\n'
+                          '/trades/2024-01/t2')
+    stats = sync(src, dst, '/trades/2024-01/', checkpoint=str(checkpoint))
+    assert (stats.resumed, stats.copied) == (2, 8)
+    # The last line was cut short so is copied
+    assert dst.exists('/trades/2024-01/t2')
+    assert not dst.exists('/trades/2024-01/t1')
+    assert not checkpoint.exists()
+
+
+def test_dst_cache_dropped(src):
+    dst = kydb.connect('memory://test_sync_cache')
+    dst['/trades/2024-01/t1'] = {'qty': 0}
+    assert dst['/trades/2024-01/t1'] == {'qty': 0}
+    sync(src, dst, '/trades/2024-01/')
+    assert dst['/trades/2024-01/t1'] == {'qty': 2}
+
+
+def test_bad_args(src):
+    with pytest.raises(ValueError):
+        sync(src, 'memory://a;memory://b', '/trades/')
+
+    with pytest.raises(ValueError):
+        sync(src, 'memory://test_sync_bad', '/trades/', compare='mtime')
@@ -1,4 +1,10 @@
 import kydb
+from kydb.cache import CacheDB
+from kydb.union import UnionDB
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import threading
+import time
 
 
 def test_basic():
@@ -43,3 +49,197 @@ def test_list_dir():
     assert set(db.ls('/', False)) == set(['obj6'])
     assert set(db.ls('/a/', False)) == set(['obj3', 'obj5'])
     assert set(db.ls('/a/b/', False)) == set(['obj1', 'obj2', 'obj4'])
+
+
+def test_concurrent_read():
+    db = kydb.connect('memory://union_db5;memory://union_db6')
+    db1, db2 = db.dbs
+    db2['/foo'] = 1
+    db2.clear_cache()
+    reads = []
+    get_raw = db2.get_raw
+
+    def slow_get_raw(key):
+        reads.append(key)
+        time.sleep(0.05)
+        return get_raw(key)
+
+    db2.get_raw = slow_get_raw
+    with ThreadPoolExecutor(8) as pool:
+        assert list(pool.map(lambda _: db['/foo'], range(8))) == [1] * 8
+
+    assert reads == ['/foo']
+
+
+def test_parallel():
+    db = kydb.connect('memory://union_db7;memory://union_db8', parallel=True)
+    db1, db2 = db.dbs
+    db1['/foo'] = 1
+    db2['/foo'] = 2
+    db2['/bar'] = 3
+    db2.mkdir('/my-folder')
+
+    assert db['/foo'] == 1
+    assert db.read('/bar') == 3
+    assert db.exists('/bar')
+    assert not db.exists('/baz')
+    assert db.is_dir('/my-folder')
+    with pytest.raises(KeyError):
+        db['/baz']
+
+
+def test_close():
+    with kydb.connect('memory://union_db17;memory://union_db18',
+                      parallel=True, filter_layers=[0]) as db:
+        db.dbs[1]['/foo'] = 1
+        assert db['/foo'] == 1
+        executor = db._executor
+        listeners = db.dbs[0]._raw_write_listeners
+        assert db._filters[0].add in listeners
+
+    assert executor._shutdown
+    assert db._filters[0].add not in listeners
+    # Still works, one db at a time
+    assert db['/foo'] == 1
+    assert not db.exists('/bar')
+
+
+def test_parallel_lookup_overlaps():
+    db = kydb.connect('memory://union_db9;memory://union_db10', parallel=True)
+    db1, db2 = db.dbs
+    db2['/foo'] = 1
+    db2.clear_cache()
+
+    for layer in db.dbs:
+        def slow_get_raw(key, get_raw=layer.get_raw):
+            time.sleep(0.2)
+            return get_raw(key)
+
+        layer.get_raw = slow_get_raw
+
+    start = time.time()
+    assert db['/foo'] == 1
+    # Both layers were queried at the same time
+    assert time.time() - start < 0.35
+
+
+def test_filter_layers():
+    db = kydb.connect('memory://union_db11;memory://union_db12',
+                      filter_layers=[0])
+    db1, db2 = db.dbs
+    db1['/hotfix'] = 1
+    db2['/hotfix'] = 2
+    db2['/prod'] = 3
+    db.refresh_filters()
+
+    reads = []
+    get_raw = db1.get_raw
+
+    def counting_get_raw(key):
+        reads.append(key)
+        return get_raw(key)
+
+    db1.get_raw = counting_get_raw
+    db1.clear_cache()
+
+    assert db['/hotfix'] == 1
+    assert db['/prod'] == 3
+    assert db.exists('/prod')
+    assert not db.exists('/nothing')
+    assert reads == ['/hotfix']
+
+    # Writes through the union and on the layer itself are seen
+    db['/new'] = 4
+    db1['/new2'] = 5
+    assert db['/new'] == 4
+    assert db['/new2'] == 5
+
+    # So are raw writes
+    db1.set_raw(db1._get_full_path('/raw'), db1._serialise(6))
+    db1.set_raw_many(
+        (db1._get_full_path(x), db1._serialise(7)) for x in ['/m1', '/m2'])
+    assert db['/raw'] == 6
+    assert db['/m1'] == 7
+    assert db['/m2'] == 7
+
+
+def test_filter_cachedb_layer():
+    front = CacheDB(kydb.connect('memory://union_db19'),
+                    kydb.connect('memory://union_db20'))
+    back = kydb.connect('memory://union_db21')
+    db = UnionDB([front, back], filter_layers=[0, 1])
+    assert db._filters[0] is None
+    front['/foo'] = 1
+    back['/bar'] = 2
+    db.refresh_filters()
+    assert db['/foo'] == 1
+    assert db['/bar'] == 2
+
+    # Written after the filters were built, still found
+    front['/baz'] = 3
+    assert db['/baz'] == 3
+    assert db.exists('/baz')
+
+
+def test_filter_rebuild_order():
+    db = kydb.connect('memory://union_db15;memory://union_db16',
+                      filter_layers=[0])
+    layer_filter = db._filters[0]
+    db1 = db.dbs[0]
+    db1['/old'] = 1
+    layer_filter.rebuild()
+
+    # A slow rebuild started before a quicker one finishes last
+    started = threading.Event()
+    release = threading.Event()
+    list_paths = layer_filter._list_paths
+
+    def slow_list_paths(folder):
+        paths = list(list_paths(folder))
+        started.set()
+        release.wait(5)
+        return paths
+
+    layer_filter._list_paths = slow_list_paths
+    with layer_filter._lock:
+        generation = layer_filter._next_generation()
+
+    slow = threading.Thread(target=layer_filter._rebuild, args=(generation,))
+    slow.start()
+    assert started.wait(5)
+
+    db1.delete('/old')
+    layer_filter._list_paths = list_paths
+    layer_filter.rebuild()
+    # Written while the slow one is listing
+    db1['/new'] = 2
+    release.set()
+    slow.join()
+
+    # The older listing did not replace the newer one
+    assert not layer_filter.might_contain('/old')
+    assert layer_filter.might_contain('/new')
+
+
+def test_list_dir_streams():
+    db = kydb.connect('memory://union_db13;memory://union_db14')
+    db1, db2 = db.dbs
+    db1['/a/obj1'] = 1
+    db2['/a/obj1'] = 1
+    db2['/a/obj2'] = 2
+
+    listed = []
+    list_dir = db2.list_dir
+
+    def recording_list_dir(*args, **kwargs):
+        listed.append(args[0])
+        return list_dir(*args, **kwargs)
+
+    db2.list_dir = recording_list_dir
+
+    # The first item comes without touching the back db
+    assert next(iter(db.list_dir('/a/', page_size=1))) == 'obj1'
+    assert listed == []
+
+    assert list(db.list_dir('/a/')) == ['obj1', 'obj2']
+    assert listed == ['/a/']
@@ -0,0 +1,87 @@
+import kydb
+from kydb import executors, walk
+import pytest
+import threading
+
+
+@pytest.fixture
+def db():
+    db = kydb.connect('memory://test_walk')
+    for i in range(3):
+        db[f'/top/obj{i}'] = i + 1
+        for j in range(3):
+            db[f'/top/sub{i}/obj{j}.csv'] = j + 1
+            db[f'/top/sub{i}/deep/obj{j}.txt'] = j + 1
+
+    return db
+
+
+def test_walk(db):
+    res = {folder: (sorted(subfolders), sorted(objects))
+           for folder, subfolders, objects in db.walk('top')}
+    assert res['/top/'] == (['sub0', 'sub1', 'sub2'],
+                            ['obj0', 'obj1', 'obj2'])
+    assert res['/top/sub1/'] == (['deep'],
+                                 ['obj0.csv', 'obj1.csv', 'obj2.csv'])
+    assert res['/top/sub2/deep/'] == ([], ['obj0.txt', 'obj1.txt',
+                                           'obj2.txt'])
+    assert len(res) == 7
+
+
+def test_walk_order(db):
+    seen = set()
+    for folder, _, _ in db.walk('/top/'):
+        parent = folder[:-1].rsplit('/', 1)[0] + '/'
+        assert folder == '/top/' or parent in seen
+        seen.add(folder)
+
+
+def test_walk_max_depth(db):
+    assert [x[0] for x in db.walk('/top', max_depth=0)] == ['/top/']
+    assert {x[0] for x in db.walk('/top', max_depth=1)} == {
+        '/top/', '/top/sub0/', '/top/sub1/', '/top/sub2/'}
+
+
+def test_walk_pattern(db):
+    res = {folder: objects
+           for folder, _, objects in db.walk('/top', pattern='*/*.csv')}
+    assert res['/top/'] == []
+    assert sorted(res['/top/sub0/']) == ['obj0.csv', 'obj1.csv', 'obj2.csv']
+    assert res['/top/sub0/deep/'] == []
+
+
+def test_walk_prune(db):
+    folders = []
+    for folder, subfolders, _ in db.walk('/top'):
+        folders.append(folder)
+        subfolders[:] = [x for x in subfolders if x == 'sub1']
+
+    assert sorted(folders) == ['/top/', '/top/sub1/']
+
+
+def test_walk_union(db):
+    other = kydb.connect('memory://test_walk_other')
+    other['/top/sub9/obj'] = 1
+    union = kydb.connect('memory://test_walk;memory://test_walk_other')
+    folders = {x[0] for x in union.walk('/top', max_depth=1)}
+    assert '/top/sub9/' in folders
+    assert '/top/sub0/' in folders
+
+
+def test_rm_tree(db):
+    db.rm_tree('/top')
+    assert not db.is_dir('/top')
+    assert db.ls('/') == []
+
+
+def test_walk_shared_executor(db):
+    for _ in range(5):
+        list(db.walk('/top'))
+        # Stopped early
+        next(iter(db.walk('/top')))
+
+    db.rm_tree('/top/sub0')
+    assert [x for x in executors._executors if x[0] == 'kydb-walk'] == [
+        ('kydb-walk', walk.WALK_WORKERS)]
+    assert len([x for x in threading.enumerate()
+                if x.name.startswith('kydb-walk')]) <= walk.WALK_WORKERS
@@ -1,29 +1,93 @@
 
 from .base import BaseDB
 from .interface import KYDBInterface
+from .single_flight import SingleFlight
+from .bloom import BloomFilter
+from .walk import walk_tree
 from typing import Tuple
 from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
 
 
 def front_db_func(self, func_name, *args, **kwargs):
     return getattr(self.dbs[0], func_name)(*args, **kwargs)
 
 
-def first_success_db_func(self, func_name, *args, **kwargs):
+def first_success_db_func(self, func_name, key, *args, **kwargs):
+    dbs = self._candidate_dbs(key)
+    if self.parallel:
+        return _parallel_first_success(
+            self, dbs, func_name, key, *args, **kwargs)
+
     first_error = None
-    for db in self.dbs:
+    for db in dbs:
         try:
-            return getattr(db, func_name)(*args, **kwargs)
+            return getattr(db, func_name)(key, *args, **kwargs)
         except KeyError as err:
             if not first_error:
                 first_error = err
             continue
 
-    raise first_error
+    raise first_error or KeyError(key)
+
+
+def _parallel_first_success(self, dbs, func_name, *args, **kwargs):
+    """Same as first_success_db_func but all dbs are queried at once.
+
+    Results are still taken in order of the dbs, so the front-most db
+    that succeeds wins. Lower dbs are cancelled or ignored.
+    """
+    futures = [self._executor.submit(getattr(db, func_name), *args, **kwargs)
+               for db in dbs]
+    first_error = None
+    try:
+        for future in futures:
+            try:
+                return future.result()
+            except KeyError as err:
+                if not first_error:
+                    first_error = err
+                continue
+
+        raise first_error or KeyError(args[0])
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def coalesced_first_success_db_func(self, func_name, key, *args, **kwargs):
+    """Same as first_success_db_func but concurrent calls
+    for the same key share one fall-through"""
+    return self._single_flight.do(
+        key,
+        lambda: first_success_db_func(self, func_name, key, *args, **kwargs))
 
 
 def any_db_func(self, func_name, *args, **kwargs):
-    return any(getattr(db, func_name)(*args, **kwargs) for db in self.dbs)
+    dbs = self.dbs
+    if func_name in FILTERED_FUNCS:
+        dbs = self._candidate_dbs(args[0])
+
+    if self.parallel:
+        return _parallel_any(self, dbs, func_name, *args, **kwargs)
+
+    return any(getattr(db, func_name)(*args, **kwargs) for db in dbs)
+
+
+def _parallel_any(self, dbs, func_name, *args, **kwargs):
+    """Same as any_db_func but all dbs are queried at once.
+
+    Returns as soon as any db returns True.
+    """
+    futures = [self._executor.submit(getattr(db, func_name), *args, **kwargs)
+               for db in dbs]
+    try:
+        return any(f.result() for f in as_completed(futures))
+    finally:
+        for future in futures:
+            future.cancel()
 
 
 def all_db_func(self, func_name, *args, **kwargs):
@@ -40,8 +104,11 @@ def create_func(func_prototype, func_name):
     return f
 
 
+# any_db_func only uses the layer filters for funcs that take an object key
+FILTERED_FUNCS = {'exists'}
+
 UNION_DB_BASE_FUNCS = [
-    ('__getitem__', first_success_db_func),
+    ('__getitem__', coalesced_first_success_db_func),
     ('__setitem__', front_db_func),
     ('delete', front_db_func),
     ('rmdir', front_db_func),
@@ -49,12 +116,123 @@ UNION_DB_BASE_FUNCS = [
     ('new', front_db_func),
     ('exists', any_db_func),
     ('refresh', all_db_func),
-    ('read', first_success_db_func),
+    ('read', coalesced_first_success_db_func),
     ('mkdir', front_db_func),
     ('is_dir', any_db_func),
-    ('upload_objdb_config', front_db_func)
+    ('upload_objdb_config', front_db_func),
+    ('unwatch', all_db_func)
 ]
 
+
+class LayerFilter:
+    """A bloom filter of all the object keys in a db
+
+    Built from listing the whole db in a background thread and rebuilt
+    every refresh_interval seconds. Keys written through the db's raw
+    ops, i.e. by ``set``, ``set_raw_many`` or a write-behind drain,
+    are added as they are written.
+
+    Until the first build completes every key might be in the db.
+    """
+
+    def __init__(self, db: BaseDB, refresh_interval=300):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self._filter = None
+        self._built_at = 0
+        # Of the last build started and the filter in use
+        self._generation = 0
+        self._filter_generation = 0
+        # generation -> paths added while that build lists the db
+        self._added = {}
+        self._lock = threading.Lock()
+        db._raw_write_listeners.append(self.add)
+        self._start_rebuild()
+
+    def might_contain(self, key: str) -> bool:
+        bloom_filter = self._filter
+        if bloom_filter is None:
+            return True
+
+        if self.refresh_interval is not None and \
+                time.time() - self._built_at > self.refresh_interval:
+            self._start_rebuild()
+
+        return self.db._get_full_path(key) in bloom_filter
+
+    def add(self, path: str):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(path)
+
+            for added in self._added.values():
+                added.append(path)
+
+    def close(self):
+        """Stop adding the keys written to the db"""
+        try:
+            self.db._raw_write_listeners.remove(self.add)
+        except ValueError:
+            pass
+
+    def rebuild(self):
+        """Rebuild the filter now"""
+        with self._lock:
+            generation = self._next_generation()
+
+        self._rebuild(generation)
+
+    def _start_rebuild(self):
+        with self._lock:
+            if self._added:
+                # Already building
+                return
+
+            generation = self._next_generation()
+
+        threading.Thread(target=self._rebuild, args=(generation,),
+                         daemon=True).start()
+
+    def _next_generation(self) -> int:
+        """Must hold _lock"""
+        self._generation += 1
+        self._added[self._generation] = []
+        return self._generation
+
+    def _rebuild(self, generation: int):
+        try:
+            paths = list(self._list_paths('/'))
+            bloom_filter = BloomFilter(max(2 * len(paths), 1000))
+            for path in paths:
+                bloom_filter.add(path)
+        except Exception:
+            with self._lock:
+                del self._added[generation]
+            raise
+
+        with self._lock:
+            for path in self._added.pop(generation):
+                bloom_filter.add(path)
+
+            # A build started later may have finished first
+            if generation > self._filter_generation:
+                self._filter = bloom_filter
+                self._filter_generation = generation
+                self._built_at = time.time()
+
+    def _list_paths(self, folder: str):
+        try:
+            names = list(self.db.list_dir(folder))
+        except KeyError:
+            return
+
+        for name in names:
+            if name.endswith('/'):
+                yield from self._list_paths(folder + name)
+            else:
+                yield self.db._get_full_path(folder + name)
+
+
 UnionDBBase = type(
     'UnionDBBase',
     (KYDBInterface,),
@@ -95,10 +273,102 @@ Reading and writing::
     db['/foo'] = 4
     db1['/foo'] # returns 4
     db2['/foo'] # returns 3
+
+Parallel lookup::
+
+    db = kydb.connect('redis://hotfixes.epythoncloud.io;'
+                      'dynamodb://my-prod-src-db', parallel=True)
+
+    # read, exists and is_dir query both dbs at the same time.
+    # read still returns the value from the front-most db that has it.
+    db['/foo']
+
+    :param dbs: The dbs in order of priority
+    :param parallel: Query all dbs concurrently on
+                     read, exists and is_dir. (Default value = False)
+    :param max_workers: Size of the thread pool used when parallel.
+                        (Default value = 4 threads per db)
+                        Stopped by ``close`` or leaving a with block.
+
+Membership filters::
+
+    # Keep a bloom filter of the keys in the hotfixes db
+    db = kydb.connect('redis://hotfixes.epythoncloud.io;'
+                      'dynamodb://my-prod-src-db', filter_layers=[0])
+
+    # read and exists skip the hotfixes db for keys that
+    # are definitely not in it.
+    db['/foo']
+
+Keys written to a filtered db by this process (via ``set``, the union,
+``DbObj.write`` or the raw ops like ``set_raw_many``) are added straight
+away. Writes made by other
+processes are only seen once the filter is rebuilt.
+
+    :param filter_layers: Indexes of the dbs to keep filters for.
+                          Ignored for dbs that are not a single db,
+                          i.e. a CacheDB.
+    :param filter_refresh_interval: Seconds between rebuilding the filters
+                                    from a full listing.
+                                    (Default value = 300)
     """
 
-    def __init__(self, dbs: Tuple[BaseDB]):
+    def __init__(self, dbs: Tuple[BaseDB], parallel=False, max_workers=None,
+                 filter_layers=(), filter_refresh_interval=300):
         self.dbs = dbs
+        self.parallel = parallel
+        self._executor = ThreadPoolExecutor(
+            max_workers or 4 * len(dbs),
+            thread_name_prefix='kydb-union') if parallel else None
+        self._single_flight = SingleFlight()
+        # Only a BaseDB tells the filter what is written to it,
+        # others, i.e. CacheDB, are always queried
+        self._filters = [
+            LayerFilter(db, filter_refresh_interval)
+            if i in filter_layers and isinstance(db, BaseDB) else None
+            for i, db in enumerate(dbs)]
+
+    def _candidate_dbs(self, key: str):
+        """The dbs that might have the key"""
+        return [db for db, layer_filter in zip(self.dbs, self._filters)
+                if layer_filter is None or layer_filter.might_contain(key)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stop the threads of parallel and detach the filters from the dbs
+
+        The db still works afterwards, querying the dbs in turn.
+        """
+        executor, self._executor = self._executor, None
+        self.parallel = False
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+        for layer_filter in self._filters:
+            if layer_filter:
+                layer_filter.close()
+
+    def refresh_filters(self):
+        """Rebuild the membership filters now"""
+        for layer_filter in self._filters:
+            if layer_filter:
+                layer_filter.rebuild()
+
+    def watch(self, feed=None):
+        """Watch every db with its default feed
+
+        :param feed: Not supported as each db needs its own feed.
+        """
+        if feed is not None:
+            raise ValueError('UnionDB watches with the default feeds')
+
+        for db in self.dbs:
+            db.watch()
 
     def cache_context(self) -> 'KYDBInterface':
         with ExitStack() as stack:
@@ -108,19 +378,76 @@ Reading and writing::
         return stack
 
     def list_dir(self, folder: str, include_dir=True, page_size=200):
-        res = set()
-        for db in self.dbs:
+        """Streams the listing of each db in turn, skipping duplicates
+
+        Only the names from the front dbs are remembered for de-duplication,
+        so memory does not grow with the size of the back db.
+        """
+        seen = set()
+        last = len(self.dbs) - 1
+        for i, db in enumerate(self.dbs):
             try:
-                res.update(db.list_dir(folder, include_dir, page_size))
+                for key in db.list_dir(folder, include_dir, page_size):
+                    if key in seen:
+                        continue
+
+                    if i != last:
+                        seen.add(key)
+
+                    yield key
             except KeyError:
                 pass
 
-        for key in res:
-            yield key
-
     def ls(self, folder: str, include_dir=True):
         return list(self.list_dir(folder, include_dir))
 
+    def walk(self, folder: str, max_depth=None, pattern=None):
+        """Walks the merged listings of the dbs"""
+        return walk_tree(self, folder, max_depth, pattern)
+
+    def find(self, pattern: str, recursive=True):
+        """Finds in each db in turn, skipping duplicates
+
+        As with list_dir only the keys from the front dbs are remembered.
+        """
+        seen = set()
+        last = len(self.dbs) - 1
+        for i, db in enumerate(self.dbs):
+            for key in db.find(pattern, recursive):
+                if key in seen:
+                    continue
+
+                if i != last:
+                    seen.add(key)
+
+                yield key
+
+    def prefetch(self, folder: str, recursive=False, pattern=None) -> int:
+        """Prefetch the folder in every db
+
+        :returns: The number of objects fetched across all dbs
+        """
+        count = 0
+        for db in self.dbs:
+            try:
+                count += db.prefetch(folder, recursive, pattern)
+            except KeyError:
+                pass
+
+        return count
+
+    def read_dir(self, folder: str, recursive=False, pattern=None) -> dict:
+        """Objects in front dbs take priority over the same key
+        in the dbs behind"""
+        res = {}
+        for db in reversed(self.dbs):
+            try:
+                res.update(db.read_dir(folder, recursive, pattern))
+            except KeyError:
+                pass
+
+        return res
+
     def __repr__(self):
         """
         The representation of the db.
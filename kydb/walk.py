@@ -0,0 +1,64 @@
+from concurrent.futures import wait, FIRST_COMPLETED
+from fnmatch import fnmatchcase
+from .executors import shared_executor
+
+# Max concurrent listings of walk
+WALK_WORKERS = 16
+
+
+def walk_tree(db, folder: str, max_depth=None, pattern=None,
+              max_workers=WALK_WORKERS):
+    """Walk the tree under folder listing the subfolders concurrently
+
+    See ``walk`` in KYDBInterface. The listings of all the walks,
+    i.e. by ``rm_tree``, share a pool of max_workers threads.
+
+    :param db: Anything with list_dir, i.e. BaseDB or UnionDB
+    """
+    top = '/' + folder.strip('/') + '/' if folder.strip('/') else '/'
+
+    def list_folder(path):
+        subfolders = []
+        objects = []
+        for name in db.list_dir(path):
+            if name.endswith('/'):
+                subfolders.append(name[:-1])
+            else:
+                objects.append(name)
+
+        return subfolders, objects
+
+    executor = shared_executor('kydb-walk', max_workers)
+    # future -> (folder, depth)
+    pending = {executor.submit(list_folder, top): (top, 0)}
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, depth = pending.pop(future)
+                try:
+                    subfolders, objects = future.result()
+                except KeyError:
+                    if path == top:
+                        raise
+
+                    # Removed while walking
+                    continue
+
+                if pattern:
+                    rel = path[len(top):]
+                    objects = [x for x in objects
+                               if fnmatchcase(rel + x, pattern)]
+
+                # The caller can prune subfolders in place, as in os.walk
+                yield path, subfolders, objects
+
+                if max_depth is None or depth < max_depth:
+                    for name in subfolders:
+                        sub = path + name + '/'
+                        pending[executor.submit(list_folder, sub)] = \
+                            (sub, depth + 1)
+    finally:
+        # The walk was stopped early
+        for future in pending:
+            future.cancel()
@@ -5,7 +5,7 @@ with open("README.md", "r") as fh:
 
 setuptools.setup(
     name='kydb',
-    packages=['kydb', 'kydb.impl'],
+    packages=['kydb', 'kydb.impl', 'kydb.benchmarks'],
     version='0.7.5',
     license='MIT',
     description='kydb (Kinyu Database). NoSQL DB interface.',